@@ -1,21 +1,22 @@
 import os
 from dotenv import load_dotenv
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
 import sqlite3
 import json
 import asyncio
 from knowledge_manager import (
-    get_all_knowledge_files,
     load_yaml_file,
     save_yaml_file,
     get_knowledge_file,
     delete_knowledge_file,
     rebuild_database
 )
-from openai import AsyncOpenAI
-from database import get_db
+from database import get_pool, row_to_knowledge, KNOWLEDGE_COLUMNS
+import search_index
+import embedding_store
+import summary_cache
+import answer_cache
+import corpus_generation
+import llm_scheduler
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
@@ -25,118 +26,243 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     print("Warning: OPENAI_API_KEY not found in environment variables")
 
-client = AsyncOpenAI(
-    api_key=OPENAI_API_KEY,
-    base_url="https://api.openai.com/v1"
-)
+# 로컬 벤치마크에서는 benchmarks/fake_openai.py 주소로 바꿔서 사용
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
-async def get_embedding(text: str) -> list[float]:
-    """Get embedding for text using OpenAI's API."""
+_client = None
+
+def get_client():
+    """Shared AsyncOpenAI client, created on first use (the openai SDK is slow to import)"""
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+
+        # 재시도와 제한 시간은 llm_scheduler 가 처리하므로 클라이언트 자체 재시도는 끔
+        _client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+            max_retries=0,
+            timeout=llm_scheduler.LLM_ATTEMPT_TIMEOUT
+        )
+    return _client
+
+# query_knowledge 가 LLM 에 컨텍스트로 넘기는 문서 수
+QUERY_CONTEXT_TOP_K = int(os.getenv("QUERY_CONTEXT_TOP_K", "5"))
+
+QUERY_MODEL = "gpt-3.5-turbo"
+QUERY_MAX_TOKENS = 1000
+QUERY_TEMPERATURE = 0.7
+
+# /api/search 에서 동시에 생성하는 AI 요약 수 상한
+SEARCH_SUMMARY_CONCURRENCY = int(os.getenv("SEARCH_SUMMARY_CONCURRENCY", "5"))
+
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 150
+SUMMARY_TEMPERATURE = 0.7
+# 요약 프롬프트를 바꾸면 올려서 이전 캐시를 무효화
+SUMMARY_PROMPT_VERSION = 2
+
+async def create_chat_completion(**params):
+    """chat.completions.create through the LLM scheduler; identical in-flight requests share one call"""
+    return await llm_scheduler.get_scheduler().run(
+        lambda: get_client().chat.completions.create(**params),
+        tokens=llm_scheduler.estimate_tokens(params["messages"], params.get("max_tokens")),
+        key=llm_scheduler.request_key("chat", params)
+    )
+
+async def create_embeddings(**params):
+    """embeddings.create through the LLM scheduler"""
+    return await llm_scheduler.get_scheduler().run(
+        lambda: get_client().embeddings.create(**params),
+        tokens=llm_scheduler.estimate_tokens(params["input"]),
+        key=llm_scheduler.request_key("embeddings", params),
+        kind="embeddings"
+    )
+
+async def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """Get embeddings for several texts with a single OpenAI request."""
+    if not texts:
+        return []
     try:
-        response = await client.embeddings.create(
-            input=text,
-            model="text-embedding-3-small"
+        response = await create_embeddings(
+            input=texts,
+            model=embedding_store.EMBEDDING_MODEL
         )
-        return response.data[0].embedding
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
     except Exception as e:
-        print(f"Error getting embedding: {e}")
+        print(f"Error getting embeddings: {e}")
         return []
 
+async def get_embedding(text: str) -> list[float]:
+    """Get embedding for text using OpenAI's API."""
+    embeddings = await get_embeddings([text])
+    return embeddings[0] if embeddings else []
+
+async def update_embeddings(ids: list = None, progress=None) -> dict:
+    """Embed new or changed knowledge rows; called after writes and rebuilds."""
+    if not OPENAI_API_KEY:
+        return {}
+    try:
+        return await embedding_store.sync_embeddings(get_embeddings, ids=ids, progress=progress)
+    except Exception as e:
+        print(f"Error updating embeddings: {e}")
+        return {}
+
+def summary_cache_key(content: str) -> str:
+    return summary_cache.make_key(
+        content,
+        model=SUMMARY_MODEL,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        temperature=SUMMARY_TEMPERATURE,
+        prompt_version=SUMMARY_PROMPT_VERSION
+    )
+
+async def invalidate_summary(content: str):
+    """Forget cached summaries of content that was changed or deleted."""
+    await summary_cache.get_cache().invalidate_content(content)
+
 async def get_ai_summary(content: str) -> str:
-    """Generate an AI summary of the content using RAG with GPT-4o-mini."""
+    """Generate a one-sentence AI summary of the content with GPT-4o-mini."""
     if not OPENAI_API_KEY:
         return "AI 요약을 위해서는 .env 파일에 OPENAI_API_KEY를 설정해주세요."
+    
+    cache = summary_cache.get_cache()
+    cache_key = summary_cache_key(content)
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return cached
         
     try:
-        # Get embedding for the current content
-        content_embedding = await get_embedding(content)
-        
-        # Get related knowledge from database using embedding similarity
-        knowledge_content = get_knowledge_content()
-        
-        # Generate summary using GPT-4o-mini with retrieved context
-        prompt = f"""관련 지식:
-{knowledge_content}
-
-현재 내용:
+        # 요약은 내용만으로 만듦 (전체 지식 목록을 넣으면 코퍼스가 커질수록 느려지고 캐시 키에도 빠짐)
+        prompt = f"""현재 내용:
 {content}
 
 위 내용을 분석하고 한 문장으로 핵심을 요약해주세요. 기술적인 측면과 주요 학습 포인트에 초점을 맞춰주세요."""
 
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await create_chat_completion(
+            model=SUMMARY_MODEL,
             messages=[
                 {"role": "system", "content": "당신은 기술 문서를 이해하고 핵심을 정확하게 요약하는 AI 어시스턴트입니다."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=150,
-            temperature=0.7
+            max_tokens=SUMMARY_MAX_TOKENS,
+            temperature=SUMMARY_TEMPERATURE
         )
-        return response.choices[0].message.content.strip()
+        summary = response.choices[0].message.content.strip()
+        await cache.put(cache_key, content, summary)
+        return summary
     except Exception as e:
         print(f"AI 요약 생성 중 오류 발생: {e}")
         return "현재 AI 요약을 생성할 수 없습니다. 나중에 다시 시도해주세요."
 
-def get_knowledge_content():
-    """지식 데이터베이스의 모든 내용을 가져옴"""
-    return get_all_knowledge_files()
+async def iter_ai_summaries(contents: list, concurrency: int = SEARCH_SUMMARY_CONCURRENCY):
+    """Yield (index, summary) pairs as soon as each summary completes.
+
+    At most `concurrency` summaries are generated at once. Pending work is
+    cancelled if the consumer stops early (e.g. the client disconnected).
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def summarize(index: int, content: str):
+        async with semaphore:
+            return index, await get_ai_summary(content)
+    
+    tasks = [asyncio.create_task(summarize(index, content)) for index, content in enumerate(contents)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def get_ai_summaries(contents: list, concurrency: int = SEARCH_SUMMARY_CONCURRENCY) -> list:
+    """Summarize several contents concurrently, preserving their order."""
+    summaries = [None] * len(contents)
+    async for index, summary in iter_ai_summaries(contents, concurrency):
+        summaries[index] = summary
+    return summaries
+
+def fetch_knowledge_by_ids(conn, ids: list) -> dict:
+    """Load knowledge rows for the given ids, keyed by id"""
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {KNOWLEDGE_COLUMNS} FROM knowledge WHERE id IN ({placeholders})", list(ids))
+    return {row[0]: row_to_knowledge(row) for row in cursor.fetchall()}
+
+def calculate_relevance_scores(query: str, documents: list = None, top_k: int = None, conn=None) -> list:
+    """Calculate relevance scores between query and documents using TF-IDF.
+
+    Without `documents` the persistent index in `search_index` is used, so a
+    search only transforms the query and loads the top-k rows through `conn`.
+    An explicit document list is still scored ad hoc with a fresh vectorizer.
+    """
+    if documents is None:
+        scored_ids = search_index.get_index().search(query, top_k)
+        knowledge_by_id = fetch_knowledge_by_ids(conn, [doc_id for doc_id, _ in scored_ids])
+        return [
+            (knowledge_by_id[doc_id], score)
+            for doc_id, score in scored_ids
+            if doc_id in knowledge_by_id
+        ]
 
-def calculate_relevance_scores(query: str, documents: list) -> list:
-    """Calculate relevance scores between query and documents using TF-IDF."""
     if not documents:
         return []
-    
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     # Prepare documents for TF-IDF
-    doc_texts = [query] + [f"{doc['title']} {' '.join(doc['tags'])} {doc['content']}" for doc in documents]
+    doc_texts = [query] + [search_index.document_text(doc['title'], doc['tags'], doc['content']) for doc in documents]
     
     # Calculate TF-IDF vectors
     vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(doc_texts)
+    with search_index.TFIDF_DURATION.time("adhoc_fit"):
+        tfidf_matrix = vectorizer.fit_transform(doc_texts)
     
     # Calculate cosine similarity between query and each document
     query_vector = tfidf_matrix[0:1]
-    similarities = cosine_similarity(query_vector, tfidf_matrix[1:]).flatten()
+    with search_index.TFIDF_DURATION.time("adhoc_score"):
+        similarities = cosine_similarity(query_vector, tfidf_matrix[1:]).flatten()
     
     # Sort documents by similarity score
     scored_docs = list(zip(documents, similarities))
     scored_docs.sort(key=lambda x: x[1], reverse=True)
     
-    return scored_docs
+    return scored_docs[:top_k] if top_k is not None else scored_docs
 
-def find_related_knowledge(knowledge_item, all_knowledge: list) -> list:
-    """Find related knowledge items based on content similarity."""
-    if not all_knowledge:
-        return []
-    
-    # Create query from the knowledge item
-    query_text = f"{knowledge_item.title} {' '.join(knowledge_item.tags)} {knowledge_item.content}"
+async def retrieve_context(query: str, top_k: int = QUERY_CONTEXT_TOP_K, query_embedding: list = None) -> list:
+    """Pick the knowledge rows most similar to the query.
+
+    Uses the embedding store when it has vectors; otherwise (no API key or
+    store not built yet) falls back to the TF-IDF index. Pass
+    `query_embedding` when the query was already embedded.
+    """
+    if query_embedding is None:
+        query_embedding = await get_embedding(query)
     
-    # Filter out the current knowledge item
-    other_knowledge = [k for k in all_knowledge if k.id != knowledge_item.id]
+    def rank(conn):
+        scored_ids = []
+        if query_embedding:
+            scored_ids = embedding_store.top_k(conn, query_embedding, top_k)
+        if not scored_ids:
+            scored_ids = search_index.get_index().search(query, top_k)
+        knowledge_by_id = fetch_knowledge_by_ids(conn, [doc_id for doc_id, _ in scored_ids])
+        return [knowledge_by_id[doc_id] for doc_id, _ in scored_ids if doc_id in knowledge_by_id]
     
-    # Calculate relevance scores
-    scored_docs = calculate_relevance_scores(query_text, other_knowledge)
+    return await get_pool().read(rank)
+
+async def build_query_messages(query: str, query_embedding: list = None) -> list:
+    """Build the chat messages for a knowledge base question"""
+    # Get the most relevant knowledge instead of the whole database
+    documents = await retrieve_context(query, query_embedding=query_embedding)
     
-    # Return top related items (with score > threshold)
-    threshold = 0.1
-    related_items = [doc for doc, score in scored_docs if score > threshold]
+    # Prepare context from knowledge base
+    context = "\n\n".join([f"# {doc['title']}\n{doc['content']}" for doc in documents])
     
-    return related_items[:5]  # Return top 5 related items
-
-async def query_knowledge(query: str) -> str:
-    """Query the knowledge base using OpenAI's API"""
-    try:
-        # Get all knowledge from database
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT title, content FROM knowledge")
-        rows = cursor.fetchall()
-        
-        # Prepare context from knowledge base
-        context = "\n\n".join([f"# {title}\n{content}" for title, content in rows])
-        
-        # Prepare the prompt
-        prompt = f"""다음은 우리의 지식 베이스 내용입니다:
+    # Prepare the prompt
+    prompt = f"""다음은 우리의 지식 베이스 내용입니다:
 
 {context}
 
@@ -146,20 +272,85 @@ async def query_knowledge(query: str) -> str:
 지식 베이스에 관련 정보가 없다면 그렇다고 말씀해 주세요.
 답변은 반드시 한국어로 작성해주세요.
 """
+    return [
+        {"role": "system", "content": "당신은 한국어로 답변하는 친절한 지식 도우미입니다."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def cached_answer(query: str, generation: int):
+    """(cached answer or None, query embedding) for a knowledge base question.
+
+    Repeated questions are answered without any API call; otherwise the query
+    is embedded once, for the similarity lookup and for retrieval on a miss.
+    """
+    cache = answer_cache.get_cache()
+    answer = cache.get_exact(query, generation)
+    if answer is not None:
+        return answer, None
+    query_embedding = await get_embedding(query)
+    return cache.get_similar(query_embedding, generation), query_embedding
+
+async def query_knowledge(query: str) -> str:
+    """Query the knowledge base using OpenAI's API"""
+    try:
+        # 검색 전에 세대를 읽어, 답변 도중 코퍼스가 바뀌면 새 세대로 저장되지 않게 함
+        generation = corpus_generation.current()
+        answer, query_embedding = await cached_answer(query, generation)
+        if answer is not None:
+            return answer
+        messages = await build_query_messages(query, query_embedding)
 
         # Call OpenAI API
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "당신은 한국어로 답변하는 친절한 지식 도우미입니다."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
+        response = await create_chat_completion(
+            model=QUERY_MODEL,
+            messages=messages,
+            temperature=QUERY_TEMPERATURE,
+            max_tokens=QUERY_MAX_TOKENS
         )
         
-        return response.choices[0].message.content.strip()
+        answer = response.choices[0].message.content.strip()
+        answer_cache.get_cache().put(query, query_embedding, answer, generation)
+        return answer
     
     except Exception as e:
         print(f"Error in query_knowledge: {e}")
         return f"Error processing your query: {str(e)}"
+
+async def stream_query_knowledge(query: str):
+    """Yield answer text chunks as the completion streams in.
+
+    Closing the generator (e.g. because the client disconnected) closes the
+    upstream HTTP response, which cancels the generation on OpenAI's side.
+    A cached answer is sent as a single chunk.
+    """
+    generation = corpus_generation.current()
+    answer, query_embedding = await cached_answer(query, generation)
+    if answer is not None:
+        yield answer
+        return
+    messages = await build_query_messages(query, query_embedding)
+    opened = llm_scheduler.get_scheduler().stream(
+        lambda: get_client().chat.completions.create(
+            model=QUERY_MODEL,
+            messages=messages,
+            temperature=QUERY_TEMPERATURE,
+            max_tokens=QUERY_MAX_TOKENS,
+            stream=True
+        ),
+        tokens=llm_scheduler.estimate_tokens(messages, QUERY_MAX_TOKENS)
+    )
+    # 스트림이 열려 있는 동안 스케줄러의 동시 호출 자리를 차지함
+    parts = []
+    async with opened as stream:
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            await stream.response.aclose()
+    # 끝까지 받은 답변만 저장 (중간에 닫히면 여기까지 오지 않음)
+    answer_cache.get_cache().put(query, query_embedding, "".join(parts).strip(), generation)
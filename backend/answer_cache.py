@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+# 이 값 이상으로 비슷한 질문이면 이전 답변을 그대로 돌려줌 (질문 임베딩의 코사인 유사도)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+ANSWER_CACHE_SIMILARITY = metrics.Histogram(
+    "answer_cache_similarity", "Best cosine similarity between a query and the cached questions",
+    buckets=(0.5, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0)
+)
+
+
+def normalize_query(query: str) -> str:
+    """Key for exact repeats: whitespace and case differences do not matter"""
+    return " ".join(query.split()).casefold()
+
+
+class AnswerCache:
+    """LRU of /ai/query answers, looked up by question text or embedding similarity.
+
+    Answers depend on the documents retrieved for the question, so the whole
+    cache belongs to one corpus generation: the first lookup or store under a
+    newer generation drops every entry, and answers computed against an older
+    generation are never stored.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._generation = -1
+        # 슬롯 번호 -> (정규화된 질문, 답변). 순서가 LRU 순서
+        self._slots: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._by_query: Dict[str, int] = {}
+        self._free: List[int] = []
+        # 슬롯별 정규화된 질문 임베딩. 첫 임베딩을 저장할 때 차원에 맞춰 할당
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _observe_generation(self, generation: int) -> bool:
+        """Clear entries of older generations; False if `generation` itself is stale"""
+        if generation > self._generation:
+            self._slots.clear()
+            self._by_query.clear()
+            self._free = list(range(self.max_entries))
+            self._valid[:] = False
+            self._generation = generation
+        return generation == self._generation
+
+    def _hit(self, slot: int, counter: str) -> str:
+        self._slots.move_to_end(slot)
+        setattr(self, counter, getattr(self, counter) + 1)
+        metrics.CACHE_REQUESTS.inc("ai_answer", "hit")
+        return self._slots[slot][1]
+
+    def get_exact(self, query: str, generation: int) -> Optional[str]:
+        """Answer of the same question; does not count a miss (get_similar follows)"""
+        with self._lock:
+            if not self._observe_generation(generation):
+                return None
+            slot = self._by_query.get(normalize_query(query))
+            return self._hit(slot, "exact_hits") if slot is not None else None
+
+    def get_similar(self, embedding: List[float], generation: int) -> Optional[str]:
+        """Answer of the most similar cached question above the threshold"""
+        with self._lock:
+            if self._observe_generation(generation) and self._slots and len(embedding):
+                vector = self._unit(embedding)
+                if vector is not None and self._valid.any():
+                    scores = np.where(self._valid, self._vectors @ vector, -1.0)
+                    best = int(np.argmax(scores))
+                    ANSWER_CACHE_SIMILARITY.observe(float(scores[best]))
+                    if scores[best] >= self.threshold:
+                        return self._hit(best, "similar_hits")
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc("ai_answer", "miss")
+            return None
+
+    def _unit(self, embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0 or (self._vectors is not None and vector.shape[0] != self._vectors.shape[1]):
+            return None
+        return vector / norm
+
+    def put(self, query: str, embedding: Optional[List[float]], answer: str, generation: int):
+        """Store an answer computed against `generation` (read before retrieval)"""
+        if self.max_entries <= 0 or not answer:
+            return
+        key = normalize_query(query)
+        with self._lock:
+            if not self._observe_generation(generation):
+                return
+            slot = self._by_query.get(key)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot, (evicted, _) = self._slots.popitem(last=False)
+                    del self._by_query[evicted]
+                self._by_query[key] = slot
+            self._slots[slot] = (key, answer)
+            self._slots.move_to_end(slot)
+
+            vector = self._unit(embedding) if embedding else None
+            if vector is not None and self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if vector is not None:
+                self._vectors[slot] = vector
+            # 임베딩을 못 얻은 답변은 같은 질문에만 씀
+            self._valid[slot] = vector is not None
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self._by_query.clear()
+            self._free = list(range(self.max_entries))
+            self._valid[:] = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            total = hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "generation": self._generation,
+                "threshold": self.threshold,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / total if total else 0.0
+            }
+
+
+_cache = AnswerCache()
+
+
+def get_cache() -> AnswerCache:
+    return _cache
@@ -0,0 +1,8 @@
+"""Benchmarks and load-test tooling (not imported by the application).
+
+- corpus: synthetic knowledge YAML corpus generator (1k/10k/100k documents)
+- fake_openai: local OpenAI-compatible server with configurable latency
+- load: async load driver reporting p50/p95/p99 latency and throughput as JSON
+- startup: cold start benchmark (import time, time to ready, first-request latency)
+- bench_json: micro-benchmark of knowledge list serialization
+"""
@@ -0,0 +1,95 @@
+"""Micro-benchmark: knowledge list serialization before and after fast_json.
+
+Compares the old path (json.loads of the stored tags/summary columns, then
+json.dumps of the whole page) with the new one (orjson + splicing the
+stored JSON bytes) on synthetic rows held in an in-memory SQLite table.
+
+    python benchmarks/bench_json.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import knowledge_select_list, row_to_knowledge, KNOWLEDGE_COLUMNS, KNOWLEDGE_JSON_COLUMNS  # noqa: E402
+import fast_json  # noqa: E402
+
+WORDS = "네트워크 보안 라우팅 스위칭 프로토콜 암호화 방화벽 패킷 network security routing cache index".split()
+FIELDS = ("id", "title", "level", "tags", "content", "summary", "references")
+
+
+def make_table(rows: int) -> sqlite3.Connection:
+    random.seed(0)
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        'CREATE TABLE knowledge (id INTEGER PRIMARY KEY, title TEXT, level INTEGER, tags TEXT, '
+        'content TEXT, summary TEXT, "references" TEXT)'
+    )
+    conn.executemany('INSERT INTO knowledge VALUES (?, ?, ?, ?, ?, ?, ?)', [
+        (
+            i,
+            " ".join(random.choices(WORDS, k=4)),
+            random.randint(1, 4),
+            json.dumps(random.sample(WORDS, 3), ensure_ascii=False),
+            " ".join(random.choices(WORDS, k=300)),
+            json.dumps({"핵심": " ".join(random.choices(WORDS, k=20)), "keywords": random.sample(WORDS, 4)},
+                       ensure_ascii=False),
+            json.dumps(["RFC 793", "https://example.com"], ensure_ascii=False),
+        )
+        for i in range(1, rows + 1)
+    ])
+    return conn
+
+
+def old_path(conn: sqlite3.Connection) -> bytes:
+    rows = conn.execute(f"SELECT {KNOWLEDGE_COLUMNS} FROM knowledge ORDER BY id").fetchall()
+    items = [row_to_knowledge(row) for row in rows]
+    return json.dumps({"items": items}, ensure_ascii=False).encode("utf-8")
+
+
+def new_path(conn: sqlite3.Connection) -> bytes:
+    encode = fast_json.object_encoder(FIELDS, KNOWLEDGE_JSON_COLUMNS)
+    rows = conn.execute(f"SELECT {knowledge_select_list(FIELDS)} FROM knowledge ORDER BY id").fetchall()
+    return b'{"items":' + fast_json.join_array(encode(row) for row in rows) + b"}"
+
+
+def measure(fn, conn, repeat: int) -> float:
+    fn(conn)  # 워밍업
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(conn)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = make_table(args.rows)
+    assert json.loads(old_path(conn)) == json.loads(new_path(conn)), "outputs differ"
+
+    old_ms = measure(old_path, conn, args.repeat)
+    new_ms = measure(new_path, conn, args.repeat)
+    print(json.dumps({
+        "rows": args.rows,
+        "orjson": fast_json.orjson is not None,
+        "old_ms": round(old_ms, 2),
+        "new_ms": round(new_ms, 2),
+        "old_us_per_item": round(old_ms * 1000 / args.rows, 2),
+        "new_us_per_item": round(new_ms * 1000 / args.rows, 2),
+        "speedup": round(old_ms / new_ms, 2) if new_ms else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
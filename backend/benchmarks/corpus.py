@@ -0,0 +1,146 @@
+"""Synthetic knowledge corpus generator for load tests.
+
+Writes Korean/English YAML documents shaped like data/template.yaml. The
+output only depends on --docs and --seed, so runs on different commits can
+be compared on the same corpus.
+
+    python -m benchmarks.corpus --docs 10k [--out data/knowledge_files] [--seed 0] [--clean]
+
+Files are named bench_<n>.yaml so that --clean removes only generated
+documents. Run POST /knowledge/rebuild (or the load driver) afterwards.
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+# knowledge_manager.KNOWLEDGE_FILES_DIR (가져오면 데이터베이스가 초기화되므로 경로만 같게 둠)
+KNOWLEDGE_FILES_DIR = Path(__file__).resolve().parent.parent / "data" / "knowledge_files"
+FILE_PREFIX = "bench_"
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+TOPICS = [
+    ("네트워크", "network"), ("보안", "security"), ("라우팅", "routing"), ("스위칭", "switching"),
+    ("프로토콜", "protocol"), ("암호화", "encryption"), ("방화벽", "firewall"), ("패킷", "packet"),
+    ("캐시", "cache"), ("인덱스", "index"), ("데이터베이스", "database"), ("트랜잭션", "transaction"),
+    ("운영체제", "operating system"), ("스케줄러", "scheduler"), ("메모리", "memory"), ("파일시스템", "filesystem"),
+    ("컨테이너", "container"), ("가상화", "virtualization"), ("로드밸런서", "load balancer"), ("인증", "authentication"),
+    ("인가", "authorization"), ("로그", "logging"), ("모니터링", "monitoring"), ("큐", "queue"),
+    ("스트리밍", "streaming"), ("압축", "compression"), ("직렬화", "serialization"), ("복제", "replication"),
+    ("샤딩", "sharding"), ("합의", "consensus"), ("DNS", "dns"), ("HTTP", "http"), ("TLS", "tls"),
+    ("TCP", "tcp"), ("UDP", "udp"), ("IPv6", "ipv6"), ("VLAN", "vlan"), ("BGP", "bgp"), ("OSPF", "ospf"),
+]
+PHRASES_KO = [
+    "{ko}은(는) 시스템 전체의 성능과 안정성에 큰 영향을 준다.",
+    "{ko}을(를) 설계할 때는 처리량과 지연 시간 사이의 균형을 고려해야 한다.",
+    "실제 운영 환경에서 {ko} 설정이 잘못되면 장애로 이어지기 쉽다.",
+    "{ko}의 동작 원리를 이해하면 문제의 원인을 빠르게 찾을 수 있다.",
+    "대부분의 구현은 {ko}에 대해 캐시와 재시도 전략을 함께 사용한다.",
+    "{ko}과(와) 관련된 지표는 대시보드에서 지속적으로 확인해야 한다.",
+]
+PHRASES_EN = [
+    "The {en} layer trades latency for throughput under heavy load.",
+    "A misconfigured {en} is a common root cause of production incidents.",
+    "Most {en} implementations combine caching with bounded retries.",
+    "Measuring {en} behaviour requires realistic traffic and warm caches.",
+    "Understanding {en} internals makes debugging considerably faster.",
+    "The {en} component should degrade gracefully when dependencies fail.",
+]
+
+
+def _block(text: str) -> str:
+    """YAML literal block scalar (|) body, indented by two spaces"""
+    return "\n".join("  " + line if line else "" for line in text.split("\n"))
+
+
+def _paragraph(rng: random.Random, topics: list) -> str:
+    sentences = []
+    for _ in range(rng.randint(3, 6)):
+        ko, en = rng.choice(topics)
+        if rng.random() < 0.6:
+            sentences.append(rng.choice(PHRASES_KO).format(ko=ko))
+        else:
+            sentences.append(rng.choice(PHRASES_EN).format(en=en))
+    return " ".join(sentences)
+
+
+def make_document(index: int, rng: random.Random) -> str:
+    """One YAML document in the data/template.yaml layout"""
+    # 앞쪽 주제가 더 자주 나오도록 치우치게 골라 실제 코퍼스처럼 태그 빈도가 고르지 않게 함
+    topics = list(dict.fromkeys(
+        TOPICS[min(int(rng.paretovariate(1.2)) - 1, len(TOPICS) - 1)] for _ in range(rng.randint(2, 4))
+    ))
+    topics += rng.sample(TOPICS, 2)
+    main_ko, main_en = topics[0]
+    title = f"{main_ko} {rng.choice(['기초', '심화', '실무', '문제 해결', '설계'])} {index} ({main_en})"
+    tags = sorted({en for _, en in topics[:4]})
+    summary = f"{_paragraph(rng, topics[:2])}\n{_paragraph(rng, topics[:2])}"
+    content = "\n\n".join(_paragraph(rng, topics) for _ in range(rng.randint(3, 8)))
+    references = [f"{topics[0][1]} 참고 자료 {rng.randint(1, 50)}"]
+    if rng.random() < 0.5:
+        # 다른 생성 문서를 가리키는 참조 (그래프의 reference 간선)
+        references.append(f"{FILE_PREFIX}{rng.randint(0, max(index, 1)):06d}.yaml")
+    lines = [
+        f"title: {json.dumps(title, ensure_ascii=False)}",
+        # validate_knowledge_content 는 1-3 만 허용
+        f"level: {rng.randint(1, 3)}",
+        "tags:",
+        *[f"  - {json.dumps(tag, ensure_ascii=False)}" for tag in tags],
+        "summary: |",
+        _block(summary),
+        "content: |",
+        _block(content),
+        "references:",
+        *[f"  - {json.dumps(reference, ensure_ascii=False)}" for reference in references],
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def generate(docs: int, out: Path, seed: int = 0) -> int:
+    """Write `docs` documents into `out` and return the total size in bytes"""
+    out.mkdir(parents=True, exist_ok=True)
+    total = 0
+    for index in range(docs):
+        # 문서마다 시드를 고정해 일부만 다시 만들어도 같은 내용이 나오게 함
+        document = make_document(index, random.Random(f"{seed}:{index}")).encode("utf-8")
+        (out / f"{FILE_PREFIX}{index:06d}.yaml").write_bytes(document)
+        total += len(document)
+    return total
+
+
+def clean(out: Path) -> int:
+    removed = 0
+    for path in out.glob(f"{FILE_PREFIX}*.yaml"):
+        path.unlink()
+        removed += 1
+    return removed
+
+
+def parse_docs(value: str) -> int:
+    return SIZES[value] if value in SIZES else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=parse_docs, default=SIZES["1k"], help="1k, 10k, 100k or a number")
+    parser.add_argument("--out", type=Path, default=KNOWLEDGE_FILES_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clean", action="store_true", help="remove previously generated documents first")
+    args = parser.parse_args()
+
+    removed = clean(args.out) if args.clean else 0
+    started = time.perf_counter()
+    total = generate(args.docs, args.out, args.seed)
+    print(json.dumps({
+        "docs": args.docs,
+        "out": str(args.out),
+        "seed": args.seed,
+        "removed": removed,
+        "bytes": total,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
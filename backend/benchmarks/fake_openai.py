@@ -0,0 +1,176 @@
+"""Local stand-in for the OpenAI API with configurable latency.
+
+Serves the chat completion (plain and streamed) and embedding endpoints
+that ai_service uses, so load tests measure this service rather than the
+upstream API. Answers and embeddings are deterministic for a given input.
+
+    python -m benchmarks.fake_openai [--port 8100] [--latency-ms 300] [--jitter-ms 50]
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=x uvicorn main:app
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import zlib
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 응답 지연 등 설정. main() 이 명령행 인자로 덮어씀
+CONFIG = {
+    "latency_ms": 300.0,
+    "jitter_ms": 50.0,
+    "token_ms": 20.0,
+    "answer_tokens": 60,
+    "embedding_latency_ms": 50.0,
+    "dimensions": 1536,
+    "error_rate": 0.0,
+}
+
+WORDS = "네트워크 보안 프로토콜 캐시 계층 패킷 라우팅 지연 처리량 설정 원인 확인 the of and latency cache".split()
+
+app = FastAPI()
+stats = {"chat": 0, "chat_stream": 0, "embeddings": 0, "errors": 0}
+_ids = itertools.count(1)
+
+
+async def _delay(base_ms: float):
+    jitter = CONFIG["jitter_ms"]
+    await asyncio.sleep(max(0.0, random.gauss(base_ms, jitter) if jitter else base_ms) / 1000)
+
+
+def _failure():
+    """A 503 for a configured share of requests, to exercise client retries"""
+    if CONFIG["error_rate"] and random.random() < CONFIG["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(
+            {"error": {"message": "The server is overloaded (fake)", "type": "server_error"}},
+            status_code=503
+        )
+    return None
+
+
+def _answer_tokens(messages: list) -> list:
+    seed = zlib.crc32(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) + " " for _ in range(CONFIG["answer_tokens"])]
+
+
+def _usage(prompt: str, completion_tokens: int) -> dict:
+    # 대략 4 글자 = 1 토큰
+    prompt_tokens = max(1, len(prompt) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = _failure()
+    if failure is not None:
+        return failure
+    messages = body.get("messages", [])
+    model = body.get("model", "fake")
+    tokens = _answer_tokens(messages)[:body.get("max_tokens") or CONFIG["answer_tokens"]]
+    completion_id = f"chatcmpl-fake-{next(_ids)}"
+    created = int(time.time())
+
+    if body.get("stream"):
+        stats["chat_stream"] += 1
+
+        async def events():
+            # 첫 토큰까지의 지연 후 토큰마다 token_ms 간격으로 보냄
+            await _delay(CONFIG["latency_ms"])
+            for index, token in enumerate(tokens):
+                if index:
+                    await asyncio.sleep(CONFIG["token_ms"] / 1000)
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            done = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    stats["chat"] += 1
+    await _delay(CONFIG["latency_ms"] + CONFIG["token_ms"] * len(tokens))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens).strip()},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(json.dumps(messages, ensure_ascii=False), len(tokens)),
+    }
+
+
+def _embedding(text: str) -> list:
+    vector = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(CONFIG["dimensions"])
+    return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    failure = _failure()
+    if failure is not None:
+        return failure
+    stats["embeddings"] += 1
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    await _delay(CONFIG["embedding_latency_ms"])
+    prompt_tokens = sum(len(text) // 4 for text in inputs)
+    return {
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": index, "embedding": _embedding(text)}
+            for index, text in enumerate(inputs)
+        ],
+        "model": body.get("model", "fake"),
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "config": CONFIG}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"],
+                        help="time to the first token (chat) or to the response")
+    parser.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"], help="standard deviation of the latency")
+    parser.add_argument("--token-ms", type=float, default=CONFIG["token_ms"], help="time per generated token")
+    parser.add_argument("--answer-tokens", type=int, default=CONFIG["answer_tokens"])
+    parser.add_argument("--embedding-latency-ms", type=float, default=CONFIG["embedding_latency_ms"])
+    parser.add_argument("--dimensions", type=int, default=CONFIG["dimensions"])
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"], help="share of requests answered with 503")
+    args = parser.parse_args()
+
+    CONFIG.update({key: value for key, value in vars(args).items() if key in CONFIG})
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
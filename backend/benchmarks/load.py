@@ -0,0 +1,196 @@
+"""Async load driver for the main API endpoints.
+
+Runs one scenario per endpoint against a running server (closed loop: each
+of --concurrency workers sends its next request as soon as the previous
+one finishes) and reports throughput and p50/p95/p99 latency as JSON.
+Start the server against benchmarks.fake_openai so /ai/query and the AI
+summaries of /api/search do not depend on the real API.
+
+    python -m benchmarks.fake_openai --latency-ms 300 &
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=x uvicorn main:app --port 8000 &
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --duration 30 --concurrency 16
+
+Results are written to benchmarks/results/<commit>-<time>.json (or --out)
+together with the commit and settings, so runs can be compared.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import httpx
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+QUERIES = [
+    "네트워크 보안", "라우팅 프로토콜", "캐시 설계", "데이터베이스 트랜잭션", "방화벽 설정",
+    "TCP 혼잡 제어", "load balancer", "encryption", "replication lag", "DNS 캐시",
+]
+
+
+def _search(rng: random.Random) -> dict:
+    return {"method": "POST", "url": "/api/search", "json": {"query": rng.choice(QUERIES), "limit": 10}}
+
+
+def _query(rng: random.Random) -> dict:
+    return {"method": "POST", "url": "/ai/query", "json": {"query": rng.choice(QUERIES) + "에 대해 설명해줘"}}
+
+
+def _list(rng: random.Random) -> dict:
+    return {"method": "GET", "url": "/api/knowledge", "params": {"limit": 100}}
+
+
+def _files(rng: random.Random) -> dict:
+    return {"method": "GET", "url": "/knowledge/files"}
+
+
+def _rebuild(rng: random.Random) -> dict:
+    # 작업 등록만이 아니라 재구축이 끝날 때까지의 시간을 잼
+    return {"method": "POST", "url": "/knowledge/rebuild", "params": {"wait": "true"}}
+
+
+# 이름 -> (요청 생성 함수, 동시 실행 가능 여부)
+SCENARIOS: Dict[str, tuple] = {
+    "search": (_search, True),
+    "ai_query": (_query, True),
+    "knowledge_list": (_list, True),
+    "knowledge_files": (_files, True),
+    # 재구축은 쓰기 연결 하나에서 직렬화되므로 항상 하나씩 보냄
+    "rebuild": (_rebuild, False),
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    ms = lambda seconds: round(seconds * 1000, 2)  # noqa: E731
+    return {
+        "requests": total,
+        "errors": errors + sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request: Callable[[random.Random], dict],
+                       concurrency: int, duration: float, max_requests: int, seed: int) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    sent = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int):
+        nonlocal errors, sent
+        rng = random.Random(f"{seed}:{worker_id}")
+        while time.perf_counter() < deadline and (not max_requests or sent < max_requests):
+            sent += 1
+            request = make_request(rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                # 스트리밍 응답도 본문을 끝까지 받은 시간으로 측정
+                await response.aread()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            status = str(response.status_code)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    return summarize(latencies, statuses, errors, time.perf_counter() - started)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    names = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for name in names:
+            make_request, concurrent = SCENARIOS[name]
+            concurrency = args.concurrency if concurrent else 1
+            if args.warmup:
+                await run_scenario(client, make_request, concurrency, args.duration, args.warmup, args.seed)
+            results[name] = await run_scenario(
+                client, make_request, concurrency, args.duration, args.requests, args.seed
+            )
+            results[name]["concurrency"] = concurrency
+            print(f"{name}: {json.dumps(results[name]['latency_ms'])} {results[name]['throughput_rps']} req/s")
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "max_requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "label": args.label,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per endpoint")
+    parser.add_argument("--requests", type=int, default=0, help="stop an endpoint after this many requests (0: no limit)")
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent before measuring each endpoint")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="free-form note stored with the results, e.g. the corpus size")
+    parser.add_argument("--out", type=Path, help="result file (default: benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    out = args.out
+    if out is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        out = RESULTS_DIR / f"{report['commit']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
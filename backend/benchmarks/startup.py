@@ -0,0 +1,141 @@
+"""Cold start benchmark: import time and first-request latency.
+
+Measures, each in a fresh process, how long `import main` takes and which
+heavy modules it pulls in, then starts uvicorn and records the time until
+the first successful request plus the latency of the first list, search
+and AI query requests. Run it with and without the background warm-up to
+see what the lazy imports move off the startup path.
+
+    python -m benchmarks.fake_openai &
+    python -m benchmarks.startup [--runs 5] [--warmup 0|1] [--settle 3] [--port 8010]
+
+Results are written to benchmarks/results/startup-<commit>-<time>.json
+(or --out), next to the load driver's results.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load import RESULTS_DIR, git_commit
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("sklearn", "scipy", "numpy", "openai")
+IMPORT_SCRIPT = (
+    "import sys, time, json; started = time.perf_counter(); import main; "
+    "print(json.dumps({'seconds': time.perf_counter() - started, "
+    f"'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))"
+)
+# 첫 요청 측정 순서 (이름, 메서드, 경로, 본문)
+FIRST_REQUESTS = [
+    ("knowledge_list", "GET", "/api/knowledge", None),
+    ("search", "POST", "/api/search", {"query": "네트워크 보안", "limit": 10}),
+    ("ai_query", "POST", "/ai/query", {"query": "네트워크 보안에 대해 설명해줘"}),
+]
+
+
+def _env(args) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "x")
+    env.setdefault("OPENAI_BASE_URL", args.openai_base_url)
+    env["STARTUP_WARMUP"] = str(args.warmup)
+    return env
+
+
+def measure_import(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    # 모듈이 출력하는 경고 뒤의 마지막 줄이 결과
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_server(args, env: dict) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    result = {}
+    try:
+        with httpx.Client(base_url=base_url, timeout=args.timeout) as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with {server.returncode}")
+                if time.perf_counter() - started > args.timeout:
+                    raise RuntimeError("Server did not become ready")
+                try:
+                    client.get("/metrics")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.02)
+            result["ready_s"] = time.perf_counter() - started
+            # 워밍업이 끝난 뒤의 첫 요청을 재려면 --settle 만큼 기다림
+            time.sleep(args.settle)
+            for name, method, path, body in FIRST_REQUESTS:
+                request_started = time.perf_counter()
+                response = client.request(method, path, json=body)
+                result[f"first_{name}_ms"] = (time.perf_counter() - request_started) * 1000
+                result[f"first_{name}_status"] = response.status_code
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def summarize(runs: list) -> dict:
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)) and not key.endswith("_status"):
+            values = [run[key] for run in runs]
+            summary[key] = {"median": round(statistics.median(values), 4), "min": round(min(values), 4)}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", type=int, choices=(0, 1), default=1, help="STARTUP_WARMUP for the server")
+    parser.add_argument("--settle", type=float, default=0.0, help="seconds to wait after ready before the first requests")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--openai-base-url", default="http://127.0.0.1:8100/v1")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--label", default="", help="free-form note stored with the results")
+    parser.add_argument("--out", type=Path, help="result file (default: benchmarks/results/startup-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    env = _env(args)
+    imports = [measure_import(env) for _ in range(args.runs)]
+    servers = [measure_server(args, env) for _ in range(args.runs)]
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {"runs": args.runs, "warmup": args.warmup, "settle_s": args.settle, "label": args.label},
+        "import": {
+            "seconds": summarize(imports)["seconds"],
+            "heavy_modules_loaded": imports[-1]["loaded"],
+        },
+        "server": summarize(servers),
+        "statuses": {key: value for key, value in servers[-1].items() if key.endswith("_status")},
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    out = args.out
+    if out is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        out = RESULTS_DIR / f"startup-{report['commit']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
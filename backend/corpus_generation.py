@@ -0,0 +1,127 @@
+import os
+import logging
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from database import connect, get_pool
+
+logger = logging.getLogger(__name__)
+
+# 다른 워커의 쓰기를 확인하는 최소 간격(초). 0 이면 요청마다 확인 (corpus_meta 조회 한 번, 수 µs)
+GENERATION_CHECK_INTERVAL = float(os.getenv("GENERATION_CHECK_INTERVAL", "0"))
+
+# corpus_meta 의 카운터.
+# generation: knowledge 쓰기/재구축마다 증가 (ETag, 검색 인덱스, 내보내기 워터마크)
+# embeddings: 임베딩 저장소 쓰기마다 증가
+# search_index: TF-IDF 어휘를 다시 학습해 저장할 때마다 증가 (다른 워커는 저장된 인덱스를 다시 불러옴)
+GENERATION = "generation"
+EMBEDDINGS = "embeddings"
+SEARCH_INDEX = "search_index"
+
+_values: Dict[str, int] = {}
+_lock = threading.Lock()
+_last_check = 0.0
+# 요청마다 카운터를 읽는 전용 읽기 연결 (풀의 스레드를 거치지 않음)
+_conn: Optional[sqlite3.Connection] = None
+_conn_lock = threading.Lock()
+
+
+def _observe(rows) -> Dict[str, int]:
+    """Merge counter values read from SQLite; counters only move forward"""
+    with _lock:
+        for key, value in rows:
+            if int(value) > _values.get(key, -1):
+                _values[key] = int(value)
+        return dict(_values)
+
+
+def load(conn) -> Dict[str, int]:
+    """Read the persisted counters into memory (at startup)"""
+    return _observe(conn.execute("SELECT key, value FROM corpus_meta").fetchall())
+
+
+def read(conn, key: str = GENERATION) -> int:
+    """Committed value of a counter as seen by `conn`"""
+    value = int(conn.execute("SELECT value FROM corpus_meta WHERE key = ?", (key,)).fetchone()[0])
+    return _observe([(key, value)])[key]
+
+
+def current(key: str = GENERATION) -> int:
+    """Last known value of a counter in this worker (see refresh())"""
+    return _values.get(key, 0)
+
+
+def increment(conn, key: str = GENERATION) -> int:
+    conn.execute("UPDATE corpus_meta SET value = value + 1 WHERE key = ?", (key,))
+    return int(conn.execute("SELECT value FROM corpus_meta WHERE key = ?", (key,)).fetchone()[0])
+
+
+async def bump(key: str = GENERATION) -> int:
+    """Mark the corpus as changed. Call after the change has been committed.
+
+    Bumping only after the commit means state built from old data is never
+    recorded under the new generation, here or in any other worker.
+    """
+    value = await get_pool().write(increment, key)
+    return _observe([(key, value)])[key]
+
+
+def bump_sync(key: str = GENERATION) -> int:
+    """bump() for code running outside the event loop (not inside a pool call)"""
+    value = get_pool().write_sync(increment, key)
+    return _observe([(key, value)])[key]
+
+
+def refresh_due() -> bool:
+    """Whether GENERATION_CHECK_INTERVAL has passed since the last refresh()"""
+    return not GENERATION_CHECK_INTERVAL or time.monotonic() - _last_check >= GENERATION_CHECK_INTERVAL
+
+
+def refresh() -> Dict[str, int]:
+    """Re-read the counters so writes committed by other workers are seen.
+
+    Cheap enough to call per request; derived state (response cache,
+    search index, embedding matrix) compares against current() and
+    refreshes itself lazily when a counter moved.
+    """
+    global _conn, _last_check
+    if not refresh_due():
+        return dict(_values)
+    _last_check = time.monotonic()
+    with _conn_lock:
+        if _conn is None:
+            _conn = connect(readonly=True)
+        rows = _conn.execute("SELECT key, value FROM corpus_meta").fetchall()
+    return _observe(rows)
+
+
+def close():
+    global _conn
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+class GenerationMiddleware:
+    """ASGI middleware refreshing the counters before each HTTP request.
+
+    The query runs in the threadpool so a slow read (e.g. while another
+    process checkpoints the WAL) does not block the event loop.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and refresh_due():
+            try:
+                await run_in_threadpool(refresh)
+            except sqlite3.Error as e:
+                # 확인에 실패해도 요청은 마지막으로 알던 세대로 처리
+                logger.warning(f"Error refreshing corpus generation: {e}")
+        await self.app(scope, receive, send)
@@ -1,17 +1,103 @@
 import sqlite3
 import os
+import json
+import time
+import queue
+import asyncio
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable, Optional
+
+import metrics
 
 # 현재 파일의 디렉토리를 기준으로 상대 경로 설정
 CURRENT_DIR = Path(__file__).resolve().parent
 DATABASE_URL = str(CURRENT_DIR / "data" / "knowledge.db")
-_thread_local = threading.local()
+
+# 읽기 전용 연결 수. 쓰기는 항상 하나의 연결에서 직렬화됨
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+# 연결마다 캐시하는 prepared statement 수
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024
+# 음수는 KiB 단위 (64 MiB)
+CACHE_SIZE = -64 * 1024
+
+SQLITE_QUERY_DURATION = metrics.Histogram(
+    "sqlite_query_duration_seconds", "Time to execute a SQLite statement (first step), per statement type",
+    ("statement",)
+)
+SQLITE_POOL_WAIT = metrics.Histogram(
+    "sqlite_pool_wait_seconds", "Time spent waiting for a pooled connection", ("mode",)
+)
+_statement_types: dict = {}
+
+def statement_type(sql: str) -> str:
+    """Leading keyword of a statement (select, insert, update, ...)"""
+    kind = _statement_types.get(sql)
+    if kind is None:
+        words = sql.lstrip().split(None, 1)
+        kind = words[0].lower() if words else "empty"
+        # 동적으로 만든 SQL 이 많아도 메모리가 늘지 않도록 상한을 둠
+        if len(_statement_types) < 4096:
+            _statement_types[sql] = kind
+    return kind
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - started, statement_type(sql))
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - started, statement_type(sql))
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose statements are recorded in SQLITE_QUERY_DURATION"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute 는 cursor() 를 거치지 않으므로 직접 연결
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+def connect(readonly: bool = False, path: Optional[str] = None) -> sqlite3.Connection:
+    """Open a connection with the shared PRAGMA configuration (to knowledge.db unless `path` is given)"""
+    conn = sqlite3.connect(
+        path or DATABASE_URL,
+        factory=TimedConnection,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        timeout=BUSY_TIMEOUT_MS / 1000
+    )
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = {CACHE_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
 
 def init_db():
+    """Create or migrate the schema; called once from the app lifespan (not on import)"""
     os.makedirs(os.path.dirname(DATABASE_URL), exist_ok=True)
     
-    conn = sqlite3.connect(DATABASE_URL)
+    conn = connect()
+    # WAL 모드는 데이터베이스 파일에 저장되므로 한 번만 설정하면 됨.
+    # 읽기는 쓰기 트랜잭션이 진행 중이어도 막히지 않음
+    conn.execute("PRAGMA journal_mode = WAL")
     cursor = conn.cursor()
     
     # Create tables
@@ -26,13 +112,438 @@ def init_db():
     )
     """)
     
+    migrate_knowledge_columns(cursor)
+    
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS knowledge_embeddings (
+        knowledge_id INTEGER PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        model TEXT NOT NULL,
+        embedding BLOB NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_embeddings_hash ON knowledge_embeddings(content_hash)")
+    
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS summary_cache (
+        cache_key TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_summary_cache_content ON summary_cache(content_hash)")
+    
+    # 그래프 간선. 무방향이므로 source_id < target_id 로 한 번만 저장.
+    # chosen_by 는 간선을 고른 쪽 (1: source, 2: target). 양쪽 다 고르지 않게 되면 삭제
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS knowledge_edges (
+        source_id INTEGER NOT NULL,
+        target_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        weight REAL NOT NULL,
+        chosen_by INTEGER NOT NULL DEFAULT 3,
+        PRIMARY KEY (source_id, target_id, kind)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_edges_target ON knowledge_edges(target_id)")
+    migrate_edges_table(cursor)
+    
+    # 참조 간선용: 항목을 가리킬 수 있는 이름(제목, 파일명)과 항목이 참조하는 이름 (소문자)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS knowledge_reference_keys (
+        key TEXT NOT NULL,
+        knowledge_id INTEGER NOT NULL,
+        PRIMARY KEY (key, knowledge_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_reference_keys_knowledge ON knowledge_reference_keys(knowledge_id)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS knowledge_references (
+        reference TEXT NOT NULL,
+        knowledge_id INTEGER NOT NULL,
+        PRIMARY KEY (reference, knowledge_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_references_knowledge ON knowledge_references(knowledge_id)")
+    
+    # 항목별 관련 항목 상위 k 개 (rank 는 1부터)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS knowledge_related (
+        knowledge_id INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        related_id INTEGER NOT NULL,
+        score REAL NOT NULL,
+        PRIMARY KEY (knowledge_id, rank)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_related_related ON knowledge_related(related_id)")
+    
+    # 코퍼스 세대 번호 등 작은 메타데이터. 세대는 쓰기/재구축마다 1씩 증가 (ETag 로 사용).
+    # 워커들은 요청마다 이 값을 읽어 다른 워커의 쓰기를 알아챔 (corpus_generation)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS corpus_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO corpus_meta (key, value) VALUES ('generation', 0)")
+    cursor.execute("INSERT OR IGNORE INTO corpus_meta (key, value) VALUES ('embeddings', 0)")
+    cursor.execute("INSERT OR IGNORE INTO corpus_meta (key, value) VALUES ('search_index', 0)")
+    
+    # 삭제된 행 기록. since 워터마크 이후의 삭제를 내보낼 때 사용
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS knowledge_tombstones (
+        knowledge_id INTEGER PRIMARY KEY,
+        source_file TEXT,
+        generation INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_tombstones_generation ON knowledge_tombstones(generation)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_generation ON knowledge(generation)")
+    create_generation_triggers(cursor)
+    
+    # 레벨별 필터/개수 집계용 (rowid 가 포함되므로 level 조건의 keyset 페이지도 인덱스만으로 처리)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_level ON knowledge(level)")
+    create_tag_index(cursor)
+    
+    create_fts_index(cursor)
+    migrate_tag_escapes(cursor)
+    
     conn.commit()
     conn.close()
 
-def get_db():
-    if not hasattr(_thread_local, "connection"):
-        _thread_local.connection = sqlite3.connect(DATABASE_URL, check_same_thread=False)
-    return _thread_local.connection
+# 기존 데이터베이스에 나중에 추가된 knowledge 컬럼
+KNOWLEDGE_EXTRA_COLUMNS = {
+    # 행을 만든 YAML 파일과 그 파일의 mtime/내용 해시 (증분 재구축에 사용)
+    "source_file": "TEXT",
+    "source_mtime": "REAL",
+    "source_hash": "TEXT",
+    # YAML 의 references 목록 (JSON). SQL 예약어이므로 항상 따옴표로 감싸서 사용
+    "references": "TEXT",
+    # 마지막으로 바뀐 코퍼스 세대 (내보내기의 since 워터마크에 사용)
+    "generation": "INTEGER NOT NULL DEFAULT 0",
+}
+
+# row_to_knowledge 가 기대하는 컬럼 순서
+KNOWLEDGE_COLUMNS = 'id, title, level, tags, content, summary, "references"'
+
+# JSON 으로 저장된 컬럼을 항상 유효한 JSON 텍스트(BLOB)로 읽는 SQL 식.
+# row_to_knowledge 와 같은 규칙으로 정규화하므로 응답에 디코딩 없이 그대로 이어 붙일 수 있음
+KNOWLEDGE_JSON_COLUMNS = {
+    "tags": "CASE WHEN NOT json_valid(tags) THEN '[]' WHEN json_type(tags) = 'array' THEN tags ELSE '[]' END",
+    "summary": (
+        "CASE WHEN summary IS NULL OR summary = '' THEN '{}' "
+        "WHEN json_valid(summary) THEN summary ELSE json_quote(summary) END"
+    ),
+    "references": (
+        "CASE WHEN NOT json_valid(\"references\") THEN '[]' "
+        "WHEN json_type(\"references\") = 'array' THEN \"references\" ELSE '[]' END"
+    ),
+}
+
+def knowledge_select_list(columns) -> str:
+    """SELECT list for `columns`, with JSON columns as raw JSON bytes (see fast_json.object_encoder)"""
+    return ", ".join(
+        f"CAST({KNOWLEDGE_JSON_COLUMNS[column]} AS BLOB)" if column in KNOWLEDGE_JSON_COLUMNS else column
+        for column in columns
+    )
+
+def migrate_knowledge_columns(cursor):
+    """Add knowledge columns introduced after the table was first created"""
+    cursor.execute("PRAGMA table_info(knowledge)")
+    existing = {row[1] for row in cursor.fetchall()}
+    added = False
+    for column, column_type in KNOWLEDGE_EXTRA_COLUMNS.items():
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE knowledge ADD COLUMN "{column}" {column_type}')
+            added = True
+    if added:
+        # 새 컬럼은 YAML 에서 다시 읽어야 채워지므로 다음 재구축 때 모든 파일을 다시 파싱하게 함
+        cursor.execute("UPDATE knowledge SET source_mtime = NULL, source_hash = NULL")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_knowledge_source_file ON knowledge(source_file)")
+
+def migrate_edges_table(cursor):
+    """Add the chosen_by column to an edges table created before it existed"""
+    cursor.execute("PRAGMA table_info(knowledge_edges)")
+    if "chosen_by" in {row[1] for row in cursor.fetchall()}:
+        return
+    cursor.execute("ALTER TABLE knowledge_edges ADD COLUMN chosen_by INTEGER NOT NULL DEFAULT 3")
+    # 어느 쪽이 고른 간선인지 알 수 없으므로 비워 두고 시작할 때 다시 만듦 (knowledge_graph.ensure_edges)
+    cursor.execute("DELETE FROM knowledge_edges")
+
+def create_generation_triggers(cursor):
+    """Stamp written rows with the generation the pending bump will produce.
+
+    Generations are bumped right after a write commits (see
+    corpus_generation.bump), so a row written now belongs to the
+    current generation + 1.
+    """
+    next_generation = "(SELECT value + 1 FROM corpus_meta WHERE key = 'generation')"
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS knowledge_generation_insert AFTER INSERT ON knowledge BEGIN
+        UPDATE knowledge SET generation = {next_generation} WHERE id = new.id;
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS knowledge_generation_update
+    AFTER UPDATE OF title, level, tags, content, summary, "references" ON knowledge BEGIN
+        UPDATE knowledge SET generation = {next_generation} WHERE id = new.id;
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS knowledge_generation_delete AFTER DELETE ON knowledge BEGIN
+        INSERT OR REPLACE INTO knowledge_tombstones (knowledge_id, source_file, generation)
+        VALUES (old.id, old.source_file, {next_generation});
+    END
+    """)
+
+# 트리거에서 태그 목록을 읽는 식 (배열이 아니면 태그 없음으로 취급)
+def _tag_values(row: str) -> str:
+    return (
+        f"json_each(CASE WHEN json_valid({row}.tags) AND json_type({row}.tags) = 'array' "
+        f"THEN {row}.tags ELSE '[]' END)"
+    )
+
+def create_tag_index(cursor):
+    """Create the normalized tag tables and the triggers that keep them in sync.
+
+    tags interns each tag name to an integer id; knowledge_tags holds one
+    (tag_id, knowledge_id) pair per tag of a row, with both orders indexed.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'knowledge_tags'")
+    if cursor.fetchone():
+        return
+    
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE knowledge_tags (
+        tag_id INTEGER NOT NULL,
+        knowledge_id INTEGER NOT NULL,
+        PRIMARY KEY (tag_id, knowledge_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_tags_knowledge ON knowledge_tags(knowledge_id, tag_id)")
+    
+    # UPSERT (ON CONFLICT DO UPDATE) 가 발생시킨 트리거에서는 OR IGNORE 가 무시되므로
+    # 충돌 자체가 나지 않도록 새 태그만, 중복 없이 넣음
+    insert_tags = f"""
+        INSERT INTO tags (name)
+        SELECT DISTINCT value FROM {_tag_values("new")}
+        WHERE type = 'text' AND value NOT IN (SELECT name FROM tags);
+        INSERT INTO knowledge_tags (tag_id, knowledge_id)
+        SELECT DISTINCT tags.id, new.id FROM {_tag_values("new")} AS t JOIN tags ON tags.name = t.value
+        WHERE t.type = 'text';
+    """
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS knowledge_tags_insert AFTER INSERT ON knowledge BEGIN
+        {insert_tags}
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS knowledge_tags_delete AFTER DELETE ON knowledge BEGIN
+        DELETE FROM knowledge_tags WHERE knowledge_id = old.id;
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS knowledge_tags_update AFTER UPDATE OF tags ON knowledge BEGIN
+        DELETE FROM knowledge_tags WHERE knowledge_id = old.id;
+        {insert_tags}
+    END
+    """)
+    
+    # 기존 행 색인
+    cursor.execute(f"""
+    INSERT OR IGNORE INTO tags (name)
+    SELECT DISTINCT t.value FROM knowledge AS new, {_tag_values("new")} AS t WHERE t.type = 'text'
+    """)
+    cursor.execute(f"""
+    INSERT OR IGNORE INTO knowledge_tags (tag_id, knowledge_id)
+    SELECT tags.id, new.id FROM knowledge AS new, {_tag_values("new")} AS t
+    JOIN tags ON tags.name = t.value WHERE t.type = 'text'
+    """)
+
+def create_fts_index(cursor):
+    """Create the FTS5 index over knowledge and the triggers that keep it in sync"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'knowledge_fts'")
+    if cursor.fetchone():
+        return
+    
+    # 한국어는 공백 단위 토큰화로는 검색이 잘 안 되므로 trigram 토크나이저를 우선 사용
+    # (SQLite 3.34 미만에서는 unicode61 로 대체)
+    for tokenizer in ("trigram", "unicode61 remove_diacritics 2"):
+        try:
+            cursor.execute(f"""
+            CREATE VIRTUAL TABLE knowledge_fts USING fts5(
+                title, tags, content, summary,
+                content='knowledge', content_rowid='id',
+                tokenize='{tokenizer}'
+            )
+            """)
+            break
+        except sqlite3.OperationalError:
+            continue
+    
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS knowledge_fts_insert AFTER INSERT ON knowledge BEGIN
+        INSERT INTO knowledge_fts(rowid, title, tags, content, summary)
+        VALUES (new.id, new.title, new.tags, new.content, new.summary);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS knowledge_fts_delete AFTER DELETE ON knowledge BEGIN
+        INSERT INTO knowledge_fts(knowledge_fts, rowid, title, tags, content, summary)
+        VALUES ('delete', old.id, old.title, old.tags, old.content, old.summary);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS knowledge_fts_update AFTER UPDATE OF title, tags, content, summary ON knowledge BEGIN
+        INSERT INTO knowledge_fts(knowledge_fts, rowid, title, tags, content, summary)
+        VALUES ('delete', old.id, old.title, old.tags, old.content, old.summary);
+        INSERT INTO knowledge_fts(rowid, title, tags, content, summary)
+        VALUES (new.id, new.title, new.tags, new.content, new.summary);
+    END
+    """)
+    
+    # 기존 행 색인
+    cursor.execute("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('rebuild')")
+
+def migrate_tag_escapes(cursor):
+    """Rewrite tags stored with \\uXXXX escapes (ensure_ascii) as plain UTF-8.
+
+    The FTS index sees the stored JSON text, so escaped Korean tags never
+    matched a search. The update triggers refresh the FTS and tag rows.
+    """
+    cursor.execute("SELECT id, tags FROM knowledge WHERE instr(tags, '\\u') > 0")
+    updates = []
+    for knowledge_id, tags in cursor.fetchall():
+        try:
+            rewritten = json.dumps(json.loads(tags), ensure_ascii=False)
+        except (TypeError, ValueError):
+            continue
+        if rewritten != tags:
+            updates.append((rewritten, knowledge_id))
+    if not updates:
+        return
+    cursor.executemany("UPDATE knowledge SET tags = ? WHERE id = ?", updates)
+    # 트리거가 바뀐 행에 다음 세대를 기록했으므로 세대를 올려 since 내보내기/검색 인덱스가 따라오게 함
+    cursor.execute("UPDATE corpus_meta SET value = value + 1 WHERE key = 'generation'")
+
+def row_to_knowledge(row) -> dict:
+    """Convert a row selected with KNOWLEDGE_COLUMNS into the API dictionary shape.
+
+    The references column is optional, so rows of the first six columns work too.
+    """
+    try:
+        tags = json.loads(row[3]) if isinstance(row[3], str) else row[3]
+    except json.JSONDecodeError:
+        tags = []
+    try:
+        summary = json.loads(row[5]) if row[5] else {}
+    except json.JSONDecodeError:
+        summary = row[5]
+    knowledge = {
+        "id": row[0],
+        "title": row[1],
+        "level": row[2],
+        "tags": tags if isinstance(tags, list) else [],
+        "content": row[4],
+        "summary": summary
+    }
+    if len(row) > 6:
+        try:
+            references = json.loads(row[6]) if row[6] else []
+        except json.JSONDecodeError:
+            references = []
+        knowledge["references"] = references if isinstance(references, list) else []
+    return knowledge
+
+class ConnectionPool:
+    """Small SQLite connection pool driven from a dedicated thread pool.
+
+    Reads check out one of `size` read-only connections, so several can run
+    at once. Writes are serialized on a single writer connection and run in
+    one transaction that is committed, or rolled back if the function
+    raises. Reads and writes run on separate thread pools, so queued writes
+    never hold the threads that reads need. The async helpers never block
+    the event loop.
+    """
+
+    def __init__(self, size: int = READ_POOL_SIZE):
+        self.size = size
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(size):
+            self._readers.put(connect(readonly=True))
+        self._writer = connect()
+        self._writer_lock = threading.Lock()
+        self._read_executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite-read")
+        # 쓰기는 어차피 한 연결에서 직렬화되므로 스레드 하나로 충분
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+        self._closed = False
+
+    def read_sync(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        started = time.perf_counter()
+        conn = self._readers.get()
+        SQLITE_POOL_WAIT.observe(time.perf_counter() - started, "read")
+        try:
+            return fn(conn, *args, **kwargs)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def write_sync(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        started = time.perf_counter()
+        with self._writer_lock:
+            SQLITE_POOL_WAIT.observe(time.perf_counter() - started, "write")
+            try:
+                result = fn(self._writer, *args, **kwargs)
+                self._writer.commit()
+                return result
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    async def read(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(conn, *args, **kwargs)` on a read-only connection"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, lambda: self.read_sync(fn, *args, **kwargs))
+
+    async def write(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(conn, *args, **kwargs)` in a write transaction"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write_executor, lambda: self.write_sync(fn, *args, **kwargs))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._read_executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        with self._writer_lock:
+            self._writer.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
 
-# Initialize database when the module is imported
-init_db()
+def close_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,252 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import corpus_generation
+from database import get_pool
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BATCH_SIZE = 64
+# 임베딩 모델 입력 길이 제한(8191 토큰)을 넘지 않도록 본문을 자름
+MAX_EMBEDDING_CHARS = 6000
+
+# texts -> vectors. 실제 서비스에서는 ai_service.get_embeddings, 테스트에서는 가짜 함수를 넘김
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+_lock = threading.Lock()
+_matrix: Optional[np.ndarray] = None
+_ids: Optional[np.ndarray] = None
+# 행렬을 불러올 때의 embeddings 카운터. 다른 워커가 임베딩을 쓰거나 지우면 달라져서 다시 불러옴
+# (knowledge 쓰기만으로는 행렬이 바뀌지 않으므로 코퍼스 세대는 보지 않음)
+_version = -1
+
+
+def embedding_text(title: str, content: str) -> str:
+    return f"{title or ''}\n{content or ''}"[:MAX_EMBEDDING_CHARS]
+
+
+def content_hash(text: str, model: str = EMBEDDING_MODEL) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def to_blob(vector) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def invalidate():
+    """Drop the in-memory matrix so the next lookup reloads it from SQLite"""
+    global _matrix, _ids
+    with _lock:
+        _matrix, _ids = None, None
+
+
+def _load_matrix(conn: sqlite3.Connection) -> Tuple[np.ndarray, np.ndarray]:
+    global _matrix, _ids, _version
+    with _lock:
+        version = corpus_generation.current(corpus_generation.EMBEDDINGS)
+        if _matrix is not None and _version == version:
+            return _matrix, _ids
+
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT knowledge_id, embedding FROM knowledge_embeddings WHERE model = ? ORDER BY knowledge_id",
+            (EMBEDDING_MODEL,)
+        )
+        rows = cursor.fetchall()
+        if rows:
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            # 코사인 유사도를 내적 한 번으로 계산할 수 있도록 미리 정규화
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+        else:
+            ids = np.empty(0, dtype=np.int64)
+            matrix = np.empty((0, 0), dtype=np.float32)
+        _matrix, _ids, _version = matrix.astype(np.float32, copy=False), ids, version
+        return _matrix, _ids
+
+
+def preload(conn: sqlite3.Connection):
+    """Load the matrix ahead of the first query (startup warm-up)"""
+    _load_matrix(conn)
+
+
+def top_k(conn: sqlite3.Connection, query_vector, k: int) -> List[Tuple[int, float]]:
+    """Return (knowledge_id, cosine similarity) for the k nearest stored embeddings"""
+    matrix, ids = _load_matrix(conn)
+    if not len(ids) or k <= 0:
+        return []
+
+    query = np.asarray(query_vector, dtype=np.float32)
+    if query.shape[0] != matrix.shape[1]:
+        return []
+    norm = np.linalg.norm(query)
+    if norm == 0:
+        return []
+
+    scores = matrix @ (query / norm)
+    if len(scores) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [(int(ids[i]), float(scores[i])) for i in best]
+
+
+def _chunks(values: list, size: int = 500):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _load_sync_state(conn: sqlite3.Connection, ids: Optional[List[int]]):
+    """Rows to sync with their content hash, the stored hashes of those rows,
+    and stored blobs that can be reused for the hashes that changed.
+
+    Only the requested rows and the matching embeddings are read, so
+    syncing one document does not load the whole embedding table.
+    """
+    cursor = conn.cursor()
+    if ids is None:
+        cursor.execute("SELECT id, title, content FROM knowledge")
+        fetched = cursor.fetchall()
+        cursor.execute("SELECT knowledge_id, content_hash FROM knowledge_embeddings WHERE model = ?", (EMBEDDING_MODEL,))
+        stored_hash = dict(cursor.fetchall())
+    else:
+        fetched, stored_hash = [], {}
+        for chunk in _chunks(list(ids)):
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"SELECT id, title, content FROM knowledge WHERE id IN ({placeholders})", chunk)
+            fetched.extend(cursor.fetchall())
+            cursor.execute(
+                f"SELECT knowledge_id, content_hash FROM knowledge_embeddings "
+                f"WHERE model = ? AND knowledge_id IN ({placeholders})",
+                [EMBEDDING_MODEL] + chunk
+            )
+            stored_hash.update(cursor.fetchall())
+
+    rows = []
+    for knowledge_id, title, content in fetched:
+        text = embedding_text(title, content)
+        rows.append((knowledge_id, text, content_hash(text)))
+
+    # 내용이 같은 다른 행의 임베딩은 해시 인덱스로 찾아 재사용
+    changed = list({digest for knowledge_id, _, digest in rows if stored_hash.get(knowledge_id) != digest})
+    blob_by_hash = {}
+    for chunk in _chunks(changed):
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(
+            f"SELECT content_hash, embedding FROM knowledge_embeddings "
+            f"WHERE model = ? AND content_hash IN ({placeholders}) GROUP BY content_hash",
+            [EMBEDDING_MODEL] + chunk
+        )
+        blob_by_hash.update(cursor.fetchall())
+    return rows, stored_hash, blob_by_hash
+
+
+def _apply_sync(conn: sqlite3.Connection, upserts: list, prune: bool) -> int:
+    conn.executemany("""
+        INSERT INTO knowledge_embeddings (knowledge_id, content_hash, model, embedding)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(knowledge_id) DO UPDATE SET
+            content_hash = excluded.content_hash,
+            model = excluded.model,
+            embedding = excluded.embedding
+    """, upserts)
+    if not prune:
+        return 0
+    cursor = conn.execute("""
+        DELETE FROM knowledge_embeddings
+        WHERE knowledge_id NOT IN (SELECT id FROM knowledge) OR model != ?
+    """, (EMBEDDING_MODEL,))
+    return cursor.rowcount
+
+
+async def sync_embeddings(
+    embed_fn: EmbedFn,
+    ids: Optional[List[int]] = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Dict[str, int]:
+    """Embed knowledge rows whose content hash has no stored embedding yet.
+
+    Rows are compared by content hash, so unchanged rows are skipped and rows
+    with identical content share one embedding request. With `ids=None` the
+    whole table is synchronized and embeddings of deleted rows are removed.
+    `progress(fraction, message)` is called before each embedding batch.
+    """
+    stats = {"embedded": 0, "reused": 0, "unchanged": 0, "removed": 0, "failed": 0}
+    if ids is not None and not ids:
+        return stats
+
+    pool = get_pool()
+    rows, stored_hash, blob_by_hash = await pool.read(_load_sync_state, ids)
+
+    upserts = []
+    pending: Dict[str, List[int]] = {}
+    pending_text: Dict[str, str] = {}
+    for knowledge_id, text, digest in rows:
+        if stored_hash.get(knowledge_id) == digest:
+            stats["unchanged"] += 1
+        elif digest in blob_by_hash:
+            upserts.append((knowledge_id, digest, EMBEDDING_MODEL, blob_by_hash[digest]))
+            stats["reused"] += 1
+        else:
+            pending.setdefault(digest, []).append(knowledge_id)
+            pending_text[digest] = text
+
+    digests = list(pending)
+    for start in range(0, len(digests), batch_size):
+        if progress is not None:
+            progress(start / len(digests), f"Embedded {start}/{len(digests)} texts")
+        batch = digests[start:start + batch_size]
+        vectors = await embed_fn([pending_text[digest] for digest in batch])
+        if len(vectors) != len(batch):
+            stats["failed"] += sum(len(pending[digest]) for digest in batch)
+            continue
+        for digest, vector in zip(batch, vectors):
+            blob = to_blob(vector)
+            for knowledge_id in pending[digest]:
+                upserts.append((knowledge_id, digest, EMBEDDING_MODEL, blob))
+                stats["embedded"] += 1
+
+    stats["removed"] = await pool.write(_apply_sync, upserts, ids is None)
+    if upserts or stats["removed"]:
+        invalidate()
+        # 다른 워커의 행렬도 다시 불러오게 함
+        await corpus_generation.bump(corpus_generation.EMBEDDINGS)
+    return stats
+
+
+def remove_embeddings(conn: sqlite3.Connection, ids: List[int]):
+    """Delete stored embeddings for knowledge rows that were deleted.
+
+    Bump corpus_generation.EMBEDDINGS after the commit so the other workers
+    reload their matrix.
+    """
+    if not ids:
+        return
+    placeholders = ",".join("?" * len(ids))
+    conn.execute(f"DELETE FROM knowledge_embeddings WHERE knowledge_id IN ({placeholders})", list(ids))
+    invalidate()
+
+
+if __name__ == "__main__":
+    # 오프라인 재구축: python embedding_store.py [--full]
+    import argparse
+    import asyncio
+
+    from database import close_pool, init_db
+    from ai_service import get_embeddings
+
+    parser = argparse.ArgumentParser(description="Rebuild the knowledge embedding store")
+    parser.add_argument("--full", action="store_true", help="drop all stored embeddings and re-embed every row")
+    args = parser.parse_args()
+
+    init_db()
+    if args.full:
+        get_pool().write_sync(lambda conn: conn.execute("DELETE FROM knowledge_embeddings"))
+    print(asyncio.run(sync_embeddings(get_embeddings)))
+    close_pool()
@@ -0,0 +1,177 @@
+import re
+import sqlite3
+from typing import List, Optional
+
+from database import row_to_knowledge
+
+# bm25 컬럼 가중치: title, tags, content, summary
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+SNIPPET_TOKENS = 24
+# trigram 토크나이저는 3글자 미만의 검색어를 MATCH 로 찾을 수 없음
+TRIGRAM_MIN_LENGTH = 3
+
+_tokenizer = None
+
+
+def fts_tokenizer(conn: sqlite3.Connection) -> str:
+    """Return the tokenizer the knowledge_fts table was created with"""
+    global _tokenizer
+    if _tokenizer is None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'knowledge_fts'")
+        row = cursor.fetchone()
+        _tokenizer = "trigram" if row and "trigram" in row[0] else "unicode61"
+    return _tokenizer
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _terms(query: str) -> List[str]:
+    return [term for term in re.split(r"\s+", query.strip()) if term]
+
+
+def _short_terms(terms: List[str], tokenizer: str) -> List[str]:
+    """Terms the trigram index cannot match (unicode61 indexes every term)"""
+    if tokenizer != "trigram":
+        return []
+    return [term for term in terms if len(term) < TRIGRAM_MIN_LENGTH]
+
+
+def build_match_expression(query: str, tokenizer: str) -> Optional[str]:
+    """Turn a free-text query into an FTS5 MATCH expression (every term must match).
+
+    With the trigram tokenizer, terms shorter than three characters are left
+    out; search() requires them with LIKE filters instead.
+    """
+    terms = _terms(query)
+    if tokenizer == "trigram":
+        phrases = [_quote(term) for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+    else:
+        phrases = [_quote(term) + "*" for term in terms]
+    if not phrases:
+        return None
+    return " AND ".join(phrases)
+
+
+def _like_condition(table: str, term: str) -> tuple:
+    """SQL condition (and params) that `term` appears in any indexed column"""
+    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    condition = " OR ".join(
+        f"{table}.{column} LIKE ? ESCAPE '\\'" for column in ("title", "tags", "content", "summary")
+    )
+    return f"({condition})", [pattern] * 4
+
+
+def _row_to_result(row, score: float, title_highlight: str, content_snippet: str) -> dict:
+    return {
+        "knowledge": row_to_knowledge(row),
+        "relevance_score": score,
+        "highlights": {
+            "title": title_highlight,
+            "content": content_snippet
+        }
+    }
+
+
+def _snippet(text: str, term: str, width: int = 60) -> str:
+    """Plain-Python snippet used when SQLite cannot run auxiliary functions"""
+    text = text or ""
+    position = text.lower().find(term.lower())
+    if position < 0:
+        return text[:width * 2]
+    start = max(position - width, 0)
+    end = min(position + len(term) + width, len(text))
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return (
+        prefix + text[start:position] + HIGHLIGHT_OPEN + text[position:position + len(term)]
+        + HIGHLIGHT_CLOSE + text[position + len(term):end] + suffix
+    )
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 10) -> List[dict]:
+    """Full-text search ranked by BM25 inside SQLite, returning only the top rows.
+
+    Every term must appear in a hit. Short terms the trigram index cannot
+    match are checked with LIKE on the MATCH candidates only, so the index
+    still bounds the work.
+    """
+    tokenizer = fts_tokenizer(conn)
+    expression = build_match_expression(query, tokenizer)
+    if expression is None:
+        return _search_short_terms(conn, query, limit)
+
+    filters = []
+    filter_params = []
+    for term in _short_terms(_terms(query), tokenizer):
+        condition, params = _like_condition("knowledge_fts", term)
+        filters.append(f"AND {condition}")
+        filter_params.extend(params)
+
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT k.id, k.title, k.level, k.tags, k.content, k.summary, k."references",
+               bm25(knowledge_fts, {weights}) AS score,
+               highlight(knowledge_fts, 0, ?, ?),
+               snippet(knowledge_fts, 2, ?, ?, '…', ?)
+        FROM knowledge_fts
+        JOIN knowledge k ON k.id = knowledge_fts.rowid
+        WHERE knowledge_fts MATCH ? {" ".join(filters)}
+        ORDER BY score
+        LIMIT ?
+    """, [
+        HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE,
+        HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, SNIPPET_TOKENS,
+        expression, *filter_params, limit
+    ])
+    # bm25() 는 낮을수록 관련도가 높으므로 부호를 뒤집어 반환
+    return [
+        _row_to_result(row[:7], -float(row[7]), row[8], row[9])
+        for row in cursor.fetchall()
+    ]
+
+
+def _search_short_terms(conn: sqlite3.Connection, query: str, limit: int) -> List[dict]:
+    """Fallback for queries made only of 1-2 character terms (e.g. "보안").
+
+    The trigram index cannot serve LIKE patterns shorter than three characters,
+    so this scans every row of knowledge_fts (cost grows with the corpus).
+    There is no BM25 rank either: rows matching in the title come first.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    conditions = []
+    params = []
+    for term in terms:
+        condition, term_params = _like_condition("f", term)
+        conditions.append(condition)
+        params.extend(term_params)
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT k.id, k.title, k.level, k.tags, k.content, k.summary, k."references"
+        FROM knowledge_fts f
+        JOIN knowledge k ON k.id = f.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY instr(k.title, ?) = 0, k.id
+        LIMIT ?
+    """, params + [terms[0], limit])
+
+    results = []
+    for row in cursor.fetchall():
+        title_terms = [t for t in terms if t.lower() in (row[1] or "").lower()]
+        term = next((t for t in terms if t.lower() in (row[4] or "").lower()), terms[0])
+        results.append(_row_to_result(
+            row,
+            float(len(title_terms)),
+            _snippet(row[1], title_terms[0]) if title_terms else row[1],
+            _snippet(row[4], term)
+        ))
+    return results
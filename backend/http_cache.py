@@ -0,0 +1,272 @@
+import os
+import gzip
+import zlib
+import threading
+from collections import OrderedDict
+from typing import AsyncIterable, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+import metrics
+import corpus_generation
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 직렬화된 응답 바이트 캐시 크기 (압축본 포함)
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# 이보다 작은 응답은 압축 이득보다 비용이 커서 그대로 보냄
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+JSON_MEDIA_TYPE = "application/json; charset=utf-8"
+
+
+def make_etag(generation: int, encoding: Optional[str]) -> str:
+    # 인코딩마다 바이트가 다르므로 강한 ETag 도 인코딩별로 구분
+    return f'"g{generation}-{encoding}"' if encoding else f'"g{generation}"'
+
+
+def matching_etag(if_none_match: Optional[str], generation: int) -> Optional[str]:
+    """The tag in If-None-Match that names the current generation (any encoding), if any"""
+    if not if_none_match:
+        return None
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return make_etag(generation, None)
+        value = tag[2:] if tag.startswith("W/") else tag
+        if value.strip('"').split("-", 1)[0] == f"g{generation}":
+            return tag
+    return None
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, preferring br when available"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def stream_compressor(encoding: str) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """(compress one chunk, finish) for compressing a body as it is streamed.
+
+    Each chunk is flushed so the client can decode it right away.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return (lambda data: compressor.process(data) + compressor.flush()), compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return (lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+class ResponseCache:
+    """LRU of serialized response bodies for the current corpus generation.
+
+    Each entry keeps the identity bytes and, once requested, the compressed
+    variants. Entries of older generations are never served and are dropped
+    as soon as a newer generation is stored.
+    """
+
+    def __init__(self, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[int, Dict[Optional[str], bytes]]]" = OrderedDict()
+        self._size = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, generation: int, encoding: Optional[str]) -> Optional[Tuple[bytes, Optional[str]]]:
+        """(body, encoding actually used) for a cached response, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                self.misses += 1
+                metrics.CACHE_REQUESTS.inc("http_response", "miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.CACHE_REQUESTS.inc("http_response", "hit")
+            variants = entry[1]
+            body = variants[None]
+            if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+                return body, None
+            if encoding in variants:
+                return variants[encoding], encoding
+        # 압축은 락 밖에서 수행
+        compressed = compress(body, encoding)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation and encoding not in entry[1]:
+                entry[1][encoding] = compressed
+                self._size += len(compressed)
+                self._evict()
+        return compressed, encoding
+
+    def put(self, key: str, generation: int, body: bytes, variants: Optional[Dict[str, bytes]] = None):
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            if generation < self._generation:
+                return
+            if generation > self._generation:
+                self._entries.clear()
+                self._size = 0
+                self._generation = generation
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= sum(len(variant) for variant in old[1].values())
+            stored = {None: body, **(variants or {})}
+            self._entries[key] = (generation, stored)
+            self._size += sum(len(variant) for variant in stored.values())
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            _, (_, variants) = self._entries.popitem(last=False)
+            self._size -= sum(len(variant) for variant in variants.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0
+            }
+
+
+_cache = ResponseCache()
+
+
+def get_cache() -> ResponseCache:
+    return _cache
+
+
+def _cache_key(request: Request) -> str:
+    return request.url.path + "?" + "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+
+
+def _headers(generation: int, encoding: Optional[str]) -> dict:
+    headers = {
+        "ETag": make_etag(generation, encoding),
+        "Vary": "Accept-Encoding",
+        # 캐시해도 되지만 매번 ETag 로 재검증
+        "Cache-Control": "no-cache"
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+def not_modified(request: Request) -> Optional[Response]:
+    """304 response if the client already has the current generation, without any I/O"""
+    etag = matching_etag(request.headers.get("if-none-match"), corpus_generation.current())
+    if etag is not None:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+    return None
+
+
+async def cached_response(request: Request, build: Callable[[], Awaitable[bytes]],
+                          media_type: str = JSON_MEDIA_TYPE) -> Response:
+    """Serve a read endpoint with ETag revalidation, compression and a bytes cache.
+
+    `build` produces the identity body and only runs on a cache miss.
+    """
+    response = not_modified(request)
+    if response is not None:
+        return response
+
+    generation = corpus_generation.current()
+    key = _cache_key(request)
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    cache = get_cache()
+
+    cached = cache.get(key, generation, encoding)
+    if cached is not None:
+        body, encoding = cached
+        return Response(content=body, media_type=media_type, headers=_headers(generation, encoding))
+
+    body = await build()
+    variants = {}
+    if encoding and len(body) >= COMPRESS_MIN_SIZE:
+        variants[encoding] = compress(body, encoding)
+    else:
+        encoding = None
+    headers = _headers(generation, encoding)
+    if corpus_generation.current() == generation:
+        cache.put(key, generation, body, variants)
+    else:
+        # 만드는 동안 쓰기가 끝나 어느 세대의 내용인지 알 수 없으므로 저장하지도, 태그를 붙이지도 않음
+        del headers["ETag"]
+    return Response(content=variants.get(encoding, body), media_type=media_type, headers=headers)
+
+
+async def cached_stream(request: Request, chunks: Callable[[], AsyncIterable[str]],
+                        media_type: str = JSON_MEDIA_TYPE) -> Response:
+    """Like cached_response, but a miss streams the body while it is being built.
+
+    The streamed bytes are stored once complete, so later requests for the
+    same generation are served from the cache. Streamed misses are compressed
+    chunk by chunk with the negotiated encoding. The headers (and ETag) go
+    out before the body is built, so a body during which the generation
+    moved is not cached; its ETag no longer matches once the bump is seen.
+    """
+    response = not_modified(request)
+    if response is not None:
+        return response
+
+    generation = corpus_generation.current()
+    key = _cache_key(request)
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    cache = get_cache()
+
+    cached = cache.get(key, generation, encoding)
+    if cached is not None:
+        body, encoding = cached
+        return Response(content=body, media_type=media_type, headers=_headers(generation, encoding))
+
+    async def body_iterator():
+        parts = []
+        compress_chunk, finish = stream_compressor(encoding) if encoding else (None, None)
+        async for chunk in chunks():
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            parts.append(data)
+            yield data if compress_chunk is None else compress_chunk(data)
+        if finish is not None:
+            yield finish()
+        if corpus_generation.current() == generation:
+            cache.put(key, generation, b"".join(parts))
+
+    return StreamingResponse(body_iterator(), media_type=media_type, headers=_headers(generation, encoding))
@@ -0,0 +1,434 @@
+import os
+import logging
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from database import DATABASE_URL, connect
+
+logger = logging.getLogger(__name__)
+
+# 작업 기록은 knowledge.db 와 다른 파일에 둠. 재구축이 knowledge.db 의 쓰기 잠금을 잡고 있어도
+# 작업 등록과 진행률 기록이 기다리지 않음
+JOBS_DATABASE_URL = os.getenv("JOBS_DATABASE_URL", str(Path(DATABASE_URL).with_name("jobs.db")))
+
+# 한 워커에서 동시에 실행하는 작업 수 (무거운 부분은 SQLite 풀과 스레드에서 실행됨)
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "1"))
+# 실행 중인 작업의 진행률을 SQLite 에 기록하는 간격(초). 다른 워커는 이 값을 읽음
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1.0"))
+# 같은 종류의 작업이 다른 곳에서 실행 중일 때 다시 확인하는 간격(초)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+# 끝난 작업 기록을 이만큼만 남김
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+# 재시작으로 중단된 작업을 다시 실행하는 최대 횟수 (처음 실행 포함)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+# 워커가 멈춰 끝나지 못했고 다시 실행하지도 않은 작업
+INTERRUPTED = "interrupted"
+ACTIVE = (QUEUED, RUNNING)
+
+JOB_COLUMNS = (
+    "id, kind, dedup_key, status, progress, message, params, result, error, "
+    "attempts, worker_pid, created_at, started_at, finished_at"
+)
+
+JOB_FIELDS = [column.strip() for column in JOB_COLUMNS.split(",")]
+
+JOB_DURATION = metrics.Histogram(
+    "job_duration_seconds", "Run time of background jobs by kind and final status", ("kind", "status"),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+
+# (job, params) -> 결과. 진행률은 job.report() 로 알림
+Handler = Callable[["Job", dict], Awaitable[Any]]
+
+
+def init_jobs_db():
+    """Create the jobs database; called from the app lifespan before recover()"""
+    os.makedirs(os.path.dirname(JOBS_DATABASE_URL), exist_ok=True)
+    conn = connect(path=JOBS_DATABASE_URL)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        dedup_key TEXT,
+        status TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        params TEXT,
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 1,
+        worker_pid INTEGER,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    )
+    """)
+    # 같은 키로 대기 중인 작업은 하나뿐 (겹치는 요청은 그 작업으로 합쳐짐)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(dedup_key) WHERE status = 'queued'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, dedup_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+    conn.commit()
+    conn.close()
+
+
+def _transaction(fn: Callable[..., Any], *args) -> Any:
+    """Run `fn(conn, *args)` in one short transaction on a connection of its own.
+
+    Statements of a job operation are few and tiny, so the write lock of
+    jobs.db is only held for milliseconds, in this worker and in the others.
+    """
+    conn = connect(path=JOBS_DATABASE_URL)
+    try:
+        # 중복 확인과 등록 사이에 다른 워커가 끼어들지 않도록 처음부터 쓰기 잠금을 잡음
+        conn.execute("BEGIN IMMEDIATE")
+        result = fn(conn, *args)
+        conn.commit()
+        return result
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _query(fn: Callable[..., Any], *args) -> Any:
+    conn = connect(readonly=True, path=JOBS_DATABASE_URL)
+    try:
+        return fn(conn, *args)
+    finally:
+        conn.close()
+
+
+async def _call(fn: Callable[..., Any], *args) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(None, _transaction, fn, *args)
+
+
+async def _read(fn: Callable[..., Any], *args) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(None, _query, fn, *args)
+
+
+def row_to_job(row) -> dict:
+    job = dict(zip(JOB_FIELDS, row))
+    job["params"] = json.loads(job["params"]) if job["params"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    finished = job["finished_at"] or time.time()
+    job["queued_s"] = round((job["started_at"] or finished) - job["created_at"], 3)
+    job["run_s"] = round(finished - job["started_at"], 3) if job["started_at"] else None
+    return job
+
+
+def _fetch(conn: sqlite3.Connection, job_id: str) -> Optional[dict]:
+    row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row_to_job(row) if row else None
+
+
+def _insert(conn: sqlite3.Connection, job_id: str, kind: str, dedup_key: Optional[str],
+            params: dict) -> Tuple[dict, bool]:
+    """Insert a queued job, or return the queued job with the same dedup key.
+
+    A partial unique index allows one queued job per key, so the check and
+    the insert are a single statement even across workers. A job that is
+    already running does not absorb new requests: it may have read the
+    files before the change that triggered them.
+    """
+    cursor = conn.execute("""
+        INSERT OR IGNORE INTO jobs (id, kind, dedup_key, status, params, worker_pid, created_at)
+        VALUES (?, ?, ?, 'queued', ?, ?, ?)
+    """, (job_id, kind, dedup_key, json.dumps(params, ensure_ascii=False), os.getpid(), time.time()))
+    if cursor.rowcount:
+        return _fetch(conn, job_id), True
+    row = conn.execute(
+        f"SELECT {JOB_COLUMNS} FROM jobs WHERE dedup_key = ? AND status = 'queued'", (dedup_key,)
+    ).fetchone()
+    existing = row_to_job(row)
+    if existing["worker_pid"] != os.getpid() and not metrics.pid_alive(existing["worker_pid"]):
+        # 대기 중이던 워커가 죽었으면 이 워커가 넘겨받아 실행
+        conn.execute("UPDATE jobs SET worker_pid = ? WHERE id = ?", (os.getpid(), existing["id"]))
+        existing["worker_pid"] = os.getpid()
+        return existing, True
+    return existing, False
+
+
+def _expire_dead(conn: sqlite3.Connection, rows) -> List[str]:
+    """Mark active jobs of workers that no longer exist as interrupted"""
+    expired = []
+    for job_id, pid in rows:
+        if pid == os.getpid() or metrics.pid_alive(pid):
+            continue
+        conn.execute("""
+            UPDATE jobs SET status = 'interrupted', finished_at = ?, error = 'Worker stopped before the job finished'
+            WHERE id = ? AND worker_pid = ? AND status IN ('queued', 'running')
+        """, (time.time(), job_id, pid))
+        expired.append(job_id)
+    return expired
+
+
+def _claim(conn: sqlite3.Connection, job_id: str) -> Optional[dict]:
+    """Move a queued job to running unless a job with the same key is running"""
+    job = _fetch(conn, job_id)
+    if job is None or job["status"] != QUEUED:
+        return None
+    if job["dedup_key"] is not None:
+        running = conn.execute(
+            "SELECT id, worker_pid FROM jobs WHERE dedup_key = ? AND status = 'running'", (job["dedup_key"],)
+        ).fetchall()
+        if len(_expire_dead(conn, running)) < len(running):
+            return None
+    conn.execute(
+        "UPDATE jobs SET status = 'running', started_at = ?, worker_pid = ? WHERE id = ?",
+        (time.time(), os.getpid(), job_id)
+    )
+    return _fetch(conn, job_id)
+
+
+def _finish(conn: sqlite3.Connection, job_id: str, status: str, progress: float, message: Optional[str],
+            result: Any, error: Optional[str], history: int = JOB_HISTORY):
+    conn.execute("""
+        UPDATE jobs SET status = ?, progress = ?, message = ?, result = ?, error = ?, finished_at = ?
+        WHERE id = ?
+    """, (status, progress, message, json.dumps(result, ensure_ascii=False) if result is not None else None,
+          error, time.time(), job_id))
+    conn.execute("""
+        DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND id NOT IN (
+            SELECT id FROM jobs WHERE status NOT IN ('queued', 'running') ORDER BY created_at DESC LIMIT ?
+        )
+    """, (history,))
+
+
+def _record_progress(conn: sqlite3.Connection, updates: List[Tuple[str, Tuple[float, Optional[str]]]]):
+    conn.executemany(
+        "UPDATE jobs SET progress = ?, message = ? WHERE id = ? AND status = 'running'",
+        [(progress, message, job_id) for job_id, (progress, message) in updates]
+    )
+
+
+def _list(conn: sqlite3.Connection, kind: Optional[str], status: Optional[str], limit: int) -> List[dict]:
+    clauses, params = [], []
+    if kind:
+        clauses.append("kind = ?")
+        params.append(kind)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT {JOB_COLUMNS} FROM jobs {where} ORDER BY created_at DESC LIMIT ?", params + [limit]
+    ).fetchall()
+    return [row_to_job(row) for row in rows]
+
+
+def _recover(conn: sqlite3.Connection, resumable: List[str], max_attempts: int) -> List[str]:
+    """Requeue jobs of stopped workers under this worker, or mark them interrupted.
+
+    Queued jobs are handled before running ones so that a running job whose
+    key already has a queued successor is not requeued a second time.
+    """
+    rows = conn.execute("""
+        SELECT id, kind, status, attempts, worker_pid FROM jobs
+        WHERE status IN ('queued', 'running') ORDER BY status = 'running', created_at
+    """).fetchall()
+    resumed = []
+    for job_id, kind, status, attempts, pid in rows:
+        # 이 프로세스에는 아직 작업이 없으므로 같은 pid 는 재사용된 pid
+        if pid != os.getpid() and metrics.pid_alive(pid):
+            continue
+        if kind in resumable and (status == QUEUED or attempts < max_attempts):
+            cursor = conn.execute("""
+                UPDATE OR IGNORE jobs SET status = 'queued', worker_pid = ?, progress = 0, started_at = NULL,
+                    attempts = attempts + ?, message = ?
+                WHERE id = ? AND worker_pid = ? AND status = ?
+            """, (os.getpid(), int(status == RUNNING),
+                  "Resumed after restart" if status == RUNNING else None, job_id, pid, status))
+            if cursor.rowcount:
+                resumed.append(job_id)
+                continue
+        conn.execute("""
+            UPDATE jobs SET status = 'interrupted', finished_at = ?, error = 'Server restarted before the job finished'
+            WHERE id = ? AND worker_pid = ? AND status = ?
+        """, (time.time(), job_id, pid, status))
+    return resumed
+
+
+class Job:
+    """A job run by this worker. report() may be called from any thread."""
+
+    def __init__(self, row: dict):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.params = row["params"]
+        self.progress = row["progress"]
+        self.message = row["message"]
+        self.done = asyncio.Event()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def report(self, progress: float, message: Optional[str] = None):
+        with self._lock:
+            self.progress = min(max(progress, 0.0), 1.0)
+            if message is not None:
+                self.message = message
+            self._dirty = True
+
+    def stage(self, start: float, end: float) -> Callable[[float, Optional[str]], None]:
+        """report() for a step covering [start, end] of the whole job"""
+        return lambda fraction, message=None: self.report(start + (end - start) * fraction, message)
+
+    def take_update(self) -> Optional[Tuple[float, Optional[str]]]:
+        """Progress reported since the last call, if any"""
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return self.progress, self.message
+
+    def keep_update(self):
+        """Undo take_update() after the progress could not be recorded"""
+        with self._lock:
+            self._dirty = True
+
+
+class JobRunner:
+    """Runs registered long operations in the background and records them in SQLite.
+
+    Jobs are persisted in the `jobs` table so every worker can report them;
+    each job runs in the worker that queued it, at most JOB_CONCURRENCY at a
+    time, and jobs sharing a dedup key never run concurrently.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self._handlers: Dict[str, Tuple[Handler, bool]] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._tasks = set()
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def register(self, kind: str, handler: Handler, resumable: bool = False):
+        """Add a job kind; resumable jobs are rerun when a restart interrupted them"""
+        self._handlers[kind] = (handler, resumable)
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self._handlers)
+
+    async def submit(self, kind: str, params: Optional[dict] = None,
+                     dedup_key: Optional[str] = None) -> Tuple[dict, bool]:
+        """Queue a job; returns (job, created). An equal queued job is returned instead of a new one."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job, created = await _call(_insert, uuid.uuid4().hex, kind, dedup_key, params or {})
+        if created:
+            self._start(job)
+        return job, created
+
+    def _start(self, row: dict):
+        job = Job(row)
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job):
+        handler, _ = self._handlers[job.kind]
+        try:
+            async with self._semaphore:
+                while await _call(_claim, job.id) is None:
+                    if (await _read(_fetch, job.id) or {}).get("status") != QUEUED:
+                        return
+                    await asyncio.sleep(JOB_POLL_INTERVAL)
+                started = time.perf_counter()
+                result, error = None, None
+                try:
+                    result = await handler(job, job.params)
+                    status = SUCCEEDED
+                    job.report(1.0)
+                except Exception as e:
+                    logger.warning(f"Error in {job.kind} job {job.id}: {e}")
+                    status, error = FAILED, str(e)
+                JOB_DURATION.observe(time.perf_counter() - started, job.kind, status)
+                await _call(_finish, job.id, status, job.progress, job.message, result, error)
+        except asyncio.CancelledError:
+            # 종료 중이면 행을 그대로 두어 다음 시작 때 recover() 가 다시 실행
+            raise
+        except Exception as e:
+            logger.warning(f"Error running {job.kind} job {job.id}: {e}")
+        finally:
+            self._jobs.pop(job.id, None)
+            job.done.set()
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        row = await _read(_fetch, job_id)
+        job = self._jobs.get(job_id)
+        if row is not None and job is not None and row["status"] == RUNNING:
+            # 이 워커가 실행 중이면 기록 주기를 기다리지 않은 진행률을 보여줌
+            row["progress"], row["message"] = job.progress, job.message
+        return row
+
+    async def list_jobs(self, kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> List[dict]:
+        return await _read(_list, kind, status, limit)
+
+    async def wait(self, job_id: str) -> Optional[dict]:
+        """Wait until the job finished (it may be run by another worker)"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            await job.done.wait()
+        while True:
+            row = await _read(_fetch, job_id)
+            if row is None or row["status"] not in ACTIVE:
+                return row
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    async def recover(self) -> List[str]:
+        """Handle jobs left queued or running by stopped workers (at startup)"""
+        resumable = [kind for kind, (_, can_resume) in self._handlers.items() if can_resume]
+        resumed = await _call(_recover, resumable, JOB_MAX_ATTEMPTS)
+        for job_id in resumed:
+            self._start(await _read(_fetch, job_id))
+        return resumed
+
+    def flush_progress(self):
+        updates = [(job.id, job.take_update()) for job in list(self._jobs.values())]
+        updates = [(job_id, update) for job_id, update in updates if update is not None]
+        if not updates:
+            return
+        try:
+            _transaction(_record_progress, updates)
+        except sqlite3.Error:
+            # 다음 주기에 다시 기록
+            for job_id, _ in updates:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.keep_update()
+            raise
+
+    async def run_background(self):
+        """Persist the progress of running jobs every JOB_PROGRESS_INTERVAL seconds"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+            try:
+                await loop.run_in_executor(None, self.flush_progress)
+            except Exception as e:
+                logger.warning(f"Error recording job progress: {e}")
+
+    def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+_runner = JobRunner()
+
+
+def get_runner() -> JobRunner:
+    return _runner
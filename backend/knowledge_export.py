@@ -0,0 +1,139 @@
+import json
+import zipfile
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import yaml
+
+from database import get_pool, knowledge_select_list, KNOWLEDGE_JSON_COLUMNS
+from fast_json import dumps, object_encoder
+from knowledge_manager import KNOWLEDGE_FILES_DIR
+from tag_index import knowledge_filter
+
+EXPORT_PAGE_SIZE = 200
+# YAML 파일을 zip 에 옮겨 쓸 때 한 번에 읽는 크기
+EXPORT_READ_SIZE = 1024 * 1024
+EXPORT_FIELDS = ("id", "title", "level", "tags", "content", "summary", "references", "generation")
+EXPORT_FORMATS = ("ndjson", "zip")
+
+
+def export_filter(level: Optional[int] = None, tags: Sequence[str] = (), mode: str = "all",
+                  since: Optional[int] = None) -> Tuple[str, list]:
+    """SQL conditions and parameters for the export filters"""
+    where, params = knowledge_filter(level, tags, mode)
+    if since is not None:
+        where += " AND generation > ?"
+        params.append(since)
+    return where, params
+
+
+def iter_pages(select: str, where: str, params: list) -> Iterator[list]:
+    """Keyset-paginated rows; each page is read in its own short read transaction.
+
+    Rows are not one consistent snapshot: rows written during a long export
+    may or may not be included, and a later export with `since` picks them up.
+    """
+    pool = get_pool()
+    after = 0
+    while True:
+        rows = pool.read_sync(
+            lambda conn: conn.execute(
+                f"SELECT {select} FROM knowledge WHERE id > ?{where} ORDER BY id LIMIT ?",
+                [after] + params + [EXPORT_PAGE_SIZE]
+            ).fetchall()
+        )
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+def _tombstones(since: int) -> List[tuple]:
+    return get_pool().read_sync(
+        lambda conn: conn.execute(
+            "SELECT knowledge_id, source_file, generation FROM knowledge_tombstones WHERE generation > ? ORDER BY knowledge_id",
+            (since,)
+        ).fetchall()
+    )
+
+
+def iter_ndjson(level: Optional[int] = None, tags: Sequence[str] = (), mode: str = "all",
+                since: Optional[int] = None) -> Iterator[bytes]:
+    """One JSON object per line. With `since`, rows deleted after it follow as
+    {"id": ..., "deleted": true, "source_file": ..., "generation": ...} lines
+    (level/tags do not apply to them)."""
+    where, params = export_filter(level, tags, mode, since)
+    encode = object_encoder(EXPORT_FIELDS, KNOWLEDGE_JSON_COLUMNS)
+    for rows in iter_pages(knowledge_select_list(EXPORT_FIELDS), where, params):
+        yield b"".join(encode(row) + b"\n" for row in rows)
+    if since is not None:
+        for knowledge_id, source_file, generation in _tombstones(since):
+            yield dumps({"id": knowledge_id, "deleted": True, "source_file": source_file,
+                         "generation": generation}) + b"\n"
+
+
+class _ChunkWriter:
+    """Write-only file object whose contents are drained after each zip entry.
+
+    zipfile detects that it cannot seek and writes data descriptors instead,
+    so the archive can be produced front to back without a temporary file.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _row_yaml(row) -> bytes:
+    """YAML document for a row that was not created from a file"""
+    _, title, level, tags, content, summary, references = row[:7]
+    document = {
+        "title": title,
+        "level": level,
+        "tags": json.loads(tags),
+        "content": content,
+        "summary": json.loads(summary),
+        "references": json.loads(references),
+    }
+    return yaml.dump(document, allow_unicode=True, sort_keys=False).encode("utf-8")
+
+
+def iter_zip(level: Optional[int] = None, tags: Sequence[str] = (), mode: str = "all",
+             since: Optional[int] = None) -> Iterator[bytes]:
+    """Zip of the YAML sources of the matching rows, streamed entry by entry.
+
+    Rows created from a file are exported as that file; rows created through
+    the API are rendered to YAML as knowledge_<id>.yaml.
+    """
+    where, params = export_filter(level, tags, mode, since)
+    columns = ("id", "title", "level", "tags", "content", "summary", "references")
+    select = knowledge_select_list(columns) + ", source_file"
+    writer = _ChunkWriter()
+    with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for rows in iter_pages(select, where, params):
+            for row in rows:
+                source_file = row[7]
+                path = KNOWLEDGE_FILES_DIR / source_file if source_file else None
+                if path is not None and path.is_file():
+                    with path.open("rb") as source, archive.open(source_file, "w") as target:
+                        while True:
+                            data = source.read(EXPORT_READ_SIZE)
+                            if not data:
+                                break
+                            target.write(data)
+                            yield writer.drain()
+                else:
+                    archive.writestr(source_file or f"knowledge_{row[0]}.yaml", _row_yaml(row))
+                yield writer.drain()
+    # 중앙 디렉터리
+    yield writer.drain()
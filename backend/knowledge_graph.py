@@ -0,0 +1,328 @@
+import os
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import search_index
+from database import knowledge_select_list, KNOWLEDGE_JSON_COLUMNS
+from fast_json import dumps, object_encoder, join_array
+
+# 태그 간선: 노드마다 공통 태그가 많은 순으로 최대 GRAPH_TAG_K 개까지만 연결
+# (흔한 태그 하나로 모든 노드가 서로 연결되어 간선 수가 n² 로 늘어나는 것을 막음)
+GRAPH_TAG_K = int(os.getenv("GRAPH_TAG_K", "8"))
+# 유사도 간선: TF-IDF 코사인 유사도 상위 k 개 중 임계값을 넘는 것만 연결
+GRAPH_SIMILAR_K = int(os.getenv("GRAPH_SIMILAR_K", "3"))
+GRAPH_SIMILAR_THRESHOLD = float(os.getenv("GRAPH_SIMILAR_THRESHOLD", "0.2"))
+
+EDGE_KINDS = ("tag", "reference", "similar")
+
+# knowledge_edges.chosen_by 비트: 간선을 고른 쪽
+OWNS_SOURCE = 1
+OWNS_TARGET = 2
+
+
+def _json_list(value) -> list:
+    try:
+        parsed = json.loads(value) if value else []
+    except (TypeError, json.JSONDecodeError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def _chunks(ids: List[int], size: int = 400):
+    # SQLite 바인딩 변수 개수 제한을 넘지 않도록 나눔
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _placeholders(values) -> str:
+    return ",".join("?" * len(values))
+
+
+def _existing(conn: sqlite3.Connection, ids: Iterable[int]) -> Set[int]:
+    found = set()
+    for chunk in _chunks(list(ids)):
+        found.update(row[0] for row in conn.execute(
+            f"SELECT id FROM knowledge WHERE id IN ({_placeholders(chunk)})", chunk
+        ))
+    return found
+
+
+def _tag_counts(conn: sqlite3.Connection, node_id: int, limit: int = -1) -> List[Tuple[int, float]]:
+    """(other id, number of shared tags) for nodes at most one level apart, most shared first.
+
+    As in the original client-side graph, only nodes at most one level apart
+    are linked, so the hierarchy stays readable.
+    """
+    return [(row[0], float(row[1])) for row in conn.execute("""
+        SELECT other.knowledge_id, COUNT(*) AS shared
+        FROM knowledge node
+        JOIN knowledge_tags own ON own.knowledge_id = node.id
+        JOIN knowledge_tags other ON other.tag_id = own.tag_id AND other.knowledge_id != node.id
+        JOIN knowledge k ON k.id = other.knowledge_id
+        WHERE node.id = ? AND abs(COALESCE(k.level, 0) - COALESCE(node.level, 0)) <= 1
+        GROUP BY other.knowledge_id
+        ORDER BY shared DESC, other.knowledge_id
+        LIMIT ?
+    """, (node_id, limit))]
+
+
+def _tag_choices(conn: sqlite3.Connection, ids: Iterable[int]) -> Dict[int, List[Tuple[int, float]]]:
+    """Each node's GRAPH_TAG_K nodes with the most shared tags"""
+    return {node_id: _tag_counts(conn, node_id, GRAPH_TAG_K) for node_id in ids}
+
+
+def _similar_choices(conn: sqlite3.Connection, ids: Iterable[int]) -> Dict[int, List[Tuple[int, float]]]:
+    """Each node's top GRAPH_SIMILAR_K TF-IDF neighbours above the threshold"""
+    neighbours = search_index.get_index().neighbours(list(ids), GRAPH_SIMILAR_K, GRAPH_SIMILAR_THRESHOLD)
+    present = _existing(conn, {other for pairs in neighbours.values() for other, _ in pairs})
+    return {
+        node_id: [(other, round(score, 4)) for other, score in pairs if other in present]
+        for node_id, pairs in neighbours.items()
+    }
+
+
+def _reference_choices(conn: sqlite3.Connection, ids: Iterable[int]) -> Dict[int, List[Tuple[int, float]]]:
+    """Items the nodes' references name by title or YAML filename (the lowest id per name)"""
+    choices: Dict[int, List[Tuple[int, float]]] = {}
+    for chunk in _chunks(list(ids)):
+        cursor = conn.execute(f"""
+            SELECT r.knowledge_id,
+                   (SELECT MIN(k.knowledge_id) FROM knowledge_reference_keys k WHERE k.key = r.reference)
+            FROM knowledge_references r
+            WHERE r.knowledge_id IN ({_placeholders(chunk)})
+        """, chunk)
+        for node_id, target in cursor.fetchall():
+            if target is not None and target != node_id:
+                choices.setdefault(node_id, []).append((target, 1.0))
+    return choices
+
+
+CHOICES = {"tag": _tag_choices, "reference": _reference_choices, "similar": _similar_choices}
+
+
+def _reference_keys(title: str, source_file: Optional[str]) -> List[str]:
+    keys = [(title or "").strip().lower()]
+    if source_file:
+        keys.append(source_file.lower())
+        keys.append(Path(source_file).stem.lower())
+    return [key for key in keys if key]
+
+
+def _store_reference_names(conn: sqlite3.Connection, ids: Optional[List[int]] = None):
+    """Refresh the names rows can be referenced by and the names they reference (every row when None)"""
+    if ids is None:
+        conn.execute("DELETE FROM knowledge_reference_keys")
+        conn.execute("DELETE FROM knowledge_references")
+        rows = conn.execute('SELECT id, title, "references", source_file FROM knowledge').fetchall()
+    else:
+        rows = []
+        for chunk in _chunks(ids):
+            conn.execute(f"DELETE FROM knowledge_reference_keys WHERE knowledge_id IN ({_placeholders(chunk)})", chunk)
+            conn.execute(f"DELETE FROM knowledge_references WHERE knowledge_id IN ({_placeholders(chunk)})", chunk)
+            rows.extend(conn.execute(
+                f'SELECT id, title, "references", source_file FROM knowledge WHERE id IN ({_placeholders(chunk)})',
+                chunk
+            ).fetchall())
+    conn.executemany(
+        "INSERT OR IGNORE INTO knowledge_reference_keys (key, knowledge_id) VALUES (?, ?)",
+        [(key, row[0]) for row in rows for key in _reference_keys(row[1], row[3])]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO knowledge_references (reference, knowledge_id) VALUES (?, ?)",
+        [
+            (str(reference).strip().lower(), row[0])
+            for row in rows for reference in _json_list(row[2]) if str(reference).strip()
+        ]
+    )
+
+
+def _own_edges(conn: sqlite3.Connection, kind: str, choices: Dict[int, List[Tuple[int, float]]]):
+    """Record each node's chosen edges; an edge both ends chose is stored once"""
+    conn.executemany("""
+        INSERT INTO knowledge_edges (source_id, target_id, kind, weight, chosen_by)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (source_id, target_id, kind) DO UPDATE
+        SET weight = excluded.weight, chosen_by = chosen_by | excluded.chosen_by
+    """, [
+        (min(node_id, other), max(node_id, other), kind, weight, OWNS_SOURCE if node_id < other else OWNS_TARGET)
+        for node_id, pairs in choices.items()
+        for other, weight in pairs
+    ])
+
+
+def _disown_edges(conn: sqlite3.Connection, kind: str, ids: List[int]):
+    """Withdraw the nodes' choices of `kind`, dropping edges no end chooses any more"""
+    for chunk in _chunks(ids):
+        placeholders = _placeholders(chunk)
+        conn.execute(
+            f"UPDATE knowledge_edges SET chosen_by = chosen_by & ~{OWNS_SOURCE} "
+            f"WHERE kind = ? AND source_id IN ({placeholders})",
+            [kind] + chunk
+        )
+        conn.execute(
+            f"UPDATE knowledge_edges SET chosen_by = chosen_by & ~{OWNS_TARGET} "
+            f"WHERE kind = ? AND target_id IN ({placeholders})",
+            [kind] + chunk
+        )
+        conn.execute(
+            f"DELETE FROM knowledge_edges WHERE kind = ? AND chosen_by = 0 "
+            f"AND (source_id IN ({placeholders}) OR target_id IN ({placeholders}))",
+            [kind] + chunk + chunk
+        )
+
+
+def _edge_choosers(conn: sqlite3.Connection, ids: List[int]) -> Dict[str, Set[int]]:
+    """Per kind, the nodes that chose an edge touching one of `ids`"""
+    choosers: Dict[str, Set[int]] = {kind: set() for kind in EDGE_KINDS}
+    for chunk in _chunks(ids):
+        placeholders = _placeholders(chunk)
+        cursor = conn.execute(f"""
+            SELECT source_id, target_id, kind, chosen_by FROM knowledge_edges WHERE source_id IN ({placeholders})
+            UNION
+            SELECT source_id, target_id, kind, chosen_by FROM knowledge_edges WHERE target_id IN ({placeholders})
+        """, chunk + chunk)
+        for source, target, kind, chosen_by in cursor.fetchall():
+            if chosen_by & OWNS_SOURCE:
+                choosers[kind].add(source)
+            if chosen_by & OWNS_TARGET:
+                choosers[kind].add(target)
+    return choosers
+
+
+def _weakest_choices(conn: sqlite3.Connection, kind: str, ids: List[int]) -> Dict[int, Tuple[int, Tuple[float, int]]]:
+    """(number of chosen edges, sort key of the weakest choice) of each node for `kind`.
+
+    Choices are ranked by weight, then by the lower id, so the sort key is
+    (-weight, other id) and the weakest choice has the largest key.
+    """
+    weakest: Dict[int, Tuple[int, Tuple[float, int]]] = {}
+    for chunk in _chunks(ids):
+        placeholders = _placeholders(chunk)
+        cursor = conn.execute(f"""
+            SELECT source_id, target_id, weight FROM knowledge_edges
+            WHERE kind = ? AND chosen_by & {OWNS_SOURCE} AND source_id IN ({placeholders})
+            UNION ALL
+            SELECT target_id, source_id, weight FROM knowledge_edges
+            WHERE kind = ? AND chosen_by & {OWNS_TARGET} AND target_id IN ({placeholders})
+        """, [kind] + chunk + [kind] + chunk)
+        for node_id, other, weight in cursor.fetchall():
+            count, key = weakest.get(node_id, (0, (float("-inf"), 0)))
+            weakest[node_id] = (count + 1, max(key, (-weight, other)))
+    return weakest
+
+
+def _may_choose(conn: sqlite3.Connection, kind: str, k: int, keys: Dict[int, Tuple[float, int]],
+                skip: Set[int]) -> Set[int]:
+    """Nodes whose top-k of `kind` a touched node may now enter.
+
+    `keys` holds, per node, the best (-weight, touched id) a touched node
+    scores against it; it enters when that ranks before the weakest choice.
+    """
+    candidates = [node_id for node_id in keys if node_id not in skip]
+    weakest = _weakest_choices(conn, kind, candidates)
+    return {
+        node_id for node_id in candidates
+        if node_id not in weakest or weakest[node_id][0] < k or keys[node_id] < weakest[node_id][1]
+    }
+
+
+def rebuild_edges(conn: sqlite3.Connection) -> int:
+    """Recompute the whole edges table. Runs inside the caller's write transaction"""
+    conn.execute("DELETE FROM knowledge_edges")
+    _store_reference_names(conn)
+    ids = [row[0] for row in conn.execute("SELECT id FROM knowledge")]
+    for kind in EDGE_KINDS:
+        _own_edges(conn, kind, CHOICES[kind](conn, ids))
+    return conn.execute("SELECT COUNT(*) FROM knowledge_edges").fetchone()[0]
+
+
+def update_edges(conn: sqlite3.Connection, ids: List[int]):
+    """Recompute the edges of knowledge rows that were created, updated or deleted.
+
+    Edges are the union of every node's own choices (its top-k tag and
+    similarity neighbours, the items its references name), so only nodes
+    whose choices may have changed are recomputed: the touched rows, nodes
+    that chose one of them, nodes a touched row now beats the weakest choice
+    of, and nodes referencing a name a touched row had or has.
+    Must run after search_index has been updated for the same rows.
+    """
+    if not ids:
+        return
+    ids = list(set(ids))
+    present = _existing(conn, ids)
+    affected = _edge_choosers(conn, ids)
+    for kind in EDGE_KINDS:
+        affected[kind].update(ids)
+
+    # 참조: 바뀐 행의 이전 이름과 새 이름을 참조하는 행은 참조 대상이 바뀔 수 있음
+    names = set()
+    for chunk in _chunks(ids):
+        names.update(row[0] for row in conn.execute(
+            f"SELECT key FROM knowledge_reference_keys WHERE knowledge_id IN ({_placeholders(chunk)})", chunk
+        ))
+    _store_reference_names(conn, ids)
+    for chunk in _chunks(ids):
+        names.update(row[0] for row in conn.execute(
+            f"SELECT key FROM knowledge_reference_keys WHERE knowledge_id IN ({_placeholders(chunk)})", chunk
+        ))
+    names = list(names)
+    for chunk in _chunks(names):
+        affected["reference"].update(row[0] for row in conn.execute(
+            f"SELECT knowledge_id FROM knowledge_references WHERE reference IN ({_placeholders(chunk)})", chunk
+        ))
+
+    # 태그/유사도: 바뀐 행이 상위 k 의 마지막 선택보다 앞서는 행만 목록이 바뀔 수 있음
+    tag_keys: Dict[int, Tuple[float, int]] = {}
+    for node_id in present:
+        for other, count in _tag_counts(conn, node_id):
+            tag_keys[other] = min((-count, node_id), tag_keys.get(other, (0.0, node_id)))
+    affected["tag"].update(_may_choose(conn, "tag", GRAPH_TAG_K, tag_keys, affected["tag"]))
+
+    # 유사도가 같을 때의 순서는 id 순이 아니므로 id 자리에 0 을 넣어 같은 점수면 항상 다시 계산
+    similar_keys: Dict[int, Tuple[float, int]] = {}
+    index = search_index.get_index()
+    for pairs in index.neighbours(list(present), len(index), GRAPH_SIMILAR_THRESHOLD).values():
+        for other, score in pairs:
+            similar_keys[other] = min((-round(score, 4), 0), similar_keys.get(other, (0.0, 0)))
+    affected["similar"].update(
+        _may_choose(conn, "similar", GRAPH_SIMILAR_K, similar_keys, affected["similar"])
+    )
+
+    for kind in EDGE_KINDS:
+        nodes = list(affected[kind])
+        _disown_edges(conn, kind, nodes)
+        _own_edges(conn, kind, CHOICES[kind](conn, _existing(conn, nodes)))
+
+
+def ensure_edges(conn: sqlite3.Connection):
+    """Build the edges table on first start, after it was created empty"""
+    if (
+        conn.execute("SELECT 1 FROM knowledge_edges LIMIT 1").fetchone()
+        and conn.execute("SELECT 1 FROM knowledge_reference_keys LIMIT 1").fetchone()
+    ):
+        return
+    if conn.execute("SELECT 1 FROM knowledge LIMIT 1").fetchone():
+        rebuild_edges(conn)
+
+
+NODE_COLUMNS = ("id", "title", "level", "tags")
+
+
+def graph_json(conn: sqlite3.Connection, kinds: Optional[List[str]] = None) -> bytes:
+    """Serialized {"nodes": [...], "edges": [[source, target, kind, weight], ...]}.
+
+    Nodes carry no content bodies; their stored tags JSON is spliced in as is.
+    """
+    encode = object_encoder(NODE_COLUMNS, KNOWLEDGE_JSON_COLUMNS)
+    nodes = join_array(
+        encode(row) for row in conn.execute(f"SELECT {knowledge_select_list(NODE_COLUMNS)} FROM knowledge ORDER BY id")
+    )
+    kinds = list(kinds or EDGE_KINDS)
+    placeholders = ",".join("?" * len(kinds))
+    edges = conn.execute(
+        f"SELECT source_id, target_id, kind, weight FROM knowledge_edges WHERE kind IN ({placeholders})",
+        kinds
+    ).fetchall()
+    return b'{"nodes":' + nodes + b',"edges":' + dumps(edges) + b"}"
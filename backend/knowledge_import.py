@@ -0,0 +1,194 @@
+import os
+import time
+import tarfile
+import zipfile
+import sqlite3
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+import search_index
+import knowledge_graph
+import related_index
+from knowledge_manager import (
+    KNOWLEDGE_FILES_DIR,
+    ensure_knowledge_dir,
+    parse_yaml,
+    validate_knowledge_content,
+    knowledge_row_values,
+    upsert_knowledge_rows,
+    ids_for_source_files,
+    file_digest
+)
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 한 번에 파싱 대기 중인 항목 수. 이 이상은 압축 해제를 멈추므로 메모리 사용량이 일정함
+IMPORT_MAX_PENDING = IMPORT_WORKERS * 8
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_FILE_BYTES = int(os.getenv("IMPORT_MAX_FILE_BYTES", str(5 * 1024 * 1024)))
+STAGING_SUFFIX = ".importing"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 스레드가 여러 개인 서버 프로세스에서 fork 하지 않도록 spawn 사용
+            _executor = ProcessPoolExecutor(
+                max_workers=IMPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def parse_entry(filename: str, raw: bytes) -> Tuple[str, Optional[tuple], Optional[str]]:
+    """Parse and validate one archive entry in a worker process.
+
+    Returns (filename, knowledge_row_values, None) or (filename, None, error).
+    """
+    try:
+        data = parse_yaml(raw.decode("utf-8"))
+        if not isinstance(data, dict):
+            raise ValueError("Invalid YAML format: must be a dictionary")
+        validate_knowledge_content(data)
+        return filename, knowledge_row_values(data), None
+    except yaml.YAMLError as e:
+        return filename, None, f"Invalid YAML format: {e}"
+    except Exception as e:
+        return filename, None, str(e)
+
+
+def _iter_zip(fileobj: IO[bytes]) -> Iterator[Tuple[str, int, Any]]:
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, lambda info=info: archive.read(info)
+
+
+def _iter_tar(fileobj: IO[bytes]) -> Iterator[Tuple[str, int, Any]]:
+    # 'r|*' 는 앞에서부터 순서대로만 읽으므로 아카이브 전체를 메모리에 올리지 않음 (gz/bz2/xz 자동 인식)
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, member.size, lambda member=member: archive.extractfile(member).read()
+
+
+def iter_archive(fileobj: IO[bytes]) -> Iterator[Tuple[str, int, Any]]:
+    """(name, size, read) for every regular file in a zip or tar archive"""
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        return _iter_zip(fileobj)
+    fileobj.seek(0)
+    return _iter_tar(fileobj)
+
+
+def _staging_path(filename: str) -> Path:
+    return KNOWLEDGE_FILES_DIR / f".{filename}{STAGING_SUFFIX}"
+
+
+def import_archive(conn: sqlite3.Connection, fileobj: IO[bytes], staged: List[str]) -> Dict[str, Any]:
+    """Import every *.yaml entry of an archive inside the caller's write transaction.
+
+    Entries are parsed and validated in a process pool while the archive is
+    still being read. Valid entries are written to hidden staging files,
+    whose names are appended to `staged`, and upserted in batches. The caller
+    moves the staging files into place with `commit_staged` after the
+    transaction commits, or removes them with `discard_staged` if it fails.
+    Invalid entries are reported per file.
+    """
+    started = time.perf_counter()
+    ensure_knowledge_dir()
+    tracked = {row[0] for row in conn.execute("SELECT source_file FROM knowledge WHERE source_file IS NOT NULL")}
+    executor = get_executor()
+
+    report: Dict[str, Any] = {"added": 0, "updated": 0, "skipped": 0, "errors": []}
+    pending = deque()
+    seen = set()
+    batch: List[tuple] = []
+
+    def collect(future, raw: bytes):
+        filename, values, error = future.result()
+        if error is not None:
+            report["errors"].append({"file": filename, "error": error})
+            return
+        staging = _staging_path(filename)
+        with open(staging, "wb") as f:
+            f.write(raw)
+        staged.append(filename)
+        # 스테이징 파일을 그대로 옮기므로 mtime 이 유지되어 다음 재구축에서 변경 없음으로 처리됨
+        batch.append(values + (filename, staging.stat().st_mtime, file_digest(raw)))
+        report["updated" if filename in tracked else "added"] += 1
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            upsert_knowledge_rows(conn, batch)
+            batch.clear()
+
+    try:
+        for name, size, read in iter_archive(fileobj):
+            filename = Path(name).name
+            if not filename.endswith(".yaml") or filename.startswith("."):
+                report["skipped"] += 1
+                continue
+            if filename in seen:
+                report["errors"].append({"file": name, "error": f"Duplicate file name: {filename}"})
+                continue
+            seen.add(filename)
+            if size > IMPORT_MAX_FILE_BYTES:
+                report["errors"].append({"file": name, "error": f"File is larger than {IMPORT_MAX_FILE_BYTES} bytes"})
+                continue
+
+            raw = read()
+            pending.append((executor.submit(parse_entry, filename, raw), raw))
+            while len(pending) >= IMPORT_MAX_PENDING:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+        upsert_knowledge_rows(conn, batch)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ValueError(f"Invalid archive: {e}")
+    except BrokenProcessPool:
+        # 작업 프로세스가 죽은 풀은 재사용할 수 없으므로 다음 가져오기 때 새로 만듦
+        shutdown_executor()
+        raise
+    finally:
+        for future, _ in pending:
+            future.cancel()
+
+    changed_ids = ids_for_source_files(conn, staged)
+    if changed_ids:
+        search_index.update_documents(conn, changed_ids)
+        knowledge_graph.update_edges(conn, changed_ids)
+        related_index.update_related(conn, changed_ids)
+    report["changed_ids"] = changed_ids
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+
+def commit_staged(filenames: List[str]):
+    """Move staged files over the knowledge files once the rows are committed"""
+    for filename in filenames:
+        os.replace(_staging_path(filename), KNOWLEDGE_FILES_DIR / filename)
+
+
+def discard_staged(filenames: List[str]):
+    for filename in filenames:
+        try:
+            _staging_path(filename).unlink()
+        except FileNotFoundError:
+            pass
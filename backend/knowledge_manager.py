@@ -1,36 +1,98 @@
 import os
+import time
 import yaml
 import json
+import hashlib
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
-from database import get_db, init_db
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import sqlite3
+import metrics
+import search_index
+import knowledge_graph
+import related_index
+
+# libyaml 이 설치되어 있으면 C 로더 사용 (순수 파이썬 로더보다 훨씬 빠름)
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
 KNOWLEDGE_FILES_DIR = Path(__file__).parent / "data" / "knowledge_files"
 
+YAML_PARSE_DURATION = metrics.Histogram("yaml_parse_duration_seconds", "Time to parse one YAML document")
+# 재구축 중 이 파일 수마다 진행률을 알림
+REBUILD_PROGRESS_EVERY = 200
+
+# 파싱된 YAML 캐시: 파일명 -> (mtime_ns, size, data)
+_parsed_cache: Dict[str, Tuple[int, int, Any]] = {}
+# get_all_knowledge_files 결과 캐시: 디렉토리 상태가 같으면 그대로 반환
+_listing_cache: Dict[str, Any] = {"signature": None, "files": []}
+_cache_lock = threading.Lock()
+
 def ensure_knowledge_dir():
     """Ensure the knowledge files directory exists"""
     KNOWLEDGE_FILES_DIR.mkdir(parents=True, exist_ok=True)
 
+def parse_yaml(content) -> Any:
+    """Parse YAML text or bytes with the fastest available safe loader"""
+    with YAML_PARSE_DURATION.time():
+        return yaml.load(content, Loader=YamlLoader)
+
 def load_yaml_file(file_path: Path) -> Dict[str, Any]:
     """Load a YAML file and return its contents"""
     with open(file_path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+        return parse_yaml(f)
 
 def save_yaml_file(file_path: Path, data: Dict[str, Any]):
     """Save data to a YAML file"""
     with open(file_path, 'w', encoding='utf-8') as f:
         yaml.dump(data, f, allow_unicode=True)
 
+def _scan_knowledge_dir() -> Tuple[Tuple[str, int, int], ...]:
+    """(filename, mtime_ns, size) of every YAML file, sorted by filename"""
+    entries = []
+    with os.scandir(KNOWLEDGE_FILES_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".yaml") and entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    entries.sort()
+    return tuple(entries)
+
+def _load_cached(filename: str, mtime_ns: int, size: int) -> Optional[Any]:
+    """Parsed contents of a file, re-parsed only when its mtime or size changed"""
+    cached = _parsed_cache.get(filename)
+    if cached is not None and cached[0] == mtime_ns and cached[1] == size:
+        metrics.CACHE_REQUESTS.inc("yaml_parse", "hit")
+        return cached[2]
+    metrics.CACHE_REQUESTS.inc("yaml_parse", "miss")
+    try:
+        data = load_yaml_file(KNOWLEDGE_FILES_DIR / filename)
+    except Exception as e:
+        print(f"Error loading {KNOWLEDGE_FILES_DIR / filename}: {e}")
+        data = None
+    _parsed_cache[filename] = (mtime_ns, size, data)
+    return data
+
 def get_all_knowledge_files() -> List[Dict[str, Any]]:
-    """Get all knowledge files and their metadata"""
+    """Get all knowledge files and their metadata.
+
+    The result is memoized until a file is added, removed or modified, and
+    only modified files are parsed again. Callers must not mutate it.
+    """
     ensure_knowledge_dir()
-    files = []
-    for file_path in KNOWLEDGE_FILES_DIR.glob("*.yaml"):
-        try:
-            data = load_yaml_file(file_path)
+    signature = _scan_knowledge_dir()
+    with _cache_lock:
+        if _listing_cache["signature"] == signature:
+            return _listing_cache["files"]
+        
+        files = []
+        for filename, mtime_ns, size in signature:
+            data = _load_cached(filename, mtime_ns, size)
             if isinstance(data, dict):  # 유효한 YAML 파일인지 확인
                 files.append({
-                    'filename': file_path.name,
+                    'filename': filename,
                     'title': data.get('title', ''),
                     'level': data.get('level', 1),
                     'tags': data.get('tags', []),
@@ -38,9 +100,13 @@ def get_all_knowledge_files() -> List[Dict[str, Any]]:
                     'content': data.get('content', ''),
                     'references': data.get('references', [])
                 })
-        except Exception as e:
-            print(f"Error loading {file_path}: {e}")
-    return files
+        
+        present = {filename for filename, _, _ in signature}
+        for filename in [name for name in _parsed_cache if name not in present]:
+            del _parsed_cache[filename]
+        _listing_cache["signature"] = signature
+        _listing_cache["files"] = files
+        return files
 
 def validate_knowledge_content(data):
     """Validate the knowledge file content against the template"""
@@ -72,7 +138,7 @@ def save_knowledge_file(filename: str, file_content: bytes):
     # Verify it's valid YAML before saving
     try:
         content = file_content.decode('utf-8')
-        data = yaml.safe_load(content)
+        data = parse_yaml(content)
         if not isinstance(data, dict):
             raise ValueError("Invalid YAML format: must be a dictionary")
         
@@ -103,31 +169,141 @@ def delete_knowledge_file(filename: str):
     
     file_path.unlink()
 
-def rebuild_database():
-    """Rebuild the SQLite database from YAML files"""
+def file_digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+def knowledge_row_values(data: Dict[str, Any]) -> tuple:
+    """Column values (title, level, tags, content, summary, references) for a parsed YAML document"""
+    return (
+        data.get('title', ''),
+        data.get('level', 1),
+        json.dumps(data.get('tags', []), ensure_ascii=False),
+        data.get('content', ''),
+        json.dumps(data.get('summary', ''), ensure_ascii=False),
+        json.dumps(data.get('references', []), ensure_ascii=False)
+    )
+
+def upsert_knowledge_rows(conn: sqlite3.Connection, rows: List[tuple]):
+    """Insert or update rows keyed by source_file, keeping existing row ids.
+
+    Each row is (title, level, tags, content, summary, references, source_file, source_mtime, source_hash).
+    """
+    conn.executemany("""
+        INSERT INTO knowledge (title, level, tags, content, summary, "references", source_file, source_mtime, source_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source_file) DO UPDATE SET
+            title = excluded.title,
+            level = excluded.level,
+            tags = excluded.tags,
+            content = excluded.content,
+            summary = excluded.summary,
+            "references" = excluded."references",
+            source_mtime = excluded.source_mtime,
+            source_hash = excluded.source_hash
+    """, rows)
+
+def ids_for_source_files(conn: sqlite3.Connection, filenames: List[str]) -> List[int]:
+    ids = []
+    # SQLite 바인딩 변수 개수 제한을 넘지 않도록 나눠서 조회
+    for start in range(0, len(filenames), 500):
+        chunk = filenames[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor = conn.execute(f"SELECT id FROM knowledge WHERE source_file IN ({placeholders})", chunk)
+        ids.extend(row[0] for row in cursor.fetchall())
+    return ids
+
+def _no_progress(fraction: float, message: str):
+    pass
+
+def rebuild_database(conn: sqlite3.Connection,
+                     progress: Callable[[float, str], None] = _no_progress) -> Dict[str, Any]:
+    """Incrementally sync the SQLite database with the YAML files.
+
+    Only new files and files whose mtime and content hash changed are parsed.
+    Rows of files that disappeared, and rows that were not created from a
+    file, are deleted so the table keeps mirroring data/knowledge_files.
+    Row ids of unchanged and updated files are preserved. Runs inside the
+    caller's write transaction (see database.ConnectionPool.write) and
+    returns a report of what changed. `progress(fraction, message)` is
+    called as the files are scanned and the derived indexes updated.
+    """
+    started = time.perf_counter()
     ensure_knowledge_dir()
-    
-    # Reset database
-    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM knowledge")
     
-    # Load all YAML files and insert into database
-    for file_path in KNOWLEDGE_FILES_DIR.glob("*.yaml"):
+    cursor.execute("SELECT source_file, source_mtime, source_hash FROM knowledge WHERE source_file IS NOT NULL")
+    tracked = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    
+    seen = set()
+    upserts = []
+    touched = []
+    added = updated = unchanged = 0
+    errors = []
+    files = sorted(KNOWLEDGE_FILES_DIR.glob("*.yaml"))
+    progress(0.0, f"Scanning {len(files)} files")
+    for position, file_path in enumerate(files):
+        if position % REBUILD_PROGRESS_EVERY == 0 and position:
+            # 파일 확인이 전체 작업의 대부분 (나머지는 인덱스 갱신)
+            progress(0.7 * position / len(files), f"Scanned {position}/{len(files)} files")
+        filename = file_path.name
+        seen.add(filename)
         try:
-            data = load_yaml_file(file_path)
-            if isinstance(data, dict):  # 유효한 YAML 파일인지 확인
-                cursor.execute("""
-                    INSERT INTO knowledge (title, level, tags, content, summary)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    data.get('title', ''),
-                    data.get('level', 1),
-                    json.dumps(data.get('tags', []), ensure_ascii=False),
-                    data.get('content', ''),
-                    data.get('summary', '')
-                ))
+            mtime = file_path.stat().st_mtime
+            known = tracked.get(filename)
+            if known and known[0] == mtime:
+                unchanged += 1
+                continue
+            
+            raw = file_path.read_bytes()
+            digest = file_digest(raw)
+            if known and known[1] == digest:
+                # 내용은 같고 mtime 만 바뀐 경우
+                touched.append((mtime, filename))
+                unchanged += 1
+                continue
+            
+            data = parse_yaml(raw.decode('utf-8'))
+            if not isinstance(data, dict):  # 유효한 YAML 파일인지 확인
+                raise ValueError("Invalid YAML format: must be a dictionary")
+            upserts.append(knowledge_row_values(data) + (filename, mtime, digest))
+            if known:
+                updated += 1
+            else:
+                added += 1
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
+            errors.append({"file": filename, "error": str(e)})
+    
+    # 사라진 파일의 행과 파일에서 만들어지지 않은 행 삭제
+    # (파싱에 실패한 파일의 기존 행은 유지)
+    removed_files = [filename for filename in tracked if filename not in seen]
+    deleted_ids = ids_for_source_files(conn, removed_files)
+    cursor.execute("SELECT id FROM knowledge WHERE source_file IS NULL")
+    deleted_ids.extend(row[0] for row in cursor.fetchall())
+    for start in range(0, len(deleted_ids), 500):
+        chunk = deleted_ids[start:start + 500]
+        cursor.execute(f"DELETE FROM knowledge WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+    
+    progress(0.7, f"Writing {len(upserts)} changed and deleting {len(deleted_ids)} rows")
+    upsert_knowledge_rows(conn, upserts)
+    cursor.executemany("UPDATE knowledge SET source_mtime = ? WHERE source_file = ?", touched)
+    changed_ids = ids_for_source_files(conn, [row[6] for row in upserts])
+    
+    progress(0.8, "Updating search index, graph edges and related items")
+    if deleted_ids:
+        search_index.remove_documents(conn, deleted_ids)
+    if changed_ids:
+        search_index.update_documents(conn, changed_ids)
+    knowledge_graph.update_edges(conn, changed_ids + deleted_ids)
+    related_index.update_related(conn, changed_ids + deleted_ids)
     
-    conn.commit()
+    return {
+        "added": added,
+        "updated": updated,
+        "deleted": len(deleted_ids),
+        "unchanged": unchanged,
+        "errors": errors,
+        "changed_ids": changed_ids,
+        "deleted_ids": deleted_ids,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
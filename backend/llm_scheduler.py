@@ -0,0 +1,329 @@
+import os
+import time
+import json
+import random
+import asyncio
+import hashlib
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import metrics
+
+# 동시에 진행 중인 LLM 호출 수 상한 (스트리밍 응답은 끝날 때까지 자리를 차지함)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# 분당 요청 수/토큰 수 한도. 0 이하이면 제한 없음
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# 시도 한 번의 제한 시간과 재시도를 포함한 호출 전체의 제한 시간 (초)
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "30"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))
+# 대기 시간 통계에 쓰는 최근 호출 수
+WAIT_SAMPLES = 1000
+
+
+def openai_errors() -> tuple:
+    """(retryable, timeout) exception types; openai is imported on the first LLM call, not at startup"""
+    import openai
+    retryable = (
+        openai.RateLimitError,
+        openai.APIConnectionError,  # APITimeoutError 포함
+        openai.InternalServerError,
+        openai.ConflictError,
+        asyncio.TimeoutError,
+    )
+    return retryable, (asyncio.TimeoutError, openai.APITimeoutError)
+
+
+LLM_REQUEST_DURATION = metrics.Histogram(
+    "llm_request_duration_seconds", "Latency of one upstream LLM attempt (streams: until the stream opens)",
+    ("kind", "outcome")
+)
+LLM_QUEUE_WAIT = metrics.Histogram(
+    "llm_queue_wait_seconds", "Time an LLM call waited for a slot and rate budget", ("kind",)
+)
+LLM_TOKENS = metrics.Counter("llm_tokens_total", "Tokens reported by the LLM API", ("kind", "type"))
+LLM_QUEUED = metrics.Gauge("llm_queued_calls", "LLM calls waiting for a slot or rate budget")
+LLM_RUNNING = metrics.Gauge("llm_running_calls", "LLM calls in progress (including open streams)")
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call could not complete, including retries, before its deadline"""
+
+
+def estimate_tokens(texts, max_tokens: int = 0) -> int:
+    """Rough token count of the prompt texts plus the completion budget.
+
+    The estimate is only used to reserve tokens per minute; it is corrected
+    with the usage the API reports once the call returns.
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    chars = 0
+    for text in texts:
+        chars += len(text["content"] if isinstance(text, dict) else text)
+    # 영어는 약 4 글자, 한국어는 1-2 글자가 1 토큰이므로 보수적으로 3 글자로 계산
+    return chars // 3 + 1 + (max_tokens or 0)
+
+
+def request_key(kind: str, params: Dict[str, Any]) -> str:
+    """Single-flight key of an API request (identical requests share one call)"""
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()}"
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` / 60 per second.
+
+    Tokens are reserved up front, so the balance may go negative; callers
+    sleep for the returned time, which serves reservations in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, deadline: float) -> float:
+        """Reserve `amount` tokens and return how long to wait before using them"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        # 한도보다 큰 요청도 언젠가는 보낼 수 있도록 한 번에 최대 capacity 만큼만 차감
+        amount = min(amount, self.capacity)
+        wait = max(0.0, (amount - self.tokens) / self.rate)
+        if time.monotonic() + wait > deadline:
+            raise LLMDeadlineExceeded("Rate limit wait exceeds the deadline")
+        self.tokens -= amount
+        return wait
+
+    def refund(self, amount: float):
+        """Give back (or, when negative, charge) tokens after the actual usage is known"""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def available(self) -> Optional[float]:
+        if self.rate <= 0:
+            return None
+        self._refill()
+        return self.tokens
+
+
+class LLMScheduler:
+    """Admission control for upstream LLM calls.
+
+    Every call waits for a concurrency slot and for request/token budget,
+    is retried with jittered exponential backoff on rate limits, timeouts
+    and server errors, and fails with LLMDeadlineExceeded once its deadline
+    has passed. Calls with the same key that overlap share one upstream call.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE):
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.queued = 0
+        self.max_queued = 0
+        self.running = 0
+        self.calls = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.coalesced = 0
+
+    def _ensure_loop(self):
+        # asyncio 기본 객체는 이벤트 루프에 묶이므로 루프가 바뀌면(테스트 등) 새로 만듦
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+
+    async def _acquire(self, kind: str, tokens: int, deadline: float):
+        """Wait for a concurrency slot and for rate budget; the caller releases the slot"""
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        LLM_QUEUED.set(self.queued)
+        started = time.monotonic()
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise LLMDeadlineExceeded("No free LLM slot before the deadline")
+            try:
+                wait = self.requests.reserve(1, deadline)
+                try:
+                    wait = max(wait, self.tokens.reserve(tokens, deadline))
+                except LLMDeadlineExceeded:
+                    self.requests.refund(1)
+                    raise
+                if wait:
+                    await asyncio.sleep(wait)
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.queued -= 1
+            LLM_QUEUED.set(self.queued)
+            waited = time.monotonic() - started
+            self._waits.append(waited)
+            LLM_QUEUE_WAIT.observe(waited, kind)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        # Retry-After 헤더가 있으면 따르고, 없으면 full jitter 지수 백오프
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), LLM_BACKOFF_MAX)
+            except ValueError:
+                pass
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+    def _settle(self, kind: str, estimated: int, result):
+        usage = getattr(result, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if actual is not None:
+            self.tokens.refund(estimated - actual)
+            LLM_TOKENS.inc(kind, "prompt", amount=getattr(usage, "prompt_tokens", 0) or 0)
+            LLM_TOKENS.inc(kind, "completion", amount=getattr(usage, "completion_tokens", 0) or 0)
+
+    def _set_running(self, delta: int):
+        self.running += delta
+        LLM_RUNNING.set(self.running)
+
+    async def _call(self, call: Callable[[], Awaitable], kind: str, tokens: int, deadline: float,
+                    hold: bool = False):
+        """Run `call` with admission control and retries.
+
+        With `hold`, the concurrency slot stays taken after a successful call
+        and must be released with `release()` (used for streams).
+        """
+        self.calls += 1
+        retryable_errors, timeout_errors = openai_errors()
+        attempt = 0
+        while True:
+            await self._acquire(kind, tokens, deadline)
+            self._set_running(1)
+            keep_slot = False
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await asyncio.wait_for(call(), min(LLM_ATTEMPT_TIMEOUT, deadline - time.monotonic()))
+                outcome = "ok"
+                self._settle(kind, tokens, result)
+                self.completed += 1
+                keep_slot = hold
+                return result
+            except retryable_errors as e:
+                outcome = "timeout" if isinstance(e, timeout_errors) else "retryable"
+                error = e
+            except BaseException:
+                self.failed += 1
+                raise
+            finally:
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - started, kind, outcome)
+                if not keep_slot:
+                    self._set_running(-1)
+                    self._semaphore.release()
+
+            attempt += 1
+            delay = self._backoff(attempt, error)
+            if attempt > LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                self.failed += 1
+                if isinstance(error, timeout_errors):
+                    self.timeouts += 1
+                    raise LLMDeadlineExceeded(f"LLM call timed out after {attempt} attempt(s)") from error
+                raise error
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def release(self):
+        self._set_running(-1)
+        self._semaphore.release()
+
+    async def run(self, call: Callable[[], Awaitable], tokens: int, key: Optional[str] = None,
+                  timeout: float = LLM_DEADLINE, kind: str = "chat"):
+        """Await `call()` under the scheduler; overlapping calls with the same key share one result"""
+        self._ensure_loop()
+        deadline = time.monotonic() + timeout
+        if key is None:
+            return await self._call(call, kind, tokens, deadline)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(self._call(call, kind, tokens, deadline))
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        # 먼저 요청한 쪽이 취소되어도 같은 호출을 기다리는 다른 요청은 계속 결과를 받음
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # 기다리던 쪽이 모두 취소된 경우 처리되지 않은 예외 경고를 막음
+            future.exception()
+
+    @asynccontextmanager
+    async def stream(self, call: Callable[[], Awaitable], tokens: int, timeout: float = LLM_DEADLINE,
+                     kind: str = "chat_stream"):
+        """Open a streaming call; its slot is held until the `async with` block exits.
+
+        Only opening the stream is retried. Streams are never coalesced.
+        """
+        self._ensure_loop()
+        stream = await self._call(call, kind, tokens, time.monotonic() + timeout, hold=True)
+        try:
+            yield stream
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "coalesced": self.coalesced,
+            "wait_ms": {
+                "mean": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+            "requests_available": self.requests.available(),
+            "tokens_available": self.tokens.available(),
+        }
+
+
+_scheduler = LLMScheduler()
+
+
+def get_scheduler() -> LLMScheduler:
+    return _scheduler
@@ -1,14 +1,20 @@
-from fastapi import FastAPI, Depends, HTTPException, Body, UploadFile, Response
+from fastapi import FastAPI, HTTPException, Body, UploadFile, Response, BackgroundTasks, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from typing import List
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import os
 import sqlite3
 import json
+import time
+import asyncio
 import logging
 from pathlib import Path
 import yaml
 
-from database import get_db
+from database import init_db, get_pool, close_pool, knowledge_select_list, KNOWLEDGE_JSON_COLUMNS
+from fast_json import FastJSONResponse, dumps, object_encoder
 from knowledge_manager import (
     get_all_knowledge_files,
     save_knowledge_file,
@@ -16,9 +22,78 @@ from knowledge_manager import (
     delete_knowledge_file,
     rebuild_database
 )
-from ai_service import query_knowledge
+from ai_service import (
+    query_knowledge,
+    stream_query_knowledge,
+    calculate_relevance_scores,
+    get_ai_summaries,
+    iter_ai_summaries,
+    update_embeddings,
+    invalidate_summary,
+    get_client
+)
+import search_index
+import fts_search
+import embedding_store
+import summary_cache
+import answer_cache
+import knowledge_graph
+import related_index
+import http_cache
+import corpus_generation
+import knowledge_import
+import knowledge_export
+import tag_index
+import llm_scheduler
+import metrics
+import profiler
+import jobs
+
+# 시작 직후 백그라운드에서 검색 인덱스와 OpenAI 클라이언트를 미리 불러옴 (0 이면 첫 검색/AI 요청 때 불러옴)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+
+async def warm_up():
+    """Load the TF-IDF index, embedding matrix and OpenAI client ahead of the first search"""
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, search_index.get_index)
+        await get_pool().read(embedding_store.preload)
+        await loop.run_in_executor(None, get_client)
+    except Exception as e:
+        logger.error(f"Error warming up: {str(e)}")
+        return
+    logger.info(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.0f}ms")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    pool = get_pool()
+    await pool.read(corpus_generation.load)
+    # 파생 테이블은 비어 있을 때만 다시 만듦 (그때는 검색 인덱스도 여기서 불러옴)
+    await pool.write(knowledge_graph.ensure_edges)
+    await pool.write(related_index.ensure_related)
+    jobs.init_jobs_db()
+    runner = jobs.get_runner()
+    resumed = await runner.recover()
+    if resumed:
+        logger.info(f"Resumed {len(resumed)} background jobs interrupted by a restart")
+    tasks = [asyncio.create_task(metrics.run_background()), asyncio.create_task(runner.run_background())]
+    if STARTUP_WARMUP:
+        tasks.append(asyncio.create_task(warm_up()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        runner.close()
+        search_index.flush_save()
+        metrics.remove_snapshot()
+        knowledge_import.shutdown_executor()
+        corpus_generation.close()
+        close_pool()
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # CORS 설정
 app.add_middleware(
@@ -29,6 +104,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 다른 워커가 커밋한 쓰기를 요청마다 확인 (세대 카운터 조회 한 번)
+app.add_middleware(corpus_generation.GenerationMiddleware)
+
+# 관리자 토큰이나 샘플링 비율로 켜는 요청별 프로파일링 (꺼져 있으면 바로 통과)
+app.add_middleware(profiler.ProfilerMiddleware)
+
+# 라우트별 요청 지연 시간 (가장 바깥쪽 미들웨어로 추가해 CORS 처리까지 포함)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # 정적 파일 서빙 설정
 app.mount("/data", StaticFiles(directory="data"), name="data")
 
@@ -36,6 +120,14 @@ app.mount("/data", StaticFiles(directory="data"), name="data")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def refresh_derived_tables(conn: sqlite3.Connection, ids: List[int]):
+    """Update graph edges and related items after knowledge rows changed.
+
+    Call after search_index was updated, since both read its vectors.
+    """
+    knowledge_graph.update_edges(conn, ids)
+    related_index.update_related(conn, ids)
+
 # 지식 파일 관리 API
 @app.post("/knowledge/upload")
 async def upload_knowledge_file(file: UploadFile):
@@ -45,20 +137,49 @@ async def upload_knowledge_file(file: UploadFile):
         
         content = await file.read()
         save_knowledge_file(file.filename, content)
-        return Response(
-            content=json.dumps({"message": "File uploaded successfully"}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        await corpus_generation.bump()
+        return FastJSONResponse({"message": "File uploaded successfully"})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/knowledge/import")
+async def import_knowledge_archive(background_tasks: BackgroundTasks, file: UploadFile):
+    """Import every YAML file of a zip or tar(.gz) archive in one transaction"""
+    staged = []
+    try:
+        # 업로드는 임시 파일에 저장되어 있으므로 아카이브 전체가 메모리에 올라오지 않음
+        report = await get_pool().write(knowledge_import.import_archive, file.file, staged)
+        knowledge_import.commit_staged(staged)
+    except ValueError as e:
+        knowledge_import.discard_staged(staged)
+        raise HTTPException(status_code=400, detail=str(e))
+    except sqlite3.Error as e:
+        knowledge_import.discard_staged(staged)
+        logger.error(f"Database error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        knowledge_import.discard_staged(staged)
+        logger.error(f"Error importing archive: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if report["changed_ids"]:
+        await corpus_generation.bump()
+        background_tasks.add_task(update_embeddings, report["changed_ids"])
+    logger.info(
+        f"Imported archive in {report['elapsed_ms']}ms: {report['added']} added, "
+        f"{report['updated']} updated, {len(report['errors'])} errors"
+    )
+    return FastJSONResponse({"message": "Archive imported", **report})
+
 @app.get("/knowledge/files")
-async def list_knowledge_files():
+async def list_knowledge_files(request: Request):
+    async def build() -> bytes:
+        return dumps({"files": get_all_knowledge_files()})
+    
     try:
-        files = get_all_knowledge_files()
-        return {"files": files}
+        return await http_cache.cached_response(request, build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,48 +199,216 @@ async def download_knowledge_file(filename: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/knowledge/export")
+async def export_knowledge(
+    format: str = "ndjson",
+    level: Optional[int] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_mode: str = "all",
+    since: Optional[int] = None
+):
+    """Stream the corpus as NDJSON rows or a zip of YAML files.
+
+    `since` limits the export to rows changed after that corpus generation
+    (and, for NDJSON, adds the rows deleted since). Pass the returned
+    X-Corpus-Generation header as `since` to fetch the next delta.
+    """
+    if format not in knowledge_export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(knowledge_export.EXPORT_FORMATS)}")
+    tags = parse_tag_filter(tag, tag_mode)
+
+    # 내보내기 도중 변경된 행은 다음 since 내보내기에 포함되도록 시작 시점의 세대를 돌려줌
+    generation = corpus_generation.current()
+    if format == "zip":
+        chunks = knowledge_export.iter_zip(level, tags, tag_mode, since)
+        media_type = "application/zip"
+        filename = "knowledge_export.zip"
+    else:
+        chunks = knowledge_export.iter_ndjson(level, tags, tag_mode, since)
+        media_type = "application/x-ndjson"
+        filename = "knowledge_export.ndjson"
+    # 동기 제너레이터이므로 각 페이지 조회와 압축은 스레드풀에서 실행됨
+    return StreamingResponse(chunks, media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename={filename}",
+        "X-Corpus-Generation": str(generation)
+    })
+
 @app.delete("/knowledge/files/{filename}")
 async def delete_knowledge_file_endpoint(filename: str):
     try:
         delete_knowledge_file(filename)
-        return Response(
-            content=json.dumps({"message": "File deleted successfully"}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        await corpus_generation.bump()
+        return FastJSONResponse({"message": "File deleted successfully"})
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_rebuild_job(job: jobs.Job, params: dict) -> dict:
+    """Sync the database with the YAML files; changed rows are embedded by a follow-up job"""
+    report = await get_pool().write(rebuild_database, job.report)
+    if report["changed_ids"] or report["deleted_ids"]:
+        await corpus_generation.bump()
+        embeddings_job, _ = await jobs.get_runner().submit("embeddings", dedup_key="embeddings")
+        report["embeddings_job_id"] = embeddings_job["id"]
+    logger.info(
+        f"Rebuilt database in {report['elapsed_ms']}ms: {report['added']} added, "
+        f"{report['updated']} updated, {report['deleted']} deleted, {report['unchanged']} unchanged"
+    )
+    return report
+
+async def run_embeddings_job(job: jobs.Job, params: dict) -> dict:
+    """Embed every knowledge row whose content has no stored embedding"""
+    return await update_embeddings(progress=job.report)
+
+async def run_search_index_job(job: jobs.Job, params: dict) -> dict:
+    """Refit the TF-IDF vocabulary over the whole corpus"""
+    job.report(0.0, "Refitting the TF-IDF index")
+    index = await asyncio.get_running_loop().run_in_executor(None, search_index.refit)
+    return {"documents": len(index)}
+
+# 모두 전체 코퍼스를 대상으로 하고 다시 실행해도 안전하므로 재시작 후 이어서 실행
+jobs.get_runner().register("rebuild", run_rebuild_job, resumable=True)
+jobs.get_runner().register("embeddings", run_embeddings_job, resumable=True)
+jobs.get_runner().register("search_index", run_search_index_job, resumable=True)
+
+def job_response(job: dict, created: bool) -> FastJSONResponse:
+    return FastJSONResponse({**job, "deduplicated": not created}, status_code=202)
+
 @app.post("/knowledge/rebuild")
-async def rebuild_knowledge_database():
+async def rebuild_knowledge_database(wait: bool = False):
+    """Queue a rebuild and return its job; overlapping requests share one queued job.
+
+    With `wait=true` the response is sent when the rebuild finished and
+    contains its report, as before rebuilds ran in the background.
+    """
     try:
-        rebuild_database()
-        return Response(
-            content=json.dumps({"message": "Database rebuilt successfully"}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        job, created = await jobs.get_runner().submit("rebuild", dedup_key="rebuild")
+        if not wait:
+            return job_response(job, created)
+        job = await jobs.get_runner().wait(job["id"])
+        if job["status"] != jobs.SUCCEEDED:
+            raise HTTPException(status_code=500, detail=job["error"] or f"Rebuild {job['status']}")
+        return FastJSONResponse({"message": "Database rebuilt successfully", "job_id": job["id"], **job["result"]})
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/jobs")
+async def create_job(body: dict = Body(...)):
+    """Queue a background job: {"kind": "rebuild" | "embeddings" | "search_index"}"""
+    kind = body.get("kind")
+    if kind not in jobs.get_runner().kinds:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(jobs.get_runner().kinds)}")
+    try:
+        job, created = await jobs.get_runner().submit(kind, dedup_key=kind)
+        return job_response(job, created)
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.get("/jobs")
+async def list_jobs(kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+    """Most recent jobs first, including the ones of other workers"""
+    if limit < 1 or limit > jobs.JOB_HISTORY:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {jobs.JOB_HISTORY}")
+    return FastJSONResponse({"jobs": await jobs.get_runner().list_jobs(kind, status, limit)})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, progress, timings and result or error of one job"""
+    job = await jobs.get_runner().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job)
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 # AI 검색 API
 @app.post("/ai/query")
-async def query_ai(query: dict = Body(...)):
+async def query_ai(request: Request, query: dict = Body(...)):
+    # stream=true 이거나 text/event-stream 을 요청하면 토큰 단위로 SSE 전송
+    if query.get("stream") or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_query_events(request, query["query"]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
     try:
         response = await query_knowledge(query["query"])
-        return Response(
-            content=json.dumps({"response": response}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        return FastJSONResponse({"response": response})
     except Exception as e:
         logger.error(f"Error querying AI: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_query_events(request: Request, query: str):
+    chunks = stream_query_knowledge(query)
+    try:
+        async for chunk in chunks:
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling AI query stream")
+                break
+            yield sse_event("delta", {"content": chunk})
+        else:
+            yield sse_event("done", {})
+    except Exception as e:
+        logger.error(f"Error streaming AI query: {str(e)}")
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        # 업스트림 OpenAI 스트림을 닫아 토큰 소비를 중단
+        await chunks.aclose()
+
+@app.get("/http-cache/stats")
+async def get_http_cache_stats():
+    return {"generation": corpus_generation.current(), **http_cache.get_cache().stats()}
+
+@app.get("/ai/summary-cache/stats")
+async def get_summary_cache_stats():
+    return summary_cache.get_cache().stats()
+
+@app.get("/ai/answer-cache/stats")
+async def get_answer_cache_stats():
+    return answer_cache.get_cache().stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics merged across all uvicorn workers"""
+    # 스냅샷 파일을 읽고 쓰므로 스레드풀에서 실행되는 동기 함수로 둠
+    return Response(content=metrics.collect_all(), media_type=metrics.CONTENT_TYPE)
+
+def require_profile_token(request: Request):
+    token = request.headers.get("x-profile") or request.query_params.get(profiler.PROFILE_QUERY)
+    if not profiler.authorized(token):
+        raise HTTPException(status_code=403, detail="Profile access requires PROFILE_ADMIN_TOKEN")
+
+@app.get("/debug/profiles")
+def list_request_profiles(request: Request):
+    require_profile_token(request)
+    return FastJSONResponse({"profiles": profiler.list_profiles()})
+
+@app.get("/debug/profiles/{name}")
+def download_request_profile(request: Request, name: str):
+    require_profile_token(request)
+    try:
+        path = profiler.profile_path(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
+
+@app.get("/ai/scheduler/stats")
+async def get_llm_scheduler_stats():
+    """Queue depth, wait times, retries and remaining rate budget of upstream LLM calls"""
+    return llm_scheduler.get_scheduler().stats()
+
 @app.post("/api/knowledge")
-async def create_knowledge(knowledge: dict = Body(...), db: sqlite3.Connection = Depends(get_db)):
+async def create_knowledge(background_tasks: BackgroundTasks, knowledge: dict = Body(...)):
     try:
         logger.info(f"Creating knowledge: {knowledge}")
-        cursor = db.cursor()
         
         # Validate required fields
         required_fields = ['title', 'level', 'tags']
@@ -130,116 +419,177 @@ async def create_knowledge(knowledge: dict = Body(...), db: sqlite3.Connection =
         # Ensure content and summary are initialized
         content = knowledge.get('content', '')
         summary = knowledge.get('summary', {})
-            
-        cursor.execute("""
-            INSERT INTO knowledge (title, level, tags, content, summary)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            knowledge['title'],
-            knowledge['level'],
-            json.dumps(knowledge['tags']),
-            content,
-            json.dumps(summary)
-        ))
-        db.commit()
+        
+        references = knowledge.get('references', [])
+        
+        def insert(conn: sqlite3.Connection) -> int:
+            cursor = conn.execute("""
+                INSERT INTO knowledge (title, level, tags, content, summary, "references")
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                knowledge['title'],
+                knowledge['level'],
+                json.dumps(knowledge['tags'], ensure_ascii=False),
+                content,
+                json.dumps(summary),
+                json.dumps(references, ensure_ascii=False)
+            ))
+            return cursor.lastrowid
         
         # Get the ID of the newly created knowledge
-        new_id = cursor.lastrowid
+        pool = get_pool()
+        new_id = await pool.write(insert)
         logger.info(f"Knowledge created successfully with ID: {new_id}")
+        await pool.read(search_index.update_documents, [new_id])
+        await pool.write(refresh_derived_tables, [new_id])
+        await corpus_generation.bump()
+        background_tasks.add_task(update_embeddings, [new_id])
         
-        return Response(
-            content=json.dumps({"message": "Knowledge created successfully", "id": new_id}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        return FastJSONResponse({"message": "Knowledge created successfully", "id": new_id})
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         logger.error(f"Error creating knowledge: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+# 목록 API 페이지 크기. 한 페이지 안에서도 LIST_CHUNK_SIZE 행씩 나눠 읽어 스트리밍함
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 1000
+LIST_CHUNK_SIZE = 100
+KNOWLEDGE_FIELDS = ("id", "title", "level", "tags", "content", "summary", "references")
+
+def parse_knowledge_fields(fields: Optional[str]) -> tuple:
+    """Columns selected by a `fields=` query parameter; `id` is always included"""
+    if not fields:
+        return KNOWLEDGE_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in KNOWLEDGE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(field for field in KNOWLEDGE_FIELDS if field == "id" or field in requested)
+
+def parse_tag_filter(tag: Optional[List[str]], tag_mode: str) -> List[str]:
+    if tag_mode not in tag_index.TAG_MODES:
+        raise HTTPException(status_code=400, detail=f"tag_mode must be one of: {', '.join(tag_index.TAG_MODES)}")
+    return tag_index.parse_tags(tag)
+
+def fetch_knowledge_page(conn: sqlite3.Connection, columns: tuple, after: int, limit: int,
+                         where: str = "", params: tuple = ()) -> list:
+    # id 기준 keyset 페이지네이션: OFFSET 과 달리 뒤쪽 페이지도 인덱스로 바로 찾아감
+    return conn.execute(
+        f"SELECT {knowledge_select_list(columns)} FROM knowledge WHERE id > ?{where} ORDER BY id LIMIT ?",
+        (after, *params, limit)
+    ).fetchall()
+
+def has_knowledge_after(conn: sqlite3.Connection, after: int, where: str = "", params: tuple = ()) -> bool:
+    return conn.execute(
+        f"SELECT 1 FROM knowledge WHERE id > ?{where} LIMIT 1", (after, *params)
+    ).fetchone() is not None
+
 @app.get("/api/knowledge")
-async def get_all_knowledge(db: sqlite3.Connection = Depends(get_db)):
+async def get_all_knowledge(request: Request, after: int = 0, limit: int = LIST_DEFAULT_LIMIT,
+                            fields: Optional[str] = None, level: Optional[int] = None,
+                            tag: Optional[List[str]] = Query(None), tag_mode: str = "all"):
+    """One page of knowledge rows ordered by id.
+
+    Pass the returned `next_cursor` as `after` to get the next page; it is
+    null on the last page. `fields` is a comma-separated column list.
+    `tag` may be repeated or comma-separated; `tag_mode=all` keeps rows with
+    every tag (AND), `tag_mode=any` rows with at least one (OR).
+    """
+    if limit < 1 or limit > LIST_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {LIST_MAX_LIMIT}")
+    columns = parse_knowledge_fields(fields)
+    where, params = tag_index.knowledge_filter(level, parse_tag_filter(tag, tag_mode), tag_mode)
+    params = tuple(params)
+    encode = object_encoder(columns, KNOWLEDGE_JSON_COLUMNS)
+    pool = get_pool()
+    
+    async def body():
+        yield b'{"items":['
+        cursor, remaining, first = after, limit, True
+        while remaining > 0:
+            rows = await pool.read(fetch_knowledge_page, columns, cursor, min(LIST_CHUNK_SIZE, remaining), where, params)
+            if not rows:
+                break
+            chunk = b",".join(encode(row) for row in rows)
+            yield chunk if first else b"," + chunk
+            first = False
+            cursor = rows[-1][0]
+            remaining -= len(rows)
+        
+        next_cursor = None
+        if remaining == 0 and await pool.read(has_knowledge_after, cursor, where, params):
+            next_cursor = cursor
+        yield b'],"next_cursor":' + dumps(next_cursor) + b'}'
+    
+    return await http_cache.cached_stream(request, body)
+
+# /api/knowledge/{knowledge_id} 보다 먼저 선언해야 "facets", "for-graph" 가 id 로 해석되지 않음
+@app.get("/api/knowledge/facets")
+async def get_knowledge_facets(request: Request, level: Optional[int] = None,
+                               tag: Optional[List[str]] = Query(None), tag_mode: str = "all"):
+    """Row counts per tag and per level, within the same filters as /api/knowledge"""
     try:
-        logger.info("Getting all knowledge")
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM knowledge")
-        rows = cursor.fetchall()
+        tags = parse_tag_filter(tag, tag_mode)
         
-        result = []
-        for row in rows:
-            try:
-                # Parse tags from JSON string
-                tags = json.loads(row[3]) if isinstance(row[3], str) else row[3]
-                if not isinstance(tags, list):
-                    tags = []
-                    
-                # Parse summary if exists
-                summary = None
-                if row[5]:
-                    try:
-                        summary = json.loads(row[5]) if isinstance(row[5], str) else row[5]
-                    except json.JSONDecodeError:
-                        summary = {}
-                else:
-                    summary = {}
-                
-                knowledge = {
-                    "id": row[0],
-                    "title": row[1],
-                    "level": row[2],
-                    "tags": tags,
-                    "content": row[4],
-                    "summary": summary
-                }
-                result.append(knowledge)
-                logger.info(f"Processed knowledge item: {knowledge['id']} with tags: {tags}")
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error for row {row}: {str(e)}")
-                continue
-            except Exception as e:
-                logger.error(f"Error processing row {row}: {str(e)}")
-                continue
-            
-        logger.info(f"Retrieved {len(result)} knowledge items")
-        return Response(
-            content=json.dumps({"items": result}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        async def build() -> bytes:
+            return dumps(await get_pool().read(tag_index.facets, level, tags, tag_mode))
+        
+        return await http_cache.cached_response(request, build)
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        logger.error(f"Error getting knowledge: {str(e)}")
+        logger.error(f"Error counting facets: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/knowledge/{knowledge_id}")
-async def get_knowledge(knowledge_id: int, db: sqlite3.Connection = Depends(get_db)):
+@app.get("/api/knowledge/for-graph")
+async def get_knowledge_for_graph(request: Request, kinds: Optional[str] = None):
+    """Graph nodes (without content) and precomputed edges [source, target, kind, weight]"""
     try:
-        logger.info(f"Getting knowledge with ID: {knowledge_id}")
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM knowledge WHERE id = ?", (knowledge_id,))
-        row = cursor.fetchone()
+        edge_kinds = [kind.strip() for kind in kinds.split(",") if kind.strip()] if kinds else None
+        if edge_kinds and any(kind not in knowledge_graph.EDGE_KINDS for kind in edge_kinds):
+            raise HTTPException(
+                status_code=400,
+                detail=f"kinds must be a subset of {', '.join(knowledge_graph.EDGE_KINDS)}"
+            )
+        
+        async def build() -> bytes:
+            return await get_pool().read(knowledge_graph.graph_json, edge_kinds)
         
+        return await http_cache.cached_response(request, build)
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error building knowledge graph: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/knowledge/{knowledge_id}")
+async def get_knowledge(request: Request, knowledge_id: int):
+    async def build() -> bytes:
+        row = await get_pool().read(
+            lambda conn: conn.execute(
+                f"SELECT {knowledge_select_list(KNOWLEDGE_FIELDS)} FROM knowledge WHERE id = ?", (knowledge_id,)
+            ).fetchone()
+        )
         if not row:
             logger.error(f"Knowledge not found with ID: {knowledge_id}")
             raise HTTPException(status_code=404, detail="Knowledge not found")
-            
-        knowledge = {
-            "id": row[0],
-            "title": row[1],
-            "level": row[2],
-            "tags": json.loads(row[3]),
-            "content": row[4],
-            "summary": json.loads(row[5]) if row[5] else {}
-        }
-        logger.info(f"Retrieved knowledge with ID: {knowledge_id}")
-        return Response(
-            content=json.dumps(knowledge, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        return object_encoder(KNOWLEDGE_FIELDS, KNOWLEDGE_JSON_COLUMNS)(row)
+    
+    try:
+        return await http_cache.cached_response(request, build)
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -248,41 +598,43 @@ async def get_knowledge(knowledge_id: int, db: sqlite3.Connection = Depends(get_
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/knowledge/{knowledge_id}")
-async def delete_knowledge(knowledge_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def delete_knowledge(knowledge_id: int):
     try:
         logger.info(f"Deleting knowledge with ID: {knowledge_id}")
-        cursor = db.cursor()
-        cursor.execute("SELECT id FROM knowledge WHERE id = ?", (knowledge_id,))
-        if not cursor.fetchone():
+        
+        def delete(conn: sqlite3.Connection):
+            old_row = conn.execute("SELECT title, content FROM knowledge WHERE id = ?", (knowledge_id,)).fetchone()
+            if old_row:
+                conn.execute("DELETE FROM knowledge WHERE id = ?", (knowledge_id,))
+                embedding_store.remove_embeddings(conn, [knowledge_id])
+            return old_row
+        
+        pool = get_pool()
+        old_row = await pool.write(delete)
+        if not old_row:
             logger.error(f"Knowledge not found with ID: {knowledge_id}")
             raise HTTPException(status_code=404, detail="Knowledge not found")
             
-        cursor.execute("DELETE FROM knowledge WHERE id = ?", (knowledge_id,))
-        db.commit()
+        await invalidate_summary(f"{old_row[0]}\n{old_row[1]}")
+        await pool.read(search_index.remove_documents, [knowledge_id])
+        await pool.write(refresh_derived_tables, [knowledge_id])
+        await corpus_generation.bump()
+        await corpus_generation.bump(corpus_generation.EMBEDDINGS)
         logger.info(f"Knowledge deleted successfully with ID: {knowledge_id}")
-        return Response(
-            content=json.dumps({"message": "Knowledge deleted successfully"}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        return FastJSONResponse({"message": "Knowledge deleted successfully"})
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         logger.error(f"Error deleting knowledge: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/knowledge/{knowledge_id}")
-async def update_knowledge(knowledge_id: int, knowledge: dict = Body(...), db: sqlite3.Connection = Depends(get_db)):
+async def update_knowledge(knowledge_id: int, background_tasks: BackgroundTasks, knowledge: dict = Body(...)):
     try:
         logger.info(f"Updating knowledge {knowledge_id}: {knowledge}")
-        cursor = db.cursor()
-        
-        # Check if knowledge exists
-        cursor.execute("SELECT * FROM knowledge WHERE id = ?", (knowledge_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Knowledge not found")
         
         # Validate required fields
         required_fields = ['title', 'level', 'tags']
@@ -293,75 +645,71 @@ async def update_knowledge(knowledge_id: int, knowledge: dict = Body(...), db: s
         # Ensure content and summary are initialized
         content = knowledge.get('content', '')
         summary = knowledge.get('summary', {})
-            
-        cursor.execute("""
-            UPDATE knowledge 
-            SET title = ?, level = ?, tags = ?, content = ?, summary = ?
-            WHERE id = ?
-        """, (
-            knowledge['title'],
-            knowledge['level'],
-            json.dumps(knowledge['tags']),
-            content,
-            json.dumps(summary),
-            knowledge_id
-        ))
-        db.commit()
+        references = knowledge.get('references', [])
         
-        return Response(
-            content=json.dumps({"message": "Knowledge updated successfully"}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        def update(conn: sqlite3.Connection):
+            # Check if knowledge exists
+            old_row = conn.execute("SELECT title, content FROM knowledge WHERE id = ?", (knowledge_id,)).fetchone()
+            if not old_row:
+                return None
+            conn.execute("""
+                UPDATE knowledge 
+                SET title = ?, level = ?, tags = ?, content = ?, summary = ?, "references" = ?
+                WHERE id = ?
+            """, (
+                knowledge['title'],
+                knowledge['level'],
+                json.dumps(knowledge['tags'], ensure_ascii=False),
+                content,
+                json.dumps(summary),
+                json.dumps(references, ensure_ascii=False),
+                knowledge_id
+            ))
+            return old_row
+        
+        pool = get_pool()
+        old_row = await pool.write(update)
+        if not old_row:
+            raise HTTPException(status_code=404, detail="Knowledge not found")
+        
+        await pool.read(search_index.update_documents, [knowledge_id])
+        await pool.write(refresh_derived_tables, [knowledge_id])
+        await corpus_generation.bump()
+        background_tasks.add_task(update_embeddings, [knowledge_id])
+        if (old_row[0], old_row[1]) != (knowledge['title'], content):
+            await invalidate_summary(f"{old_row[0]}\n{old_row[1]}")
+        
+        return FastJSONResponse({"message": "Knowledge updated successfully"})
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         logger.error(f"Error updating knowledge: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/knowledge/{knowledge_id}/related")
-async def get_related_knowledge(knowledge_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def get_related_knowledge(
+    request: Request,
+    knowledge_id: int,
+    k: int = related_index.RELATED_DEFAULT_K,
+    threshold: float = related_index.RELATED_DEFAULT_THRESHOLD
+):
     try:
-        logger.info(f"Getting related knowledge for ID: {knowledge_id}")
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM knowledge WHERE id = ?", (knowledge_id,))
-        row = cursor.fetchone()
-        
-        if not row:
-            logger.error(f"Knowledge not found with ID: {knowledge_id}")
-            raise HTTPException(status_code=404, detail="Knowledge not found")
+        if k < 1 or k > related_index.RELATED_STORE_K:
+            raise HTTPException(status_code=400, detail=f"k must be between 1 and {related_index.RELATED_STORE_K}")
         
-        knowledge = {
-            "id": row[0],
-            "title": row[1],
-            "level": row[2],
-            "tags": json.loads(row[3]),
-            "content": row[4],
-            "summary": json.loads(row[5]) if row[5] else {}
-        }
-        
-        cursor.execute("SELECT * FROM knowledge")
-        rows = cursor.fetchall()
-        all_knowledge = []
-        for row in rows:
-            k = {
-                "id": row[0],
-                "title": row[1],
-                "level": row[2],
-                "tags": json.loads(row[3]),
-                "content": row[4],
-                "summary": json.loads(row[5]) if row[5] else {}
-            }
-            all_knowledge.append(k)
+        async def build() -> bytes:
+            related_items = await get_pool().read(related_index.related_items, knowledge_id, k, threshold)
+            if related_items is None:
+                logger.error(f"Knowledge not found with ID: {knowledge_id}")
+                raise HTTPException(status_code=404, detail="Knowledge not found")
+            return dumps(related_items)
         
-        related_items = find_related_knowledge(knowledge, all_knowledge)
-        logger.info(f"Retrieved related knowledge for ID: {knowledge_id}")
-        return Response(
-            content=json.dumps(related_items, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        return await http_cache.cached_response(request, build)
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -369,42 +717,39 @@ async def get_related_knowledge(knowledge_id: int, db: sqlite3.Connection = Depe
         logger.error(f"Error getting related knowledge: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def rank_search_results(conn: sqlite3.Connection, query: dict) -> list:
+    """Rank knowledge for a search request without generating AI summaries"""
+    mode = query.get('mode', 'tfidf')
+    limit = max(1, min(int(query.get('limit', 10)), 50))
+    
+    if mode == 'fts':
+        # 매칭과 BM25 랭킹을 SQLite 에서 처리하고 상위 limit 개 행만 가져옴
+        return fts_search.search(conn, query['query'], limit)
+    if mode == 'tfidf':
+        return [
+            {"knowledge": knowledge, "relevance_score": float(score)}
+            for knowledge, score in calculate_relevance_scores(query['query'], top_k=limit, conn=conn)
+        ]
+    raise HTTPException(status_code=400, detail=f"Unknown search mode: {mode}")
+
+def summary_input(result: dict) -> str:
+    knowledge = result["knowledge"]
+    return f"{knowledge['title']}\n{knowledge['content']}"
+
 @app.post("/api/search")
-async def search_knowledge(query: dict = Body(...), db: sqlite3.Connection = Depends(get_db)):
+async def search_knowledge(query: dict = Body(...)):
     try:
         logger.info(f"Searching knowledge with query: {query}")
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM knowledge")
-        rows = cursor.fetchall()
-        
-        all_knowledge = []
-        for row in rows:
-            knowledge = {
-                "id": row[0],
-                "title": row[1],
-                "level": row[2],
-                "tags": json.loads(row[3]),
-                "content": row[4],
-                "summary": json.loads(row[5]) if row[5] else {}
-            }
-            all_knowledge.append(knowledge)
+        search_results = await get_pool().read(rank_search_results, query)
         
-        scored_results = calculate_relevance_scores(query['query'], all_knowledge)
-        
-        search_results = []
-        for knowledge, score in scored_results[:10]:  
-            result = {
-                "knowledge": knowledge,
-                "relevance_score": float(score),
-                "ai_summary": await get_ai_summary(f"{knowledge['title']}\n{knowledge['content']}")
-            }
-            search_results.append(result)
+        summaries = await get_ai_summaries([summary_input(result) for result in search_results])
+        for result, summary in zip(search_results, summaries):
+            result["ai_summary"] = summary
         
         logger.info(f"Retrieved search results for query: {query}")
-        return Response(
-            content=json.dumps(search_results, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        return FastJSONResponse(search_results)
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -412,34 +757,33 @@ async def search_knowledge(query: dict = Body(...), db: sqlite3.Connection = Dep
         logger.error(f"Error searching knowledge: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/knowledge/for-graph")
-async def get_knowledge_for_graph(db: sqlite3.Connection = Depends(get_db)):
+@app.post("/api/search/stream")
+async def search_knowledge_stream(query: dict = Body(...)):
+    """NDJSON search: ranked hits first, then one line per AI summary as it completes"""
     try:
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT id, title, level, tags, content, summary, references
-            FROM knowledge
-        """)
-        rows = cursor.fetchall()
-        
-        items = []
-        for row in rows:
-            items.append({
-                "id": row[0],
-                "title": row[1],
-                "level": row[2],
-                "tags": json.loads(row[3]) if row[3] else [],
-                "content": row[4],
-                "summary": row[5],
-                "references": json.loads(row[6]) if row[6] else []
-            })
-        
-        return Response(
-            content=json.dumps({"items": items}, ensure_ascii=False),
-            media_type="application/json; charset=utf-8"
-        )
+        logger.info(f"Streaming search with query: {query}")
+        search_results = await get_pool().read(rank_search_results, query)
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
+        logger.error(f"Error searching knowledge: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        yield dumps({"type": "results", "results": search_results}) + b"\n"
+        async for index, summary in iter_ai_summaries([summary_input(result) for result in search_results]):
+            yield dumps({
+                "type": "summary",
+                "index": index,
+                "id": search_results[index]["knowledge"]["id"],
+                "ai_summary": summary
+            }) + b"\n"
+        yield dumps({"type": "done"}) + b"\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson; charset=utf-8")
 
 @app.get("/knowledge/template")
 async def get_template():
@@ -0,0 +1,306 @@
+import os
+import logging
+import json
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 워커 프로세스마다 이 디렉터리에 스냅샷을 쓰고, /metrics 는 모든 워커의 스냅샷을 합쳐서 응답함
+METRICS_DIR = Path(os.getenv("METRICS_DIR", str(Path(__file__).resolve().parent / "data" / "metrics")))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# 이벤트 루프 지연 측정 주기
+LOOP_LAG_INTERVAL = 0.5
+
+# 초 단위 (0.5 ms ~ 60 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._series: Dict[LabelValues, object] = {}
+        # 계열 하나를 갱신하는 동안만 잡는 짧은 락 (스레드풀의 DB 작업에서도 기록함)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, label_values: Sequence) -> LabelValues:
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        return tuple(str(value) for value in label_values)
+
+    def dump(self) -> dict:
+        with self._lock:
+            series = [[list(key), value if not isinstance(value, list) else list(value)]
+                      for key, value in self._series.items()]
+        return {"type": self.kind, "help": self.documentation, "labels": list(self.labels), "series": series}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1.0):
+        key = self._key(label_values)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Per-worker value; merged snapshots keep one series per worker pid"""
+    kind = "gauge"
+
+    def set(self, value: float, *label_values):
+        key = self._key(label_values)
+        with self._lock:
+            self._series[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values):
+        key = self._key(label_values)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            # [버킷별 개수 ..., +Inf 개수, 합계] (누적은 출력할 때 계산)
+            counts = self._series.get(key)
+            if counts is None:
+                counts = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def dump(self) -> dict:
+        data = super().dump()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+_registry: List[Metric] = []
+
+
+def snapshot() -> dict:
+    return {"pid": os.getpid(), "time": time.time(), "metrics": {metric.name: metric.dump() for metric in _registry}}
+
+
+def write_snapshot():
+    """Write this worker's metrics where /metrics of any worker can read them"""
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    path = METRICS_DIR / f"{os.getpid()}.json"
+    temp = path.with_suffix(".tmp")
+    temp.write_text(json.dumps(snapshot(), separators=(",", ":")), encoding="utf-8")
+    os.replace(temp, path)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_snapshots() -> List[dict]:
+    snapshots = []
+    for path in METRICS_DIR.glob("*.json"):
+        try:
+            pid = int(path.stem)
+        except ValueError:
+            continue
+        if pid != os.getpid() and not pid_alive(pid):
+            # 종료된 워커의 값은 버림 (카운터 초기화는 Prometheus 의 rate() 가 처리함)
+            path.unlink(missing_ok=True)
+            continue
+        try:
+            snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return snapshots
+
+
+def merge(snapshots: List[dict]) -> Dict[str, dict]:
+    """Sum counters and histograms across workers; gauges get a pid label"""
+    merged: Dict[str, dict] = {}
+    for data in snapshots:
+        for name, family in data["metrics"].items():
+            labels = family["labels"] + (["pid"] if family["type"] == "gauge" else [])
+            target = merged.setdefault(name, {**family, "labels": labels, "series": {}})
+            for label_values, value in family["series"]:
+                if family["type"] == "gauge":
+                    target["series"][tuple(label_values) + (str(data["pid"]),)] = value
+                    continue
+                key = tuple(label_values)
+                current = target["series"].get(key)
+                if current is None:
+                    target["series"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["series"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["series"][key] = current + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(families: Dict[str, dict]) -> str:
+    """Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for label_values, value in sorted(family["series"].items()):
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_labels(family['labels'], label_values)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(family["buckets"] + [float("inf")], value[:-1]):
+                cumulative += count
+                labels = _labels(family["labels"], label_values, ("le", _number(float(bound))))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(family['labels'], label_values)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(family['labels'], label_values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _hit_ratios(families: Dict[str, dict]):
+    """Add cache_hit_ratio per cache, computed from the merged cache_requests_total"""
+    requests = families.get(CACHE_REQUESTS.name)
+    if requests is None:
+        return
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), count in requests["series"].items():
+        counts = totals.setdefault(cache, [0.0, 0.0])
+        counts[0] += count if result == "hit" else 0
+        counts[1] += count
+    families["cache_hit_ratio"] = {
+        "type": "gauge",
+        "help": "Share of cache lookups that were hits since the workers started",
+        "labels": ["cache"],
+        "series": {(cache,): hits / total for cache, (hits, total) in totals.items() if total},
+    }
+
+
+def collect_all() -> str:
+    """Metrics of every live worker, with this worker's values up to date"""
+    write_snapshot()
+    families = merge(_read_snapshots())
+    _hit_ratios(families)
+    return render(families)
+
+
+# 공통 지표
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the last body byte, per route",
+    ("method", "route", "status")
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "Delay of event loop callbacks beyond their scheduled time")
+EVENT_LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Most recently measured event loop lag")
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request by route template (not raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            # 처음 보는 엔드포인트만 라우트 목록에서 경로 템플릿을 찾음
+            router = scope.get("router")
+            for candidate in getattr(router, "routes", []):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = getattr(endpoint, "__name__", "unknown")
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started, scope["method"], self._route(scope), status
+            )
+
+
+async def run_background(interval: float = METRICS_FLUSH_INTERVAL):
+    """Measure event loop lag and periodically write this worker's snapshot"""
+    loop = asyncio.get_running_loop()
+    next_flush = loop.time() + interval
+    while True:
+        expected = loop.time() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - expected)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+        if loop.time() >= next_flush:
+            next_flush = loop.time() + interval
+            try:
+                await loop.run_in_executor(None, write_snapshot)
+            except Exception as e:
+                logger.warning(f"Error writing metrics snapshot: {e}")
+
+
+def remove_snapshot():
+    (METRICS_DIR / f"{os.getpid()}.json").unlink(missing_ok=True)
@@ -0,0 +1,220 @@
+import os
+import logging
+import sys
+import hmac
+import time
+import random
+import secrets
+import re
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# 요청별 프로파일 (접힌 스택, flamegraph.pl / speedscope 에서 바로 열 수 있음).
+# /data 로 공개되는 data 디렉토리 밖에 두어 토큰이 필요한 /debug/profiles 로만 받을 수 있게 함
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(Path(__file__).resolve().parent / "profiles")))
+# 설정하면 X-Profile 헤더나 ?profile= 에 이 값을 넣은 요청을 프로파일링하고 목록/다운로드를 허용함
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+# 토큰 없이 무작위로 프로파일링할 요청 비율 (0: 끔)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+# 동시에 도는 샘플러 수 상한 (넘으면 그 요청은 프로파일링하지 않음)
+PROFILE_MAX_ACTIVE = 4
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "profile"
+PROFILE_SUFFIX = ".folded"
+PROFILE_NAME_PATTERN = re.compile(r"^[0-9A-Za-z_.-]+\.folded$")
+# 프로파일 목록/다운로드 요청은 토큰을 들고 오므로 프로파일링하지 않음
+PROFILE_ROUTE_PREFIX = "/debug/profiles"
+
+ENABLED = bool(PROFILE_ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+# 대기 중인 스레드풀 스레드의 스택 (샘플에서 제외)
+_IDLE_LEAVES = {("threading.py", "wait"), ("thread.py", "_worker")}
+
+_active = 0
+_active_lock = threading.Lock()
+_labels: Dict[object, str] = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+class Sampler(threading.Thread):
+    """Wall-clock sampler collecting folded stacks of every thread but itself"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        """Ask the thread to stop; returns at once (see result())"""
+        self._stop_event.set()
+
+    def result(self) -> Counter:
+        """Wait for the stopped thread (up to one interval) and return its stacks"""
+        self.join()
+        return self.stacks
+
+
+def authorized(token: Optional[str]) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def _requested(scope) -> bool:
+    if not PROFILE_ADMIN_TOKEN:
+        return False
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return authorized(value.decode("latin-1"))
+    query = scope.get("query_string", b"")
+    if b"profile=" in query:
+        return authorized(parse_qs(query.decode("latin-1")).get(PROFILE_QUERY, [None])[0])
+    return False
+
+
+def _try_start() -> bool:
+    global _active
+    with _active_lock:
+        if _active >= PROFILE_MAX_ACTIVE:
+            return False
+        _active += 1
+        return True
+
+
+def _finished():
+    global _active
+    with _active_lock:
+        _active -= 1
+
+
+def profile_name(method: str, path: str) -> str:
+    # /data 정적 마운트로도 접근되므로 이름을 추측할 수 없게 임의 값을 붙임
+    slug = re.sub(r"[^0-9A-Za-z]+", "-", path).strip("-")[:60] or "root"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return f"{stamp}_{method}_{slug}_{secrets.token_hex(6)}{PROFILE_SUFFIX}"
+
+
+def save(name: str, stacks: Counter):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / name
+    temp = path.with_suffix(".tmp")
+    temp.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()), encoding="utf-8")
+    os.replace(temp, path)
+    rotate()
+
+
+def save_result(name: str, sampler: Sampler):
+    save(name, sampler.result())
+
+
+def rotate():
+    """Drop the oldest profiles beyond PROFILE_MAX_FILES / PROFILE_MAX_BYTES"""
+    files = sorted(
+        PROFILE_DIR.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: (p.stat().st_mtime, p.name), reverse=True
+    )
+    total = 0
+    for index, path in enumerate(files):
+        total += path.stat().st_size
+        if index >= PROFILE_MAX_FILES or total > PROFILE_MAX_BYTES:
+            path.unlink(missing_ok=True)
+
+
+def list_profiles() -> List[dict]:
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = []
+    for path in PROFILE_DIR.glob(f"*{PROFILE_SUFFIX}"):
+        stat = path.stat()
+        profiles.append((stat.st_mtime, path.name, stat.st_size))
+    # rotate() 와 같은 순서 (최신 먼저)
+    profiles.sort(reverse=True)
+    return [
+        {"name": name, "size": size, "modified": datetime.fromtimestamp(mtime).isoformat(timespec="seconds")}
+        for mtime, name, size in profiles
+    ]
+
+
+def profile_path(name: str) -> Path:
+    if not PROFILE_NAME_PATTERN.match(name):
+        raise FileNotFoundError(name)
+    path = PROFILE_DIR / name
+    if not path.is_file():
+        raise FileNotFoundError(name)
+    return path
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling requests flagged with the admin token or sampled at PROFILE_SAMPLE_RATE"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http" or scope["path"].startswith(PROFILE_ROUTE_PREFIX):
+            return await self.app(scope, receive, send)
+        requested = _requested(scope)
+        sampled = requested or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+        if not sampled or not _try_start():
+            return await self.app(scope, receive, send)
+
+        name = profile_name(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            # 무작위로 뽑힌 요청에는 토큰이 없으므로 프로파일 이름을 알려 주지 않음
+            if message["type"] == "http.response.start" and requested:
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", name.encode("ascii"))]
+            await send(message)
+
+        sampler = Sampler()
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            try:
+                # 샘플러 스레드를 기다리는 join 도 이벤트 루프 밖에서 실행
+                await asyncio.get_running_loop().run_in_executor(None, save_result, name, sampler)
+            except Exception as e:
+                logger.warning(f"Error saving profile {name}: {e}")
+            else:
+                logger.info(f"Saved profile {name} ({sampler.samples} samples, {elapsed_ms:.0f}ms)")
+            finally:
+                _finished()
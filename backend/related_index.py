@@ -0,0 +1,113 @@
+import os
+import sqlite3
+from typing import List, Optional
+
+from database import row_to_knowledge, KNOWLEDGE_COLUMNS
+import search_index
+
+# 행마다 저장해 두는 관련 항목 수. API 의 k 는 이 값을 넘을 수 없음
+RELATED_STORE_K = int(os.getenv("RELATED_STORE_K", "20"))
+RELATED_DEFAULT_K = 5
+RELATED_DEFAULT_THRESHOLD = 0.1
+
+
+def _chunks(ids: List[int], size: int = 500):
+    # SQLite 바인딩 변수 개수 제한을 넘지 않도록 나눔
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _store(conn: sqlite3.Connection, ids: Optional[List[int]]):
+    """Recompute and store the neighbour lists of `ids` (every row when None)"""
+    neighbours = search_index.get_index().neighbours(ids, RELATED_STORE_K)
+    conn.executemany("""
+        INSERT INTO knowledge_related (knowledge_id, rank, related_id, score)
+        VALUES (?, ?, ?, ?)
+    """, [
+        (knowledge_id, rank, related_id, score)
+        for knowledge_id, pairs in neighbours.items()
+        for rank, (related_id, score) in enumerate(pairs, start=1)
+    ])
+
+
+def rebuild_related(conn: sqlite3.Connection):
+    """Recompute the whole related-items table. Runs inside the caller's write transaction"""
+    conn.execute("DELETE FROM knowledge_related")
+    _store(conn, None)
+
+
+def update_related(conn: sqlite3.Connection, ids: List[int]):
+    """Refresh neighbour lists after the given knowledge rows were written or deleted.
+
+    Besides the touched rows themselves, only rows whose stored list is
+    affected are recomputed: rows that listed a touched row, and rows for
+    which a touched row now scores above their current k-th neighbour.
+    Must run after search_index has been updated for the same rows.
+    """
+    if not ids:
+        return
+    ids = list(set(ids))
+    recompute = set(ids)
+    for chunk in _chunks(ids):
+        cursor = conn.execute(
+            f"SELECT DISTINCT knowledge_id FROM knowledge_related WHERE related_id IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        recompute.update(row[0] for row in cursor.fetchall())
+
+    # 건드린 행과 유사도가 양수인 행만 목록이 바뀔 수 있음 (행마다 가장 높은 점수)
+    best = {}
+    index = search_index.get_index()
+    for pairs in index.neighbours(ids, len(index)).values():
+        for other, score in pairs:
+            if score > best.get(other, 0.0):
+                best[other] = score
+
+    # 목록이 꽉 찬 행은 k 번째 점수보다 높아야 목록이 바뀜. 덜 찬 행은 양수 점수면 바뀜
+    floor = {}
+    candidates = [other for other in best if other not in recompute]
+    for chunk in _chunks(candidates):
+        floor.update(conn.execute(
+            f"SELECT knowledge_id, score FROM knowledge_related "
+            f"WHERE rank = ? AND knowledge_id IN ({','.join('?' * len(chunk))})",
+            [RELATED_STORE_K] + chunk
+        ).fetchall())
+    recompute.update(other for other in candidates if best[other] > floor.get(other, 0.0))
+
+    recompute = list(recompute)
+    for chunk in _chunks(recompute):
+        conn.execute(
+            f"DELETE FROM knowledge_related WHERE knowledge_id IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+    _store(conn, recompute)
+
+
+def ensure_related(conn: sqlite3.Connection):
+    """Build the table on first start, after it was created empty"""
+    if conn.execute("SELECT 1 FROM knowledge_related LIMIT 1").fetchone():
+        return
+    if conn.execute("SELECT 1 FROM knowledge LIMIT 1").fetchone():
+        rebuild_related(conn)
+
+
+def related_items(conn: sqlite3.Connection, knowledge_id: int, k: int = RELATED_DEFAULT_K,
+                  threshold: float = RELATED_DEFAULT_THRESHOLD) -> Optional[list]:
+    """Stored neighbours of one row with a `score` key, or None if the row does not exist"""
+    if conn.execute("SELECT 1 FROM knowledge WHERE id = ?", (knowledge_id,)).fetchone() is None:
+        return None
+    columns = ", ".join(f"k.{column.strip()}" for column in KNOWLEDGE_COLUMNS.split(","))
+    cursor = conn.execute(f"""
+        SELECT r.score, {columns}
+        FROM knowledge_related r
+        JOIN knowledge k ON k.id = r.related_id
+        WHERE r.knowledge_id = ? AND r.score > ?
+        ORDER BY r.rank
+        LIMIT ?
+    """, (knowledge_id, threshold, k))
+    items = []
+    for row in cursor.fetchall():
+        item = row_to_knowledge(row[1:])
+        item["score"] = row[0]
+        items.append(item)
+    return items
@@ -0,0 +1,503 @@
+import os
+import logging
+import json
+import pickle
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+import corpus_generation
+from database import connect, get_pool
+
+logger = logging.getLogger(__name__)
+
+# scipy / scikit-learn 은 가져오는 데만 1 초 이상 걸려서 처음 학습하거나 불러올 때 가져옴
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+CURRENT_DIR = Path(__file__).resolve().parent
+INDEX_PATH = CURRENT_DIR / "data" / "tfidf_index.pkl"
+
+# 마지막 전체 학습 이후 추가/수정된 문서 비율이 이 값을 넘으면 어휘와 IDF를 다시 학습
+REFIT_RATIO = float(os.getenv("TFIDF_REFIT_RATIO", "0.2"))
+# 새 어휘가 들어온 경우 백그라운드 재학습까지 기다리는 시간(초). 연속된 쓰기를 한 번에 묶음
+REFIT_DELAY = float(os.getenv("TFIDF_REFIT_DELAY", "2.0"))
+# 증분 갱신 후 인덱스 파일을 저장하기까지 기다리는 시간(초). 연속된 쓰기마다 전체를 다시 저장하지 않음
+SAVE_DELAY = float(os.getenv("TFIDF_SAVE_DELAY", "5.0"))
+
+TFIDF_DURATION = metrics.Histogram(
+    "tfidf_duration_seconds", "TF-IDF vectorizer fit and query scoring time", ("stage",)
+)
+
+
+def document_text(title: str, tags, content: str) -> str:
+    """Build the text that represents a knowledge row in the index"""
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except json.JSONDecodeError:
+            tags = [tags]
+    if not isinstance(tags, list):
+        tags = []
+    return f"{title or ''} {' '.join(str(tag) for tag in tags)} {content or ''}"
+
+
+def _corpus_signature(conn) -> Tuple[int, int, float]:
+    """Cheap fingerprint of the knowledge table used to validate a saved index"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0), TOTAL(id) FROM knowledge")
+    count, max_id, id_total = cursor.fetchone()
+    return (int(count), int(max_id), float(id_total))
+
+
+class TfidfIndex:
+    """Long-lived TF-IDF index over the knowledge table.
+
+    The vocabulary and IDF weights are fitted once over the whole corpus.
+    Later writes only transform the touched documents with the existing
+    vocabulary; a full refit happens once enough documents have changed or,
+    in the background, when a write brings in terms the vocabulary lacks.
+    `generation` is the corpus generation the index has caught up with, so
+    writes committed by other workers can be applied from the rows stamped
+    with a newer generation.
+    """
+
+    def __init__(self):
+        self.vectorizer: Optional["TfidfVectorizer"] = None
+        # scipy.sparse CSR 행렬 (문서가 없으면 None)
+        self.matrix = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.fitted_docs = 0
+        self.changes_since_fit = 0
+        self.has_unseen_terms = False
+        self.signature: Tuple[int, int, float] = (0, 0, 0.0)
+        self.generation: Optional[int] = 0
+        # generation 이후에 반영한 행의 텍스트 해시. 따라잡을 때 같은 행을 다시 반영하지 않음
+        self.applied: Dict[int, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fit(self, rows: Iterable[Tuple[int, str]]):
+        """Fit vocabulary and IDF over (id, text) rows, replacing the index"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        rows = list(rows)
+        vectorizer = TfidfVectorizer()
+        with self._lock:
+            try:
+                with TFIDF_DURATION.time("fit"):
+                    matrix = vectorizer.fit_transform([text for _, text in rows]).tocsr()
+            except ValueError:
+                # 빈 코퍼스이거나 어휘가 하나도 없는 경우
+                vectorizer, matrix = None, None
+            self.vectorizer = vectorizer
+            self.matrix = matrix
+            self.ids = np.array([doc_id for doc_id, _ in rows], dtype=np.int64)
+            self.fitted_docs = len(rows)
+            self.changes_since_fit = 0
+            self.has_unseen_terms = False
+            self.applied = {}
+
+    @property
+    def needs_refit(self) -> bool:
+        if self.vectorizer is None:
+            return self.changes_since_fit > 0
+        return self.changes_since_fit > REFIT_RATIO * max(self.fitted_docs, 1)
+
+    def upsert(self, doc_id: int, text: str):
+        """Add or replace one document using the current vocabulary"""
+        with self._lock:
+            self._drop([doc_id])
+            self.changes_since_fit += 1
+            self.applied[doc_id] = hash(text)
+            if self.vectorizer is None:
+                return
+            analyzer = self.vectorizer.build_analyzer()
+            vocabulary = self.vectorizer.vocabulary_
+            if any(term not in vocabulary for term in analyzer(text)):
+                self.has_unseen_terms = True
+            from scipy import sparse
+
+            vector = self.vectorizer.transform([text]).tocsr()
+            self.matrix = vector if self.matrix is None else sparse.vstack([self.matrix, vector], format="csr")
+            self.ids = np.append(self.ids, np.int64(doc_id))
+
+    def remove(self, doc_ids: List[int]):
+        with self._lock:
+            self._drop(doc_ids)
+
+    def _drop(self, doc_ids: List[int]):
+        for doc_id in doc_ids:
+            self.applied.pop(doc_id, None)
+        keep = ~np.isin(self.ids, np.asarray(doc_ids, dtype=np.int64))
+        if keep.all():
+            return
+        if self.matrix is not None:
+            self.matrix = self.matrix[np.flatnonzero(keep)]
+        self.ids = self.ids[keep]
+
+    def id_signature(self) -> Tuple[int, int, float]:
+        """_corpus_signature() of the rows this index holds"""
+        with self._lock:
+            ids = self.ids
+        if not len(ids):
+            return (0, 0, 0.0)
+        return (len(ids), int(ids.max()), float(ids.sum()))
+
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return (id, cosine score) pairs for the best matching documents"""
+        with TFIDF_DURATION.time("score"):
+            return self._search(query, top_k)
+
+    def _search(self, query: str, top_k: Optional[int]) -> List[Tuple[int, float]]:
+        with self._lock:
+            vectorizer, matrix, ids = self.vectorizer, self.matrix, self.ids
+        if vectorizer is None or not len(ids):
+            return []
+
+        query_vector = vectorizer.transform([query])
+        if query_vector.nnz == 0:
+            return []
+
+        # 행 벡터가 L2 정규화되어 있으므로 내적이 곧 코사인 유사도
+        scores = (matrix @ query_vector.T).tocoo()
+        rows, data = scores.row, scores.data
+        positive = data > 0
+        rows, data = rows[positive], data[positive]
+
+        if top_k is not None and len(data) > top_k:
+            best = np.argpartition(-data, top_k - 1)[:top_k]
+            rows, data = rows[best], data[best]
+        order = np.argsort(-data, kind="stable")
+        return [(int(ids[rows[i]]), float(data[i])) for i in order]
+
+    def neighbours(self, doc_ids: Optional[List[int]] = None, k: int = 5,
+                   threshold: float = 0.0, chunk_size: int = 1024) -> Dict[int, List[Tuple[int, float]]]:
+        """Top-k most similar indexed documents for each of `doc_ids` (all when None).
+
+        Similarities come from sparse products of the document rows with the
+        whole matrix, computed `chunk_size` rows at a time so memory stays
+        bounded on large corpora. A document is never its own neighbour.
+        """
+        with self._lock:
+            matrix, ids = self.matrix, self.ids
+        result: Dict[int, List[Tuple[int, float]]] = {}
+        if matrix is None or not len(ids) or k <= 0:
+            return result
+
+        if doc_ids is None:
+            positions = np.arange(len(ids))
+        else:
+            position_of = {int(doc_id): position for position, doc_id in enumerate(ids)}
+            positions = np.array([position_of[d] for d in doc_ids if d in position_of], dtype=np.int64)
+
+        transposed = matrix.T.tocsc()
+        for start in range(0, len(positions), chunk_size):
+            chunk = positions[start:start + chunk_size]
+            scores = (matrix[chunk] @ transposed).tocsr()
+            for offset, position in enumerate(chunk):
+                begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+                columns, data = scores.indices[begin:end], scores.data[begin:end]
+                keep = (columns != position) & (data > threshold)
+                columns, data = columns[keep], data[keep]
+                if len(data) > k:
+                    best = np.argpartition(-data, k - 1)[:k]
+                    columns, data = columns[best], data[best]
+                order = np.argsort(-data, kind="stable")
+                result[int(ids[position])] = [(int(ids[columns[i]]), float(data[i])) for i in order]
+        return result
+
+    def save(self, path: Optional[Path] = None):
+        path = path or INDEX_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with self._lock:
+            state = {
+                "vectorizer": self.vectorizer,
+                "matrix": self.matrix,
+                "ids": self.ids,
+                "fitted_docs": self.fitted_docs,
+                "changes_since_fit": self.changes_since_fit,
+                "has_unseen_terms": self.has_unseen_terms,
+                "signature": self.signature,
+                "generation": self.generation,
+            }
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "TfidfIndex":
+        path = path or INDEX_PATH
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index = cls()
+        index.vectorizer = state["vectorizer"]
+        index.matrix = state["matrix"]
+        index.ids = state["ids"]
+        index.fitted_docs = state["fitted_docs"]
+        index.changes_since_fit = state["changes_since_fit"]
+        index.has_unseen_terms = state.get("has_unseen_terms", False)
+        index.signature = tuple(state["signature"])
+        # 세대를 기록하기 전에 저장된 인덱스는 None (서명으로만 확인)
+        index.generation = state.get("generation")
+        return index
+
+
+_index: Optional[TfidfIndex] = None
+# 인덱스를 불러올 때의 search_index 카운터 (다른 워커가 재학습해 저장하면 증가)
+_fit_version = -1
+_load_lock = threading.Lock()
+_refit_timer: Optional[threading.Timer] = None
+_refit_timer_lock = threading.Lock()
+_save_timer: Optional[threading.Timer] = None
+_save_timer_lock = threading.Lock()
+
+
+def get_index() -> TfidfIndex:
+    """The process-wide index.
+
+    Loaded (or built) on first use unless warm-up already did it. Once
+    corpus_generation has seen another worker write, the rows it wrote are
+    applied; once another worker refitted and saved the index, the saved
+    index is loaded instead of refitting here.
+    """
+    global _fit_version
+    if not _stale(_index):
+        return _index
+    with _load_lock:
+        if _stale(_index):
+            # 풀 연결을 잡고 있는 호출자가 기다려도 막히지 않도록 별도 연결로 불러옴
+            conn = connect(readonly=True)
+            try:
+                fit_version = corpus_generation.read(conn, corpus_generation.SEARCH_INDEX)
+                if _index is None or fit_version > _fit_version:
+                    load_or_build(conn)
+                    _fit_version = fit_version
+                elif catch_up(conn, _index) and _index.needs_refit:
+                    # 쓴 워커가 전체 재학습한 인덱스를 이미 저장했으므로 그것부터 불러 봄
+                    load_or_build(conn)
+            finally:
+                conn.close()
+    return _index
+
+
+def _stale(index: Optional[TfidfIndex]) -> bool:
+    return (
+        index is None
+        or index.generation < corpus_generation.current()
+        or _fit_version < corpus_generation.current(corpus_generation.SEARCH_INDEX)
+    )
+
+
+def _fetch_texts(conn, ids: Optional[List[int]] = None) -> List[Tuple[int, str]]:
+    cursor = conn.cursor()
+    if ids is None:
+        cursor.execute("SELECT id, title, tags, content FROM knowledge")
+    else:
+        placeholders = ",".join("?" * len(ids))
+        cursor.execute(
+            f"SELECT id, title, tags, content FROM knowledge WHERE id IN ({placeholders})",
+            list(ids)
+        )
+    return [(row[0], document_text(row[1], row[2], row[3])) for row in cursor.fetchall()]
+
+
+def _fetch_texts_since(conn, generation: int) -> List[Tuple[int, str]]:
+    cursor = conn.execute("SELECT id, title, tags, content FROM knowledge WHERE generation > ?", (generation,))
+    return [(row[0], document_text(row[1], row[2], row[3])) for row in cursor.fetchall()]
+
+
+def catch_up(conn, index: TfidfIndex) -> bool:
+    """Apply rows written (by any worker) after `index.generation`; True if the index changed.
+
+    Rows this worker already applied (update_documents runs before the
+    generation bump) are skipped while their text is unchanged.
+    """
+    generation = corpus_generation.read(conn)
+    if generation <= index.generation:
+        return False
+    # 카운터를 먼저 읽었으므로 그 세대까지의 행은 아래 조회에 모두 보임.
+    # 더 새로운 행이 섞여도 다음 따라잡기에서 한 번 더 적용될 뿐임
+    deleted = [
+        row[0] for row in conn.execute(
+            "SELECT knowledge_id FROM knowledge_tombstones WHERE generation > ?", (index.generation,)
+        )
+    ]
+    rows = _fetch_texts_since(conn, index.generation)
+    with index._lock:
+        rows = [(doc_id, text) for doc_id, text in rows if index.applied.get(doc_id) != hash(text)]
+        if deleted:
+            index.remove(deleted)
+        if index.changes_since_fit + len(rows) > REFIT_RATIO * max(index.fitted_docs, 1):
+            # 어차피 전체 재학습이 필요하므로 한 건씩 반영하지 않음 (호출자가 needs_refit 을 보고 재학습)
+            index.changes_since_fit += len(rows)
+        else:
+            for doc_id, text in rows:
+                index.upsert(doc_id, text)
+        index.generation = generation
+        index.applied = {}
+    return True
+
+
+def _visible_generation(conn) -> int:
+    """Generation of the rows `conn` sees.
+
+    Inside a write transaction the rows it wrote are already stamped with the
+    generation the bump after the commit will produce, so an index built
+    from them belongs to that generation; otherwise catching up after the
+    bump would apply the same rows again.
+    """
+    generation = corpus_generation.read(conn)
+    if conn.in_transaction:
+        pending = conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM knowledge WHERE generation > ?) "
+            "OR EXISTS(SELECT 1 FROM knowledge_tombstones WHERE generation > ?)",
+            (generation, generation)
+        ).fetchone()[0]
+        if pending:
+            generation += 1
+    return generation
+
+
+def rebuild(conn) -> TfidfIndex:
+    """Refit the index over the whole knowledge table and persist it"""
+    global _index
+    index = _index if _index is not None else TfidfIndex()
+    generation = _visible_generation(conn)
+    index.fit(_fetch_texts(conn))
+    index.generation = generation
+    index.signature = _corpus_signature(conn)
+    _cancel_save()
+    index.save()
+    _index = index
+    return index
+
+
+def load_or_build(conn) -> TfidfIndex:
+    """Load the saved index and catch it up, refitting it if it is missing or unusable"""
+    global _index
+    try:
+        generation = corpus_generation.read(conn)
+        loaded = TfidfIndex.load()
+        if loaded.generation is None:
+            if loaded.signature == _corpus_signature(conn):
+                loaded.generation = generation
+                _index = loaded
+                return _index
+        elif loaded.generation <= generation:
+            # 다른 워커가 저장한 인덱스일 수 있으므로 그 이후의 쓰기를 적용하고 행 집합이 맞는지 확인
+            catch_up(conn, loaded)
+            if not loaded.needs_refit and loaded.id_signature() == _corpus_signature(conn):
+                _index = loaded
+                return _index
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Error loading TF-IDF index: {e}")
+    return rebuild(conn)
+
+
+def update_documents(conn, ids: List[int]):
+    """Refresh the index after the given knowledge rows were created or updated"""
+    index = get_index()
+    found = _fetch_texts(conn, ids)
+    for doc_id, text in found:
+        index.upsert(doc_id, text)
+    missing = set(ids) - {doc_id for doc_id, _ in found}
+    if missing:
+        index.remove(list(missing))
+
+    if index.needs_refit:
+        rebuild(conn)
+        return
+    index.signature = _corpus_signature(conn)
+    schedule_save()
+    if index.has_unseen_terms:
+        schedule_refit()
+
+
+def remove_documents(conn, ids: List[int]):
+    """Drop deleted knowledge rows from the index"""
+    index = get_index()
+    index.remove(ids)
+    index.signature = _corpus_signature(conn)
+    schedule_save()
+
+
+def refit() -> TfidfIndex:
+    """Refit the vocabulary now and let the other workers reload the saved index"""
+    global _fit_version
+    index = get_pool().read_sync(rebuild)
+    # 다른 워커는 새 어휘로 저장된 인덱스를 다시 불러옴 (각자 재학습하지 않음)
+    _fit_version = corpus_generation.bump_sync(corpus_generation.SEARCH_INDEX)
+    return index
+
+
+def _background_refit():
+    global _refit_timer
+    with _refit_timer_lock:
+        _refit_timer = None
+    try:
+        refit()
+    except Exception as e:
+        logger.warning(f"Error refitting TF-IDF index: {e}")
+
+
+def schedule_refit(delay: float = REFIT_DELAY):
+    """Refit the vocabulary in a background thread once writes settle down.
+
+    Incremental updates are searchable immediately, but terms that the fitted
+    vocabulary has never seen only become searchable after this refit.
+    """
+    global _refit_timer
+    with _refit_timer_lock:
+        if _refit_timer is not None:
+            _refit_timer.cancel()
+        _refit_timer = threading.Timer(delay, _background_refit)
+        _refit_timer.daemon = True
+        _refit_timer.start()
+
+
+def _cancel_save():
+    global _save_timer
+    with _save_timer_lock:
+        if _save_timer is not None:
+            _save_timer.cancel()
+            _save_timer = None
+
+
+def flush_save():
+    """Save the index now if an incremental update is still waiting to be saved"""
+    global _save_timer
+    with _save_timer_lock:
+        pending = _save_timer is not None
+        if pending:
+            _save_timer.cancel()
+            _save_timer = None
+    if pending and _index is not None:
+        try:
+            _index.save()
+        except Exception as e:
+            logger.warning(f"Error saving TF-IDF index: {e}")
+
+
+def schedule_save(delay: float = SAVE_DELAY):
+    """Save the index in a background thread `delay` seconds from now.
+
+    The saved file only has to be a recent starting point: whoever loads it
+    applies the rows written after its generation (see load_or_build), so
+    the writes made until the timer fires are saved together.
+    """
+    global _save_timer
+    with _save_timer_lock:
+        if _save_timer is not None:
+            return
+        _save_timer = threading.Timer(delay, flush_save)
+        _save_timer.daemon = True
+        _save_timer.start()
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import metrics
+from database import get_pool
+
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+# 기본 7일. 0 이하이면 만료 없음
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+# 이 횟수만큼 저장할 때마다 SQLite 에서 만료된 항목을 정리
+PURGE_EVERY = 256
+
+
+def content_digest(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def make_key(content: str, **params) -> str:
+    """Cache key from the summarized content and the model parameters used"""
+    encoded_params = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{encoded_params}\0{content_digest(content)}".encode("utf-8")).hexdigest()
+
+
+def _load_entry(conn: sqlite3.Connection, key: str):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT summary, content_hash, created_at FROM summary_cache WHERE cache_key = ?",
+        (key,)
+    )
+    return cursor.fetchone()
+
+
+def _store_entry(conn: sqlite3.Connection, key: str, digest: str, summary: str,
+                 created_at: float, purge_before: Optional[float]):
+    conn.execute("""
+        INSERT OR REPLACE INTO summary_cache (cache_key, content_hash, summary, created_at)
+        VALUES (?, ?, ?, ?)
+    """, (key, digest, summary, created_at))
+    if purge_before is not None:
+        conn.execute("DELETE FROM summary_cache WHERE created_at < ?", (purge_before,))
+
+
+def _delete_content(conn: sqlite3.Connection, digest: str):
+    conn.execute("DELETE FROM summary_cache WHERE content_hash = ?", (digest,))
+
+
+class SummaryCache:
+    """In-process LRU with TTL in front of a SQLite table that survives restarts"""
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_SIZE, ttl: float = SUMMARY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.memory_hits = 0
+        self.sqlite_hits = 0
+        self.misses = 0
+
+    def _expires_at(self, created_at: float) -> float:
+        return created_at + self.ttl if self.ttl > 0 else float("inf")
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                summary, expires_at, _ = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    metrics.CACHE_REQUESTS.inc("ai_summary", "hit")
+                    return summary
+                del self._entries[key]
+
+        row = await get_pool().read(_load_entry, key)
+        if row is not None and self._expires_at(row[2]) > now:
+            with self._lock:
+                self.sqlite_hits += 1
+                metrics.CACHE_REQUESTS.inc("ai_summary", "hit")
+                self._remember(key, row[0], self._expires_at(row[2]), row[1])
+            return row[0]
+
+        with self._lock:
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc("ai_summary", "miss")
+        return None
+
+    async def put(self, key: str, content: str, summary: str):
+        now = time.time()
+        digest = content_digest(content)
+        with self._lock:
+            self._remember(key, summary, self._expires_at(now), digest)
+            self._puts += 1
+            purge = self.ttl > 0 and self._puts % PURGE_EVERY == 0
+        await get_pool().write(_store_entry, key, digest, summary, now, now - self.ttl if purge else None)
+
+    def _remember(self, key: str, summary: str, expires_at: float, digest: str):
+        self._entries[key] = (summary, expires_at, digest)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def invalidate_content(self, content: str):
+        """Drop every cached summary of `content`, whatever parameters produced it"""
+        digest = content_digest(content)
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[2] == digest]:
+                del self._entries[key]
+        await get_pool().write(_delete_content, digest)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+        await get_pool().write(lambda conn: conn.execute("DELETE FROM summary_cache"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.sqlite_hits
+            total = hits + self.misses
+            return {
+                "memory_entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "sqlite_hits": self.sqlite_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / total if total else 0.0
+            }
+
+
+_cache = SummaryCache()
+
+
+def get_cache() -> SummaryCache:
+    return _cache
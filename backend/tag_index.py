@@ -0,0 +1,76 @@
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+TAG_MODES = ("all", "any")
+
+
+def parse_tags(tags: Optional[Sequence[str]]) -> List[str]:
+    """Tag names from repeated or comma-separated `tag=` parameters, in order, without duplicates"""
+    names = []
+    for value in tags or []:
+        for name in value.split(","):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+def tag_filter(tags: Sequence[str], mode: str = "all") -> Tuple[str, list]:
+    """SQL condition on knowledge.id for rows with all (AND) or any (OR) of the tags.
+
+    The ids come from the (tag_id, knowledge_id) primary key of
+    knowledge_tags, so the condition never decodes the tags column.
+    """
+    if not tags:
+        return "", []
+    placeholders = ", ".join("?" for _ in tags)
+    if mode == "any":
+        return (
+            f" AND id IN (SELECT knowledge_id FROM knowledge_tags WHERE tag_id IN "
+            f"(SELECT id FROM tags WHERE name IN ({placeholders})))"
+        ), list(tags)
+    # 태그마다 id 집합을 구해 교집합 (없는 태그가 하나라도 있으면 결과 없음)
+    select = "SELECT knowledge_id FROM knowledge_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?)"
+    return f" AND id IN ({' INTERSECT '.join(select for _ in tags)})", list(tags)
+
+
+def knowledge_filter(level: Optional[int] = None, tags: Sequence[str] = (),
+                     mode: str = "all") -> Tuple[str, list]:
+    """` AND ...` conditions for the level and tag filters of the list and export APIs"""
+    where, params = tag_filter(tags, mode)
+    if level is not None:
+        where = " AND level = ?" + where
+        params = [level] + params
+    return where, params
+
+
+def facets(conn: sqlite3.Connection, level: Optional[int] = None, tags: Sequence[str] = (),
+           mode: str = "all") -> dict:
+    """Row counts per tag and per level, optionally within a filtered selection.
+
+    Unfiltered counts are read from the knowledge_tags primary key and the
+    level index alone.
+    """
+    where, params = knowledge_filter(level, tags, mode)
+    if where:
+        selection = f" WHERE knowledge_id IN (SELECT id FROM knowledge WHERE 1{where})"
+    else:
+        selection = ""
+    tag_counts = conn.execute(
+        f"""
+        SELECT tags.name, counts.n FROM (
+            SELECT tag_id, COUNT(*) AS n FROM knowledge_tags{selection} GROUP BY tag_id
+        ) AS counts JOIN tags ON tags.id = counts.tag_id
+        ORDER BY counts.n DESC, tags.name
+        """,
+        params
+    ).fetchall()
+    level_counts = conn.execute(
+        f"SELECT level, COUNT(*) FROM knowledge WHERE 1{where} GROUP BY level ORDER BY level",
+        params
+    ).fetchall()
+    return {
+        "tags": [{"tag": name, "count": count} for name, count in tag_counts],
+        "levels": [{"level": level, "count": count} for level, count in level_counts],
+        "total": sum(count for _, count in level_counts)
+    }
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 테스트는 backend 디렉토리의 모듈을 그대로 import 함
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database  # noqa: E402
+import corpus_generation  # noqa: E402
+import search_index  # noqa: E402
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    """Connection pool on an empty knowledge.db in a temporary directory.
+
+    Process-wide state derived from the database (generation counters, the
+    TF-IDF index and its file) starts empty too.
+    """
+    monkeypatch.setattr(database, "DATABASE_URL", str(tmp_path / "knowledge.db"))
+    monkeypatch.setattr(search_index, "INDEX_PATH", tmp_path / "tfidf_index.pkl")
+    monkeypatch.setattr(search_index, "_index", None)
+    monkeypatch.setattr(search_index, "_fit_version", -1)
+    monkeypatch.setattr(corpus_generation, "_values", {})
+    database.close_pool()
+    corpus_generation.close()
+    database.init_db()
+    yield database.get_pool()
+    search_index.flush_save()
+    corpus_generation.close()
+    database.close_pool()
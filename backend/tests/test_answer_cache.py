@@ -0,0 +1,57 @@
+import answer_cache
+
+
+def test_exact_repeats_ignore_case_and_whitespace():
+    cache = answer_cache.AnswerCache(max_entries=4)
+    cache.put("What is  TCP?", None, "transport protocol", 1)
+
+    assert cache.get_exact("what is tcp?", 1) == "transport protocol"
+    # 임베딩 없이 저장한 답변은 비슷한 질문에는 쓰지 않음
+    assert cache.get_similar([1.0, 0.0], 1) is None
+
+
+def test_similar_questions_hit_above_the_threshold():
+    cache = answer_cache.AnswerCache(max_entries=4, threshold=0.95)
+    cache.put("TCP 란?", [1.0, 0.0, 0.0], "tcp", 1)
+    cache.put("UDP 란?", [0.0, 1.0, 0.0], "udp", 1)
+
+    assert cache.get_similar([0.99, 0.05, 0.0], 1) == "tcp"
+    assert cache.get_similar([0.7, 0.7, 0.0], 1) is None
+    # 차원이 다른 임베딩은 비교하지 않음
+    assert cache.get_similar([1.0, 0.0], 1) is None
+    assert (cache.similar_hits, cache.misses) == (1, 2)
+
+
+def test_a_newer_generation_drops_every_answer():
+    cache = answer_cache.AnswerCache(max_entries=4)
+    cache.put("TCP 란?", [1.0, 0.0], "old", 1)
+
+    assert cache.get_exact("TCP 란?", 2) is None
+    assert cache.get_similar([1.0, 0.0], 2) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answers_of_an_older_generation_are_not_stored():
+    cache = answer_cache.AnswerCache(max_entries=4)
+    cache.put("UDP 란?", [0.0, 1.0], "udp", 2)
+
+    # 검색 후 다른 쓰기가 세대를 올렸으면 그 답변은 버림
+    cache.put("TCP 란?", [1.0, 0.0], "stale", 1)
+
+    assert cache.get_exact("TCP 란?", 2) is None
+    assert cache.get_exact("TCP 란?", 1) is None
+    assert cache.get_exact("UDP 란?", 2) == "udp"
+
+
+def test_least_recently_used_answer_is_evicted_with_its_vector():
+    cache = answer_cache.AnswerCache(max_entries=2)
+    cache.put("a", [1.0, 0.0, 0.0], "A", 1)
+    cache.put("b", [0.0, 1.0, 0.0], "B", 1)
+    assert cache.get_exact("a", 1) == "A"
+
+    cache.put("c", [0.0, 0.0, 1.0], "C", 1)
+
+    assert cache.get_exact("b", 1) is None
+    assert cache.get_similar([0.0, 1.0, 0.0], 1) is None
+    assert cache.get_similar([0.0, 0.0, 1.0], 1) == "C"
+    assert cache.get_exact("a", 1) == "A"
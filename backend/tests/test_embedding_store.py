@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+
+import numpy as np
+import pytest
+
+import corpus_generation
+import embedding_store
+
+
+class FakeEmbedder:
+    """Deterministic embedding function recording the texts it was asked for"""
+
+    def __init__(self, dimensions: int = 8):
+        self.dimensions = dimensions
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(self.dimensions).tolist())
+        return vectors
+
+    @property
+    def texts(self):
+        return [text for call in self.calls for text in call]
+
+
+def add_knowledge(pool, title, content):
+    def insert(conn):
+        cursor = conn.execute(
+            "INSERT INTO knowledge (title, level, tags, content, summary) VALUES (?, 1, '[]', ?, '{}')",
+            (title, content)
+        )
+        return cursor.lastrowid
+    return pool.write_sync(insert)
+
+
+def stored_ids(pool):
+    return pool.read_sync(
+        lambda conn: sorted(row[0] for row in conn.execute("SELECT knowledge_id FROM knowledge_embeddings"))
+    )
+
+
+def sync(embedder, ids=None):
+    return asyncio.run(embedding_store.sync_embeddings(embedder, ids=ids))
+
+
+@pytest.fixture(autouse=True)
+def fresh_matrix():
+    embedding_store.invalidate()
+    yield
+    embedding_store.invalidate()
+
+
+def test_sync_embeds_new_rows_once_per_distinct_content(pool):
+    first = add_knowledge(pool, "TCP", "연결 지향 프로토콜")
+    second = add_knowledge(pool, "UDP", "비연결 프로토콜")
+    third = add_knowledge(pool, "TCP", "연결 지향 프로토콜")
+    embedder = FakeEmbedder()
+
+    stats = sync(embedder)
+
+    assert stats["embedded"] == 3
+    assert len(embedder.texts) == 2
+    assert stored_ids(pool) == [first, second, third]
+    query = asyncio.run(embedder([embedding_store.embedding_text("UDP", "비연결 프로토콜")]))[0]
+    nearest = pool.read_sync(embedding_store.top_k, query, 1)
+    assert nearest[0][0] == second
+    assert nearest[0][1] == pytest.approx(1.0)
+
+
+def test_unchanged_rows_are_skipped(pool):
+    first = add_knowledge(pool, "TCP", "연결 지향 프로토콜")
+    add_knowledge(pool, "UDP", "비연결 프로토콜")
+    sync(FakeEmbedder())
+
+    embedder = FakeEmbedder()
+    stats = sync(embedder)
+    assert stats["unchanged"] == 2
+    assert embedder.calls == []
+
+    pool.write_sync(lambda conn: conn.execute("UPDATE knowledge SET content = '바뀐 내용' WHERE id = ?", (first,)))
+    stats = sync(embedder, ids=[first])
+    assert (stats["embedded"], stats["unchanged"]) == (1, 0)
+    assert embedder.texts == [embedding_store.embedding_text("TCP", "바뀐 내용")]
+
+
+def test_identical_content_reuses_stored_embedding(pool):
+    add_knowledge(pool, "TCP", "연결 지향 프로토콜")
+    sync(FakeEmbedder())
+
+    copy = add_knowledge(pool, "TCP", "연결 지향 프로토콜")
+    embedder = FakeEmbedder()
+    stats = sync(embedder, ids=[copy])
+
+    assert stats["reused"] == 1
+    assert embedder.calls == []
+    assert copy in stored_ids(pool)
+
+
+def test_embeddings_of_deleted_rows_are_removed(pool):
+    first = add_knowledge(pool, "TCP", "연결 지향 프로토콜")
+    second = add_knowledge(pool, "UDP", "비연결 프로토콜")
+    third = add_knowledge(pool, "IP", "주소 지정")
+    sync(FakeEmbedder())
+
+    pool.write_sync(lambda conn: conn.execute("DELETE FROM knowledge WHERE id = ?", (first,)))
+    stats = sync(FakeEmbedder())
+    assert stats["removed"] == 1
+    assert stored_ids(pool) == [second, third]
+
+    pool.write_sync(embedding_store.remove_embeddings, [second])
+    assert stored_ids(pool) == [third]
+
+
+def test_matrix_is_reloaded_only_when_embeddings_change(pool):
+    add_knowledge(pool, "TCP", "연결 지향 프로토콜")
+    sync(FakeEmbedder())
+    matrix, _ = pool.read_sync(embedding_store._load_matrix)
+
+    # 임베딩과 상관없는 knowledge 쓰기
+    corpus_generation.bump_sync()
+    assert pool.read_sync(embedding_store._load_matrix)[0] is matrix
+
+    # 다른 워커가 임베딩을 쓴 경우
+    corpus_generation.bump_sync(corpus_generation.EMBEDDINGS)
+    assert pool.read_sync(embedding_store._load_matrix)[0] is not matrix
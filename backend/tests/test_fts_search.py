@@ -0,0 +1,85 @@
+import pytest
+
+import database
+import fts_search
+
+
+def add_knowledge(pool, title, content, references="[]", tags="[]"):
+    def insert(conn):
+        cursor = conn.execute(
+            'INSERT INTO knowledge (title, level, tags, content, summary, "references") '
+            "VALUES (?, 1, ?, ?, '{}', ?)",
+            (title, tags, content, references)
+        )
+        return cursor.lastrowid
+    return pool.write_sync(insert)
+
+
+def search(pool, query):
+    return pool.read_sync(fts_search.search, query, 10)
+
+
+@pytest.fixture(autouse=True)
+def trigram_only(pool):
+    if pool.read_sync(fts_search.fts_tokenizer) != "trigram":
+        pytest.skip("SQLite was built without the trigram tokenizer")
+
+
+def ids(results):
+    return [result["knowledge"]["id"] for result in results]
+
+
+def test_short_terms_filter_trigram_matches(pool):
+    both = add_knowledge(pool, "방화벽 정책", "IP 주소 기반 차단")
+    add_knowledge(pool, "방화벽 구성", "포트 기반 차단")
+
+    assert ids(search(pool, "방화벽 IP")) == [both]
+    assert ids(search(pool, "IP 방화벽")) == [both]
+
+
+def test_every_term_must_match(pool):
+    both = add_knowledge(pool, "방화벽 정책", "IP 주소 기반 차단")
+    add_knowledge(pool, "방화벽 구성", "포트 기반 차단")
+    add_knowledge(pool, "라우팅 정책", "IP 경로 선택")
+
+    # 긴 단어끼리, 긴 단어와 짧은 단어, 짧은 단어끼리 모두 AND
+    assert ids(search(pool, "방화벽 정책")) == [both]
+    assert ids(search(pool, "정책 IP 차단")) == [both]
+    assert ids(search(pool, "IP 방화벽 경로")) == []
+
+
+def test_short_only_query_falls_back_to_like(pool):
+    match = add_knowledge(pool, "보안 개요", "기본 개념")
+    add_knowledge(pool, "네트워크 개요", "기본 개념")
+
+    assert ids(search(pool, "보안")) == [match]
+
+
+def test_short_only_query_requires_every_term(pool):
+    both = add_knowledge(pool, "보안 개요", "IP 기본")
+    add_knowledge(pool, "보안 정책", "포트 기본")
+
+    assert ids(search(pool, "보안 IP")) == [both]
+
+
+def test_results_include_references(pool):
+    add_knowledge(pool, "방화벽 정책", "차단 규칙", references='["https://example.com"]')
+
+    for query in ("방화벽", "정책"):
+        knowledge = search(pool, query)[0]["knowledge"]
+        assert knowledge["references"] == ["https://example.com"]
+
+
+def test_escaped_tags_are_rewritten_on_startup(pool):
+    escaped = add_knowledge(pool, "방화벽", "차단", tags='["\\ubcf4\\uc548"]')
+    assert ids(search(pool, "보안")) == []
+
+    database.init_db()
+
+    assert ids(search(pool, "보안")) == [escaped]
+    # 다시 쓴 행의 세대가 이미 공개된 세대여야 since 내보내기에 잡힘
+    row_generation, generation = pool.read_sync(lambda conn: conn.execute(
+        "SELECT k.generation, m.value FROM knowledge AS k, corpus_meta AS m "
+        "WHERE k.id = ? AND m.key = 'generation'", (escaped,)
+    ).fetchone())
+    assert row_generation == generation
@@ -0,0 +1,124 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import corpus_generation
+import http_cache
+
+BODY = b'{"items":[' + b",".join(b'{"id":%d}' % number for number in range(200)) + b"]}"
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """Fresh response cache and generation counters; `builds` counts body builds"""
+    monkeypatch.setattr(http_cache, "_cache", http_cache.ResponseCache())
+    monkeypatch.setattr(corpus_generation, "_values", {corpus_generation.GENERATION: 7})
+    return {"builds": 0, "during_build": None}
+
+
+@pytest.fixture
+def client(state):
+    app = FastAPI()
+
+    def built():
+        state["builds"] += 1
+        if state["during_build"]:
+            state["during_build"]()
+        return BODY
+
+    @app.get("/items")
+    async def items(request: Request):
+        async def build():
+            return built()
+        return await http_cache.cached_response(request, build)
+
+    @app.get("/stream")
+    async def stream(request: Request):
+        async def chunks():
+            body = built()
+            yield body[:100]
+            yield body[100:]
+        return await http_cache.cached_stream(request, chunks)
+
+    return TestClient(app)
+
+
+def bump():
+    corpus_generation._observe([(corpus_generation.GENERATION, corpus_generation.current() + 1)])
+
+
+@pytest.mark.parametrize("path", ["/items", "/stream"])
+def test_etag_revalidation_and_cache_hits(client, state, path):
+    first = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert first.content == BODY
+    assert first.headers["etag"] == '"g7"'
+
+    assert client.get(path, headers={"If-None-Match": '"g7"'}).status_code == 304
+    assert client.get(path, headers={"Accept-Encoding": "identity"}).content == BODY
+    assert state["builds"] == 1
+
+    bump()
+    response = client.get(path, headers={"If-None-Match": '"g7"', "Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"g8"'
+    assert state["builds"] == 2
+
+
+@pytest.mark.parametrize("path", ["/items", "/stream"])
+def test_gzip_is_negotiated(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"g7-gzip"'
+    assert response.content == BODY
+
+    # 304 은 인코딩과 상관없이 세대로 판단
+    assert client.get(path, headers={"If-None-Match": '"g7-gzip"'}).status_code == 304
+
+
+def test_choose_encoding_respects_quality(monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    assert http_cache.choose_encoding("gzip, deflate, br") == "gzip"
+    assert http_cache.choose_encoding("gzip;q=0, identity") is None
+    assert http_cache.choose_encoding(None) is None
+
+
+def test_stream_compressor_output_decodes():
+    compress_chunk, finish = http_cache.stream_compressor("gzip")
+    data = compress_chunk(BODY[:100]) + compress_chunk(BODY[100:]) + finish()
+    assert gzip.decompress(data) == BODY
+
+
+@pytest.mark.parametrize("path", ["/items", "/stream"])
+def test_body_built_across_a_write_is_not_cached(client, state, path):
+    state["during_build"] = bump
+
+    response = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert response.content == BODY
+    if path == "/items":
+        assert "etag" not in response.headers
+    assert http_cache.get_cache().stats()["entries"] == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = http_cache.ResponseCache(max_bytes=400)
+    for key in ("a", "b", "c", "d"):
+        cache.put(key, 1, key.encode() * 90)
+    assert cache.get("a", 1, None) is not None
+
+    cache.put("e", 1, b"e" * 90)
+
+    assert cache.get("b", 1, None) is None
+    assert [cache.get(key, 1, None)[0][:1] for key in "acde"] == [b"a", b"c", b"d", b"e"]
+
+
+def test_entries_of_older_generations_are_not_served():
+    cache = http_cache.ResponseCache()
+    cache.put("a", 1, b"old")
+    cache.put("b", 2, b"new")
+
+    assert cache.get("a", 1, None) is None
+    assert cache.get("b", 2, None) == (b"new", None)
+    cache.put("a", 1, b"stale")
+    assert cache.get("a", 1, None) is None
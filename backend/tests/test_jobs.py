@@ -0,0 +1,136 @@
+import asyncio
+import subprocess
+import time
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture(autouse=True)
+def jobs_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DATABASE_URL", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(jobs, "JOB_POLL_INTERVAL", 0.01)
+    jobs.init_jobs_db()
+
+
+def dead_pid():
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def add_job(job_id, kind, status, attempts=1, pid=None):
+    def insert(conn):
+        conn.execute(
+            "INSERT INTO jobs (id, kind, dedup_key, status, params, attempts, worker_pid, created_at) "
+            "VALUES (?, ?, ?, ?, '{}', ?, ?, ?)",
+            (job_id, kind, kind, status, attempts, pid or dead_pid(), time.time())
+        )
+    jobs._transaction(insert)
+
+
+def status(job_id):
+    return jobs._query(jobs._fetch, job_id)["status"]
+
+
+async def wait_for_status(job_id, expected):
+    while status(job_id) != expected:
+        await asyncio.sleep(0.01)
+
+
+def test_requests_merge_into_the_queued_job_but_not_the_running_one():
+    async def scenario():
+        runner = jobs.JobRunner()
+        release = asyncio.Event()
+        runs = []
+
+        async def handler(job, params):
+            runs.append(job.id)
+            await release.wait()
+
+        runner.register("rebuild", handler)
+        running, _ = await runner.submit("rebuild", dedup_key="rebuild")
+        await wait_for_status(running["id"], jobs.RUNNING)
+
+        # 실행 중인 작업은 변경 전의 파일을 읽었을 수 있으므로 새 작업이 대기열에 들어감
+        queued, created = await runner.submit("rebuild", dedup_key="rebuild")
+        assert created and queued["id"] != running["id"]
+        merged, created = await runner.submit("rebuild", dedup_key="rebuild")
+        assert not created and merged["id"] == queued["id"]
+
+        release.set()
+        assert (await runner.wait(queued["id"]))["status"] == jobs.SUCCEEDED
+        assert runs == [running["id"], queued["id"]]
+
+    asyncio.run(scenario())
+
+
+def test_recover_requeues_interrupted_resumable_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 2)
+    add_job("resumed", "rebuild", jobs.RUNNING)
+    add_job("exhausted", "embed", jobs.RUNNING, attempts=2)
+    add_job("not-resumable", "summary", jobs.RUNNING)
+
+    async def scenario():
+        runner = jobs.JobRunner()
+        runs = []
+
+        async def handler(job, params):
+            runs.append(job.id)
+
+        for kind in ("rebuild", "embed"):
+            runner.register(kind, handler, resumable=True)
+        runner.register("summary", handler)
+
+        assert await runner.recover() == ["resumed"]
+        job = await runner.wait("resumed")
+        assert job["status"] == jobs.SUCCEEDED and job["attempts"] == 2
+        assert runs == ["resumed"]
+
+    asyncio.run(scenario())
+    assert status("exhausted") == jobs.INTERRUPTED
+    assert status("not-resumable") == jobs.INTERRUPTED
+
+
+def test_recover_leaves_jobs_of_live_workers_alone():
+    add_job("elsewhere", "rebuild", jobs.RUNNING, pid=1)
+
+    async def scenario():
+        runner = jobs.JobRunner()
+
+        async def handler(job, params):
+            pass
+
+        runner.register("rebuild", handler, resumable=True)
+        assert await runner.recover() == []
+
+    asyncio.run(scenario())
+    assert status("elsewhere") == jobs.RUNNING
+
+
+def test_flush_progress_records_reported_progress():
+    async def scenario():
+        runner = jobs.JobRunner()
+        reported = asyncio.Event()
+        release = asyncio.Event()
+
+        async def handler(job, params):
+            job.stage(0.5, 1.0)(0.5, "halfway")
+            reported.set()
+            await release.wait()
+
+        runner.register("rebuild", handler)
+        job, _ = await runner.submit("rebuild")
+        await reported.wait()
+
+        assert jobs._query(jobs._fetch, job["id"])["progress"] == 0
+        runner.flush_progress()
+        stored = jobs._query(jobs._fetch, job["id"])
+        assert (stored["progress"], stored["message"]) == (0.75, "halfway")
+        assert runner._jobs[job["id"]].take_update() is None
+
+        release.set()
+        assert (await runner.wait(job["id"]))["progress"] == 1.0
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import json
+import random
+
+import knowledge_graph
+import search_index
+
+WORDS = "network security firewall packet routing switch vlan tcp udp dns http tls cipher proxy cache".split()
+TAGS = ["네트워크", "보안", "프로토콜", "암호", "웹", "운영"]
+
+
+def random_row(rng, number):
+    return (
+        f"item {number} " + " ".join(rng.sample(WORDS, 2)),
+        rng.randint(1, 3),
+        json.dumps(rng.sample(TAGS, rng.randint(0, 3)), ensure_ascii=False),
+        " ".join(rng.choices(WORDS, k=12)),
+        json.dumps([f"Item-{rng.randint(0, number + 5)}" for _ in range(rng.randint(0, 2))]),
+        f"item-{number}.yaml",
+    )
+
+
+def insert(conn, row):
+    return conn.execute(
+        'INSERT INTO knowledge (title, level, tags, content, summary, "references", source_file) '
+        "VALUES (?, ?, ?, ?, '{}', ?, ?)",
+        row
+    ).lastrowid
+
+
+def edges(conn):
+    return sorted(conn.execute(
+        "SELECT source_id, target_id, kind, round(weight, 4), chosen_by FROM knowledge_edges"
+    ).fetchall())
+
+
+def test_update_edges_matches_full_rebuild(pool, monkeypatch):
+    # 재학습하면 모든 행의 벡터가 바뀌므로 증분 갱신과 비교할 수 없음
+    monkeypatch.setattr(search_index, "REFIT_RATIO", 10.0)
+    rng = random.Random(7)
+    pool.write_sync(lambda conn: [insert(conn, random_row(rng, number)) for number in range(60)])
+    pool.write_sync(lambda conn: (search_index.rebuild(conn), knowledge_graph.rebuild_edges(conn)))
+
+    def step(conn, number):
+        ids = [row[0] for row in conn.execute("SELECT id FROM knowledge")]
+        deleted = rng.sample(ids, 2)
+        updated = [node_id for node_id in rng.sample(ids, 3) if node_id not in deleted]
+        conn.execute(f"DELETE FROM knowledge WHERE id IN ({deleted[0]}, {deleted[1]})")
+        for node_id in updated:
+            title, level, tags, content, references, _ = random_row(rng, number)
+            conn.execute(
+                'UPDATE knowledge SET title = ?, level = ?, tags = ?, content = ?, "references" = ? WHERE id = ?',
+                (title, level, tags, content, references, node_id)
+            )
+        added = [insert(conn, random_row(rng, number + offset)) for offset in range(2)]
+        search_index.remove_documents(conn, deleted)
+        search_index.update_documents(conn, updated + added)
+        knowledge_graph.update_edges(conn, deleted + updated + added)
+
+    for number in range(60, 100, 5):
+        pool.write_sync(step, number)
+        incremental = pool.read_sync(edges)
+        pool.write_sync(knowledge_graph.rebuild_edges)
+        assert incremental == pool.read_sync(edges)
+
+
+def test_deleting_a_referenced_item_retargets_references(pool):
+    def setup(conn):
+        first = insert(conn, ("TCP", 1, "[]", "a", "[]", "tcp.yaml"))
+        second = insert(conn, ("tcp", 1, "[]", "b", "[]", None))
+        source = insert(conn, ("Handshake", 1, "[]", "c", '["TCP"]', None))
+        search_index.rebuild(conn)
+        knowledge_graph.rebuild_edges(conn)
+        return first, second, source
+
+    first, second, source = pool.write_sync(setup)
+    assert (first, source, "reference", 1.0, knowledge_graph.OWNS_TARGET) in pool.read_sync(edges)
+
+    def delete(conn):
+        conn.execute("DELETE FROM knowledge WHERE id = ?", (first,))
+        search_index.remove_documents(conn, [first])
+        knowledge_graph.update_edges(conn, [first])
+
+    pool.write_sync(delete)
+    assert pool.read_sync(edges) == [(second, source, "reference", 1.0, knowledge_graph.OWNS_TARGET)]
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import llm_scheduler
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "LLM_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(llm_scheduler, "LLM_BACKOFF_MAX", 0.01)
+
+
+def scheduler(**kwargs):
+    return llm_scheduler.LLMScheduler(requests_per_minute=0, tokens_per_minute=0, **kwargs)
+
+
+def flaky(failures, error=asyncio.TimeoutError):
+    """Call failing `failures` times before returning the number of attempts"""
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) <= failures:
+            raise error()
+        return len(attempts)
+    return call
+
+
+def test_retryable_errors_are_retried():
+    llm = scheduler()
+
+    assert asyncio.run(llm.run(flaky(2), tokens=10)) == 3
+    assert (llm.retries, llm.completed, llm.failed, llm.running) == (2, 1, 0, 0)
+
+
+def test_other_errors_are_not_retried():
+    llm = scheduler()
+
+    with pytest.raises(ValueError):
+        asyncio.run(llm.run(flaky(1, ValueError), tokens=10))
+    assert (llm.retries, llm.failed, llm.running) == (0, 1, 0)
+
+
+def test_timeouts_give_up_with_deadline_exceeded(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "LLM_MAX_RETRIES", 2)
+    llm = scheduler()
+
+    with pytest.raises(llm_scheduler.LLMDeadlineExceeded):
+        asyncio.run(llm.run(flaky(10), tokens=10))
+    assert (llm.retries, llm.timeouts, llm.running) == (2, 1, 0)
+
+
+def test_slow_call_is_cut_off_at_the_deadline():
+    llm = scheduler()
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    with pytest.raises(llm_scheduler.LLMDeadlineExceeded):
+        asyncio.run(llm.run(hang, tokens=10, timeout=0.05))
+
+
+def test_waiting_for_a_slot_counts_against_the_deadline():
+    llm = scheduler(max_concurrency=1)
+
+    async def scenario():
+        async with llm.stream(lambda: asyncio.sleep(0, "stream"), tokens=10):
+            with pytest.raises(llm_scheduler.LLMDeadlineExceeded):
+                await llm.run(flaky(0), tokens=10, timeout=0.05)
+        # 스트림이 닫히면 자리가 돌아옴
+        return await llm.run(flaky(0), tokens=10, timeout=0.05)
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_overlapping_calls_with_the_same_key_share_one_call():
+    llm = scheduler()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def scenario():
+        key = llm_scheduler.request_key("chat", {"prompt": "TCP 란?"})
+        first = asyncio.ensure_future(llm.run(call, tokens=10, key=key))
+        await asyncio.sleep(0)
+        # 먼저 요청한 쪽이 취소되어도 같은 호출을 기다리는 쪽은 결과를 받음
+        second = llm.run(call, tokens=10, key=key)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "answer"
+    assert (len(calls), llm.coalesced) == (1, 1)
+
+
+def test_rate_budget_wait_beyond_the_deadline_fails_fast():
+    llm = llm_scheduler.LLMScheduler(requests_per_minute=0, tokens_per_minute=60)
+
+    async def scenario():
+        await llm.run(flaky(0), tokens=60)
+        # 1 토큰/초로 다시 채워지므로 60 토큰은 마감 안에 예약할 수 없음
+        await llm.run(flaky(0), tokens=60, timeout=1)
+
+    with pytest.raises(llm_scheduler.LLMDeadlineExceeded):
+        asyncio.run(scenario())
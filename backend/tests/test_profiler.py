@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiler
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", tmp_path / "profiles")
+    monkeypatch.setattr(profiler, "PROFILE_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "ENABLED", True)
+
+    app = FastAPI()
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_requested_profile_is_named_in_the_response(client):
+    response = client.get("/ping", headers={"X-Profile": "secret"})
+
+    name = response.headers["x-profile-id"]
+    assert profiler.profile_path(name).parent == profiler.PROFILE_DIR
+
+
+def test_sampled_profile_is_saved_without_telling_the_client(client, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_SAMPLE_RATE", 1.0)
+
+    response = client.get("/ping")
+
+    assert "x-profile-id" not in response.headers
+    assert len(profiler.list_profiles()) == 1
+
+
+def test_profiles_are_kept_outside_the_public_data_directory():
+    # main.py 가 data 디렉토리를 /data 로 그대로 공개함
+    data_dir = Path(profiler.__file__).resolve().parent / "data"
+    assert data_dir not in profiler.PROFILE_DIR.resolve().parents
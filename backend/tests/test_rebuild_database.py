@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+import knowledge_manager
+import search_index
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    directory = tmp_path / "knowledge_files"
+    directory.mkdir()
+    monkeypatch.setattr(knowledge_manager, "KNOWLEDGE_FILES_DIR", directory)
+    return directory
+
+
+def write_file(directory, name, title, content, mtime):
+    path = directory / name
+    path.write_text(f"title: {title}\nlevel: 1\ntags: [보안]\ncontent: {content}\nsummary: 요약\n", encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def rebuild(pool):
+    return pool.write_sync(knowledge_manager.rebuild_database)
+
+
+def ids_by_file(pool):
+    return dict(pool.read_sync(lambda conn: conn.execute(
+        "SELECT source_file, id FROM knowledge WHERE source_file IS NOT NULL"
+    ).fetchall()))
+
+
+def test_rebuild_applies_only_the_changed_files(pool, files):
+    write_file(files, "tcp.yaml", "TCP", "연결 지향 프로토콜", 1000)
+    write_file(files, "udp.yaml", "UDP", "비연결 프로토콜", 1000)
+    write_file(files, "dns.yaml", "DNS", "이름 해석", 1000)
+    write_file(files, "tls.yaml", "TLS", "전송 계층 보안", 1000)
+    report = rebuild(pool)
+    assert (report["added"], report["updated"], report["deleted"]) == (4, 0, 0)
+    before = ids_by_file(pool)
+
+    write_file(files, "tcp.yaml", "TCP", "혼잡 제어를 하는 연결 지향 프로토콜", 2000)
+    # 내용은 그대로이고 mtime 만 바뀐 파일
+    write_file(files, "udp.yaml", "UDP", "비연결 프로토콜", 2000)
+    (files / "dns.yaml").unlink()
+    write_file(files, "http.yaml", "HTTP", "웹 프로토콜", 2000)
+    manual = pool.write_sync(lambda conn: conn.execute(
+        "INSERT INTO knowledge (title, level, tags, content, summary) VALUES ('수동', 1, '[]', '', '{}')"
+    ).lastrowid)
+
+    report = rebuild(pool)
+
+    after = ids_by_file(pool)
+    assert (report["added"], report["updated"], report["unchanged"]) == (1, 1, 2)
+    assert sorted(report["changed_ids"]) == sorted([before["tcp.yaml"], after["http.yaml"]])
+    assert sorted(report["deleted_ids"]) == sorted([before["dns.yaml"], manual])
+    # 바뀌었거나 그대로인 파일의 행 id 는 유지
+    assert {name: after[name] for name in ("tcp.yaml", "udp.yaml", "tls.yaml")} == {
+        name: before[name] for name in ("tcp.yaml", "udp.yaml", "tls.yaml")
+    }
+    assert sorted(search_index.get_index().ids.tolist()) == sorted(after.values())
+
+    report = rebuild(pool)
+    assert (report["changed_ids"], report["deleted_ids"], report["unchanged"]) == ([], [], 4)
+
+
+def test_unparsable_file_keeps_its_previous_row(pool, files):
+    write_file(files, "tcp.yaml", "TCP", "연결 지향 프로토콜", 1000)
+    rebuild(pool)
+    before = ids_by_file(pool)
+
+    (files / "tcp.yaml").write_text("title: [unclosed", encoding="utf-8")
+    os.utime(files / "tcp.yaml", (2000, 2000))
+    report = rebuild(pool)
+
+    assert [error["file"] for error in report["errors"]] == ["tcp.yaml"]
+    assert (report["changed_ids"], report["deleted_ids"]) == ([], [])
+    assert ids_by_file(pool) == before
@@ -0,0 +1,70 @@
+import random
+
+import related_index
+import search_index
+
+WORDS = "network security firewall packet routing switch vlan tcp udp dns http tls cipher proxy cache".split()
+
+
+def insert(conn, title, content):
+    return conn.execute(
+        "INSERT INTO knowledge (title, level, tags, content, summary) VALUES (?, 1, '[]', ?, '{}')",
+        (title, content)
+    ).lastrowid
+
+
+def random_text(rng):
+    return " ".join(rng.sample(WORDS, 2)), " ".join(rng.choices(WORDS, k=10))
+
+
+def related(conn):
+    return conn.execute(
+        "SELECT knowledge_id, rank, related_id, round(score, 6) FROM knowledge_related ORDER BY knowledge_id, rank"
+    ).fetchall()
+
+
+def test_update_related_matches_full_rebuild(pool, monkeypatch):
+    # 재학습하면 모든 행의 점수가 바뀌므로 증분 갱신과 비교할 수 없음
+    monkeypatch.setattr(search_index, "REFIT_RATIO", 10.0)
+    monkeypatch.setattr(related_index, "RELATED_STORE_K", 5)
+    rng = random.Random(3)
+    pool.write_sync(lambda conn: [insert(conn, *random_text(rng)) for _ in range(50)])
+    pool.write_sync(lambda conn: (search_index.rebuild(conn), related_index.rebuild_related(conn)))
+
+    def step(conn):
+        ids = [row[0] for row in conn.execute("SELECT id FROM knowledge")]
+        deleted = rng.sample(ids, 2)
+        updated = [node_id for node_id in rng.sample(ids, 3) if node_id not in deleted]
+        conn.execute(f"DELETE FROM knowledge WHERE id IN ({deleted[0]}, {deleted[1]})")
+        for node_id in updated:
+            conn.execute("UPDATE knowledge SET title = ?, content = ? WHERE id = ?", (*random_text(rng), node_id))
+        added = [insert(conn, *random_text(rng)) for _ in range(2)]
+        search_index.remove_documents(conn, deleted)
+        search_index.update_documents(conn, updated + added)
+        related_index.update_related(conn, deleted + updated + added)
+
+    for _ in range(8):
+        pool.write_sync(step)
+        incremental = pool.read_sync(related)
+        pool.write_sync(related_index.rebuild_related)
+        assert incremental == pool.read_sync(related)
+
+
+def test_related_items_drop_deleted_rows(pool):
+    tcp, udp, sctp, _ = pool.write_sync(lambda conn: [
+        insert(conn, "TCP", "connection oriented transport protocol"),
+        insert(conn, "UDP", "connectionless transport protocol"),
+        insert(conn, "SCTP", "message oriented transport protocol"),
+        insert(conn, "Firewall", "packet filtering security"),
+    ])
+    pool.write_sync(lambda conn: (search_index.rebuild(conn), related_index.rebuild_related(conn)))
+    assert {item["id"] for item in pool.read_sync(related_index.related_items, tcp)} == {udp, sctp}
+
+    def delete(conn):
+        conn.execute("DELETE FROM knowledge WHERE id = ?", (udp,))
+        search_index.remove_documents(conn, [udp])
+        related_index.update_related(conn, [udp])
+
+    pool.write_sync(delete)
+    assert [item["id"] for item in pool.read_sync(related_index.related_items, tcp)] == [sctp]
+    assert pool.read_sync(related_index.related_items, udp) is None
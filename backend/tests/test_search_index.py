@@ -0,0 +1,52 @@
+import corpus_generation
+import search_index
+
+
+def add_knowledge(pool, title, content):
+    def insert(conn):
+        cursor = conn.execute(
+            "INSERT INTO knowledge (title, level, tags, content, summary) VALUES (?, 1, '[]', ?, '{}')",
+            (title, content)
+        )
+        return cursor.lastrowid
+    return pool.write_sync(insert)
+
+
+def write(pool, title, content):
+    """Create a row the way the API does: commit, update the index, then bump"""
+    new_id = add_knowledge(pool, title, content)
+    pool.read_sync(search_index.update_documents, [new_id])
+    corpus_generation.bump_sync()
+    return new_id
+
+
+def test_local_write_is_applied_once(pool):
+    for number in range(20):
+        add_knowledge(pool, f"TCP {number}", "connection oriented transport protocol")
+    pool.read_sync(search_index.rebuild)
+    corpus_generation.bump_sync()
+    index = search_index.get_index()
+
+    new_id = write(pool, "UDP", "connectionless transport protocol")
+    assert index.changes_since_fit == 1
+
+    assert search_index.get_index() is index
+    assert index.changes_since_fit == 1
+    assert index.generation == corpus_generation.current()
+    assert new_id in index.ids
+
+
+def test_catch_up_applies_rows_written_elsewhere(pool):
+    for number in range(20):
+        add_knowledge(pool, f"TCP {number}", "connection oriented transport protocol")
+    pool.read_sync(search_index.rebuild)
+    corpus_generation.bump_sync()
+    index = search_index.get_index()
+
+    # 다른 워커의 쓰기: 인덱스를 건드리지 않고 커밋 후 세대만 올림
+    new_id = add_knowledge(pool, "UDP", "connectionless transport protocol")
+    corpus_generation.bump_sync()
+
+    assert search_index.get_index() is index
+    assert index.changes_since_fit == 1
+    assert new_id in index.ids
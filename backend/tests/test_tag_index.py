@@ -0,0 +1,90 @@
+import tag_index
+
+
+def add_knowledge(pool, title, tags, level=1):
+    def insert(conn):
+        cursor = conn.execute(
+            "INSERT INTO knowledge (title, level, tags, content, summary) VALUES (?, ?, ?, '', '{}')",
+            (title, level, tags)
+        )
+        return cursor.lastrowid
+    return pool.write_sync(insert)
+
+
+def stored_tags(pool, knowledge_id):
+    return pool.read_sync(lambda conn: sorted(row[0] for row in conn.execute(
+        "SELECT tags.name FROM knowledge_tags JOIN tags ON tags.id = knowledge_tags.tag_id "
+        "WHERE knowledge_tags.knowledge_id = ?", (knowledge_id,)
+    )))
+
+
+def filtered(pool, tags, mode="all", level=None):
+    def select(conn):
+        where, params = tag_index.knowledge_filter(level, tags, mode)
+        return [row[0] for row in conn.execute(f"SELECT id FROM knowledge WHERE 1{where} ORDER BY id", params)]
+    return pool.read_sync(select)
+
+
+def test_triggers_keep_knowledge_tags_in_sync(pool):
+    knowledge_id = add_knowledge(pool, "방화벽", '["보안", "네트워크", "보안", 3]')
+    assert stored_tags(pool, knowledge_id) == ["네트워크", "보안"]
+
+    pool.write_sync(lambda conn: conn.execute(
+        "UPDATE knowledge SET tags = '[\"운영\"]' WHERE id = ?", (knowledge_id,)
+    ))
+    assert stored_tags(pool, knowledge_id) == ["운영"]
+
+    pool.write_sync(lambda conn: conn.execute(
+        "UPDATE knowledge SET tags = 'not json' WHERE id = ?", (knowledge_id,)
+    ))
+    assert stored_tags(pool, knowledge_id) == []
+
+    other = add_knowledge(pool, "라우팅", '["\\ub124\\ud2b8\\uc6cc\\ud06c"]')
+    assert stored_tags(pool, other) == ["네트워크"]
+    pool.write_sync(lambda conn: conn.execute("DELETE FROM knowledge WHERE id = ?", (other,)))
+    assert stored_tags(pool, other) == []
+
+
+def test_upsert_updates_the_tags_of_an_existing_row(pool):
+    def upsert(conn, tags):
+        conn.execute("""
+            INSERT INTO knowledge (title, level, tags, content, summary, source_file)
+            VALUES ('방화벽', 1, ?, '', '{}', 'firewall.yaml')
+            ON CONFLICT(source_file) DO UPDATE SET tags = excluded.tags
+        """, (tags,))
+        return conn.execute("SELECT id FROM knowledge WHERE source_file = 'firewall.yaml'").fetchone()[0]
+
+    knowledge_id = pool.write_sync(upsert, '["보안"]')
+    assert pool.write_sync(upsert, '["보안", "운영"]') == knowledge_id
+    assert stored_tags(pool, knowledge_id) == ["보안", "운영"]
+
+
+def test_tag_filter_modes(pool):
+    both = add_knowledge(pool, "방화벽", '["보안", "네트워크"]')
+    security = add_knowledge(pool, "암호", '["보안"]', level=2)
+    network = add_knowledge(pool, "라우팅", '["네트워크"]')
+    add_knowledge(pool, "운영", "[]")
+
+    assert filtered(pool, ["보안", "네트워크"]) == [both]
+    assert filtered(pool, ["보안", "네트워크"], mode="any") == [both, security, network]
+    assert filtered(pool, ["보안", "없는 태그"]) == []
+    assert filtered(pool, ["보안"], level=2) == [security]
+
+
+def test_facets_count_within_the_filter(pool):
+    add_knowledge(pool, "방화벽", '["보안", "네트워크"]')
+    add_knowledge(pool, "암호", '["보안"]', level=2)
+    add_knowledge(pool, "라우팅", '["네트워크"]')
+
+    facets = pool.read_sync(tag_index.facets)
+    assert facets["tags"] == [{"tag": "네트워크", "count": 2}, {"tag": "보안", "count": 2}]
+    assert facets["total"] == 3
+
+    facets = pool.read_sync(tag_index.facets, None, ["보안"])
+    assert facets["tags"] == [{"tag": "보안", "count": 2}, {"tag": "네트워크", "count": 1}]
+    assert facets["levels"] == [{"level": 1, "count": 1}, {"level": 2, "count": 1}]
+
+
+def test_parse_tags_splits_and_deduplicates():
+    assert tag_index.parse_tags(["보안, 네트워크", "보안", " "]) == ["보안", "네트워크"]
+    assert tag_index.parse_tags(None) == []
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useRef } from 'react';
 import { BrowserRouter as Router, Routes, Route, Link } from 'react-router-dom';
 import {
   ThemeProvider,
@@ -13,8 +13,7 @@ import KnowledgeGraph from './components/KnowledgeGraph';
 import KnowledgeFileManager from './components/KnowledgeFileManager';
 import AISearchBar from './components/AISearchBar';
 import AIResponsePopup from './components/AIResponsePopup';
-
-const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+import { queryAIStream } from './api/api';
 
 const theme = createTheme({
   palette: {
@@ -25,26 +24,40 @@ const theme = createTheme({
 const App = () => {
   const [aiPopupOpen, setAiPopupOpen] = useState(false);
   const [aiResponse, setAiResponse] = useState('');
+  const [aiStreaming, setAiStreaming] = useState(false);
+  const abortRef = useRef(null);
 
   const handleAISearch = async (query) => {
+    abortRef.current?.abort();
+    const controller = new AbortController();
+    abortRef.current = controller;
+
+    setAiResponse('');
+    setAiStreaming(true);
+    setAiPopupOpen(true);
     try {
-      const response = await fetch(`${API_URL}/ai/query`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ query }),
+      await queryAIStream(query, {
+        signal: controller.signal,
+        onDelta: (_, text) => setAiResponse(text),
       });
-      const data = await response.json();
-      setAiResponse(data.response);
-      setAiPopupOpen(true);
     } catch (error) {
+      if (error.name === 'AbortError') return;
       console.error('Error:', error);
       setAiResponse('Error occurred while processing your request.');
-      setAiPopupOpen(true);
+    } finally {
+      if (abortRef.current === controller) {
+        abortRef.current = null;
+        setAiStreaming(false);
+      }
     }
   };
 
+  // 팝업을 닫으면 진행 중인 스트림을 중단해 서버의 생성도 멈춤
+  const handleAIPopupClose = () => {
+    abortRef.current?.abort();
+    setAiPopupOpen(false);
+  };
+
   return (
     <ThemeProvider theme={theme}>
       <CssBaseline />
@@ -82,8 +95,9 @@ const App = () => {
                     </Box>
                     <AIResponsePopup
                       open={aiPopupOpen}
-                      onClose={() => setAiPopupOpen(false)}
+                      onClose={handleAIPopupClose}
                       response={aiResponse}
+                      isStreaming={aiStreaming}
                     />
                   </Box>
                 }
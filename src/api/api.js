@@ -59,3 +59,95 @@ export const queryAI = async (query) => {
   }
   return response.json();
 };
+
+// NDJSON 검색 스트림: 랭킹 결과를 먼저 받고, AI 요약은 완료되는 대로 전달
+export const searchKnowledgeStream = async (query, { onResults, onSummary, mode = 'tfidf', limit = 10 } = {}) => {
+  const response = await fetch(`${API_URL}/api/search/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ query, mode, limit }),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to search knowledge');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let results = [];
+
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const event = JSON.parse(line);
+    if (event.type === 'results') {
+      results = event.results.map(result => ({ ...result, ai_summary: null }));
+      onResults?.(results);
+    } else if (event.type === 'summary') {
+      results = results.map((result, index) =>
+        index === event.index ? { ...result, ai_summary: event.ai_summary } : result
+      );
+      onSummary?.(event, results);
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+  return results;
+};
+
+// /ai/query SSE 스트림: 토큰 조각이 도착할 때마다 onDelta 호출. signal 로 중단하면 서버도 생성을 멈춤
+export const queryAIStream = async (query, { onDelta, signal } = {}) => {
+  const response = await fetch(`${API_URL}/ai/query`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify({ query, stream: true }),
+    signal,
+  });
+  if (!response.ok) {
+    throw new Error('Failed to query AI');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+
+  const handleEvent = (raw) => {
+    let event = 'message';
+    let data = '';
+    raw.split('\n').forEach(line => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    if (!data) return;
+    const payload = JSON.parse(data);
+    if (event === 'delta') {
+      text += payload.content;
+      onDelta?.(payload.content, text);
+    } else if (event === 'error') {
+      throw new Error(payload.detail);
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    events.forEach(handleEvent);
+  }
+  return text;
+};
@@ -1,7 +1,7 @@
 import React from 'react';
 
-const AIResponsePopup = ({ open, onClose, response }) => {
-  if (!response || !open) return null;
+const AIResponsePopup = ({ open, onClose, response, isStreaming = false }) => {
+  if (!open || (!response && !isStreaming)) return null;
 
   return (
     <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center p-4 z-50">
@@ -22,6 +22,7 @@ const AIResponsePopup = ({ open, onClose, response }) => {
           <div className="mb-6">
             <p className="text-gray-300 whitespace-pre-wrap">
               {response}
+              {isStreaming && <span className="animate-pulse">▍</span>}
             </p>
           </div>
         </div>
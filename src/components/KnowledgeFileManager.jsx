@@ -1,11 +1,13 @@
 import React, { useState, useEffect } from 'react';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+const JOB_POLL_INTERVAL_MS = 1000;
 
 const KnowledgeFileManager = () => {
   const [knowledgeFiles, setKnowledgeFiles] = useState([]);
   const [selectedFile, setSelectedFile] = useState(null);
   const [message, setMessage] = useState({ text: '', type: '' });
+  const [rebuilding, setRebuilding] = useState(false);
 
   const fetchKnowledgeFiles = async () => {
     try {
@@ -86,16 +88,41 @@ const KnowledgeFileManager = () => {
     }
   };
 
+  // 재구축은 백그라운드 작업으로 실행되므로 끝날 때까지 작업 상태를 조회
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await fetch(`${API_URL}/jobs/${jobId}`);
+      if (!response.ok) throw new Error('작업 상태 조회 실패');
+      const job = await response.json();
+      if (job.status === 'succeeded') return job;
+      if (job.status === 'failed' || job.status === 'interrupted') {
+        throw new Error(job.error || job.status);
+      }
+      const percent = Math.round(job.progress * 100);
+      setMessage({ text: `데이터베이스 재구축 중... ${percent}% ${job.message || ''}`, type: 'success' });
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+  };
+
   const handleRebuild = async () => {
+    if (rebuilding) return;
+    setRebuilding(true);
     try {
       const response = await fetch(`${API_URL}/knowledge/rebuild`, {
         method: 'POST'
       });
       if (!response.ok) throw new Error('재구축 실패');
-      setMessage({ text: '데이터베이스 재구축 성공', type: 'success' });
+      const job = await waitForJob((await response.json()).id);
+      const { added, updated, deleted } = job.result;
+      setMessage({
+        text: `데이터베이스 재구축 성공 (추가 ${added}, 수정 ${updated}, 삭제 ${deleted})`,
+        type: 'success'
+      });
       fetchKnowledgeFiles();
     } catch (error) {
       setMessage({ text: '데이터베이스 재구축 실패: ' + error.message, type: 'error' });
+    } finally {
+      setRebuilding(false);
     }
   };
 
@@ -124,17 +151,18 @@ const KnowledgeFileManager = () => {
         </button>
         <button 
           onClick={handleRebuild} 
+          disabled={rebuilding}
           style={{ 
             marginRight: '10px',
-            backgroundColor: '#2196F3',
+            backgroundColor: rebuilding ? '#90CAF9' : '#2196F3',
             color: 'white',
             padding: '8px 16px',
             border: 'none',
             borderRadius: '4px',
-            cursor: 'pointer'
+            cursor: rebuilding ? 'default' : 'pointer'
           }}
         >
-          DB 재구축
+          {rebuilding ? 'DB 재구축 중...' : 'DB 재구축'}
         </button>
         <button 
           onClick={() => window.location.href = `${API_URL}/knowledge/template`}
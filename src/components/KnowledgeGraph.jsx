@@ -6,71 +6,6 @@ import { motion, AnimatePresence } from 'framer-motion';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
-const createLinks = (nodes) => {
-  const links = [];
-  const nodeMap = new Map(nodes.map(node => [node.id, node]));
-
-  nodes.forEach(node1 => {
-    nodes.forEach(node2 => {
-      // 같은 노드가 아닌 경우만 처리
-      if (node1.id !== node2.id) {
-        // 공통 태그 찾기
-        const commonTags = node1.tags.filter(tag => node2.tags.includes(tag));
-        
-        // 태그가 하나라도 공통인 경우에만 연결 고려
-        if (commonTags.length > 0) {
-          const levelDiff = Math.abs(node1.level - node2.level);
-          
-          // 규칙 1: 한 단계 레벨 차이가 나는 노드 연결
-          if (levelDiff === 1) {
-            links.push({
-              source: node1.id,
-              target: node2.id,
-              commonTags
-            });
-          }
-          // 규칙 2: 같은 레벨의 노드 연결 (부모 노드 확인)
-          else if (levelDiff === 0) {
-            // 각 노드의 부모 노드 찾기 (한 단계 높은 레벨의 연결된 노드)
-            const node1Parents = findParentNodes(node1, links, nodeMap);
-            const node2Parents = findParentNodes(node2, links, nodeMap);
-            
-            // 부모 노드를 공유하지 않는 경우에만 연결
-            const hasCommonParent = node1Parents.some(parent1 => 
-              node2Parents.some(parent2 => parent1 === parent2)
-            );
-            
-            if (!hasCommonParent) {
-              links.push({
-                source: node1.id,
-                target: node2.id,
-                commonTags
-              });
-            }
-          }
-        }
-      }
-    });
-  });
-  
-  console.log('Created links:', links);
-  return links;
-};
-
-// 노드의 부모 노드들을 찾는 함수
-const findParentNodes = (node, links, nodeMap) => {
-  return links
-    .filter(link => 
-      (link.source === node.id || link.target === node.id) &&
-      (nodeMap.get(link.source).level === node.level + 1 || 
-       nodeMap.get(link.target).level === node.level + 1)
-    )
-    .map(link => {
-      const otherId = link.source === node.id ? link.target : link.source;
-      return nodeMap.get(otherId).id;
-    });
-};
-
 const Graph = () => {
   const fgRef = useRef();
   const containerRef = useRef();
@@ -85,42 +20,39 @@ const Graph = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const response = await fetch(`${API_URL}/knowledge/files`);
+        // 간선은 서버가 미리 계산해 둠. 노드에는 본문이 없으므로 클릭할 때 따로 불러옴
+        const response = await fetch(`${API_URL}/api/knowledge/for-graph`);
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
         const data = await response.json();
-        const knowledgeItems = data.files || [];
         
         // Process nodes
-        const nodes = knowledgeItems.map(item => ({
-          id: item.id || item.filename,
+        const nodes = (data.nodes || []).map(item => ({
+          id: item.id,
           name: item.title,
           level: Math.min(item.level, 4),
           tags: Array.isArray(item.tags) ? item.tags : [],
           group: item.level,
-          content: item.content,
-          summary: item.summary,
-          references: Array.isArray(item.references) ? item.references : []
+          neighbors: [],
+          links: []
         }));
-
-        // Create links based on the nodes
-        const links = createLinks(nodes);
-        setGraphData({ nodes, links });
-
-        // Add neighbors and links information
-        links.forEach(link => {
-          const a = nodes.find(node => node.id === link.source);
-          const b = nodes.find(node => node.id === link.target);
-          !a.neighbors && (a.neighbors = []);
-          !b.neighbors && (b.neighbors = []);
+        const nodeMap = new Map(nodes.map(node => [node.id, node]));
+
+        const links = [];
+        (data.edges || []).forEach(([source, target, kind, weight]) => {
+          const a = nodeMap.get(source);
+          const b = nodeMap.get(target);
+          if (!a || !b) return;
+          const link = { source, target, kind, weight };
+          links.push(link);
           a.neighbors.push(b);
           b.neighbors.push(a);
-          !a.links && (a.links = []);
-          !b.links && (b.links = []);
           a.links.push(link);
           b.links.push(link);
         });
+
+        setGraphData({ nodes, links });
       } catch (error) {
         console.error('Error fetching knowledge data:', error);
       }
@@ -155,8 +87,24 @@ const Graph = () => {
     }
   }, []);
 
-  const handleNodeClick = node => {
+  const handleNodeClick = async node => {
     setSelectedNode(node);
+    try {
+      const response = await fetch(`${API_URL}/api/knowledge/${node.id}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const detail = await response.json();
+      // 그 사이 다른 노드를 선택했다면 덮어쓰지 않음
+      setSelectedNode(current => current && current.id === node.id ? {
+        ...node,
+        content: detail.content,
+        summary: detail.summary,
+        references: Array.isArray(detail.references) ? detail.references : []
+      } : current);
+    } catch (error) {
+      console.error('Error fetching knowledge detail:', error);
+    }
   };
 
   const handleNodeHover = node => {